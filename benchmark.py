@@ -0,0 +1,533 @@
+""" benchmarks para medir el rendimiento de las operaciones de SingleCsvManager
+
+uso: python benchmark.py [nombre_benchmark ...] (sin argumentos se ejecutan todos)
+
+los archivos se crean en un directorio temporal que se ocupa como backup y se eliminan al terminar
+"""
+import csv
+import re
+import sys
+import tempfile
+import tracemalloc
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from random import Random
+from time import perf_counter
+from typing import Callable
+
+import saveclass
+from saveclass import BaseCsvManager, SingleCsvManager
+
+CITIES = ("Houston", "Chicago", "Los Angeles", "Phoenix", "New York")
+
+
+@dataclass
+class Employee:
+    name: str
+    city: str
+    age: int
+
+
+@dataclass
+class Record:
+    """ filas de los archivos creados con create_manager"""
+    name: str
+    city: str
+    age: int
+    salary: str
+    date: str
+
+
+def create_manager(file_name: str, total_rows: int, seed: int = 0) -> SingleCsvManager:
+    """ crea un archivo con total_rows filas usando el método de clase index y retorna
+    una instancia de SingleCsvManager para ese archivo"""
+    rnd = Random(seed)
+    BaseCsvManager.max_row_limit = 50_000
+    with tempfile.TemporaryDirectory() as source_dir:
+        source = Path(source_dir) / f"{file_name}.csv"
+        with open(source, "w", newline="", encoding="utf-8") as csv_writer:
+            write = csv.writer(csv_writer, delimiter="|")
+            write.writerow(["NAME", "CITY", "AGE", "SALARY", "DATE"])
+            for num in range(1, total_rows + 1):
+                write.writerow([f"Person {num}", rnd.choice(CITIES), rnd.randint(18, 70),
+                                f"{rnd.uniform(1000, 9000):.2f}", f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"])
+        SingleCsvManager.index(str(source), "|", id_present=False)
+    return SingleCsvManager(file_name)
+
+
+def remove_manager(manager: SingleCsvManager) -> None:
+    """ elimina el archivo csv de la instancia y sus archivos auxiliares"""
+    manager.instance_file_path.unlink(missing_ok=True)
+    for suffix in BaseCsvManager._sidecar_suffixes:
+        manager.instance_file_path.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def best_of(function: Callable, repeat: int = 5) -> float:
+    """ retorna el menor tiempo en milisegundos de repeat ejecuciones de function"""
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        times.append(perf_counter() - start)
+    return min(times) * 1_000
+
+
+def bench_index_lookup() -> None:
+    """ tiempo de leer_datos_csv con patrones de indice ([n], [n:m], [a-b-c]) según la posición de
+    la fila, comparado con recorrer el archivo desde el inicio hasta la fila buscada"""
+    manager = create_manager("bench_lookup", 50_000)
+    try:
+        print(f"{'patron':<22}{'indice (ms)':>14}{'recorrido (ms)':>18}")
+        for position in (1, 1_000, 10_000, 25_000, 49_000, 50_000):
+            for pattern in (f"[{position}]", f"[{position}:{position + 9}]"):
+                def full_scan() -> None:
+                    for count, _ in enumerate(manager.leer_datos_csv()):
+                        if count > position:
+                            break
+                indexed = best_of(lambda: list(manager.leer_datos_csv(pattern)))
+                print(f"{pattern:<22}{indexed:>14.3f}{best_of(full_scan, 3):>18.3f}")
+        pattern = "[10-20000-30000-49999]"
+        print(f"{pattern:<22}{best_of(lambda: list(manager.leer_datos_csv(pattern))):>14.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_query() -> None:
+    """ tiempo de queries de búsqueda compiladas una vez (CompiledQuery o cache) comparado con
+    analizar la query en cada llamada, con búsquedas cortas (LIMIT) y búsquedas de todo el archivo"""
+    manager = create_manager("bench_query", 50_000)
+    try:
+        queries = ('"age" > 30 & "city" = Houston~LIMIT:5', '"city" [= chi | "date" < 2024-03-01~LIMIT:5',
+                   '"age" > 30 & "city" = Houston', '"salary" >= 4500.5 & "date" > 2024-06-01 | "age" << 3')
+
+        def uncached(query: str) -> None:
+            saveclass._compile_query.cache_clear()
+            list(manager.leer_datos_csv(query))
+        print(f"{'query':<52}{'sin cache (ms)':>16}{'cache (ms)':>12}{'compilada (ms)':>16}")
+        for query in queries:
+            compiled = manager.compile_query(query)
+            repeat = 200 if "LIMIT" in query else 5
+            print(f"{query[:50]:<52}{best_of(lambda: [uncached(query) for _ in range(repeat)]) / repeat:>16.3f}"
+                  f"{best_of(lambda: [list(manager.leer_datos_csv(query)) for _ in range(repeat)]) / repeat:>12.3f}"
+                  f"{best_of(lambda: [list(manager.leer_datos_csv(compiled)) for _ in range(repeat)]) / repeat:>16.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_column_types() -> None:
+    """ tiempo de búsquedas y funciones usando el tipo de cada columna guardado en el .meta comparado
+    con intentar convertir cada valor a float, fecha y str (todas las columnas marcadas como mixed)"""
+    manager = create_manager("bench_types", 50_000)
+    try:
+        queries = ('"date" > 2024-06-01', '"city" > 5', '"name" < 100', '"age" > 40~AVG:age',
+                   '"age" > 18~MAX:date', '"age" > 60~ASC:date')
+        types = list(manager._meta["types"])
+        print(f"tipos: {dict(zip(manager.new_head, types))}")
+        print(f"{'query':<30}{'mixed (ms)':>14}{'con tipos (ms)':>16}")
+        for query in queries:
+            manager._meta["types"] = ["mixed"] * len(types)
+            cascade = best_of(lambda: list(manager.leer_datos_csv(query)), 3)
+            manager._meta["types"] = list(types)
+            print(f"{query:<30}{cascade:>14.3f}{best_of(lambda: list(manager.leer_datos_csv(query)), 3):>16.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_columnar() -> None:
+    """ tiempo de una serie de búsquedas distintas sobre el mismo archivo leyendo el csv en cada una
+    comparado con la copia en memoria por columnas (cache='columnar'), incluida su creación"""
+    manager = create_manager("bench_columnar", 50_000)
+    try:
+        queries = ('"age" >= 30 & "city" != Houston~AVG:salary', '"date" > 2024-06-01~COUNT:',
+                   '"city" [= chi | "salary" < 1500', '"name" [] 9 & "age" << 3', '"salary" > 8500~MAX:date',
+                   '"city" {} %RANGE:,[Phoenix,Chicago] & "age" > 60~ASC:salary', "Phoenix")
+        columnar = SingleCsvManager("bench_columnar", cache="columnar")
+        print(f"{'query':<52}{'archivo (ms)':>14}{'columnar (ms)':>16}")
+        for query in queries:
+            print(f"{query[:50]:<52}{best_of(lambda: list(manager.leer_datos_csv(query)), 3):>14.3f}"
+                  f"{best_of(lambda: list(columnar.leer_datos_csv(query)), 3):>16.3f}")
+
+        def dashboard(instance: SingleCsvManager) -> None:
+            instance._snapshot = None
+            for query in queries:
+                list(instance.leer_datos_csv(query))
+        print(f"{'todas las query (con creación de la copia)':<52}{best_of(lambda: dashboard(manager), 3):>14.3f}"
+              f"{best_of(lambda: dashboard(columnar), 3):>16.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_numpy_engine() -> None:
+    """ tiempo de leer_datos_csv con engine='python' y engine='numpy' leyendo el archivo en cada búsqueda
+    y con la copia en memoria por columnas (cache='columnar')"""
+    if saveclass.np is None:
+        print("numpy no esta instalado")
+        return
+    manager = create_manager("bench_numpy", 50_000)
+    try:
+        columnar = SingleCsvManager("bench_numpy", cache="columnar")
+        queries = ('"age" >= 30 & "city" != Houston~AVG:salary', '"salary" > 2000~SUM:salary', '"date" > 2024-06-01~COUNT:',
+                   '"city" [= chi | "name" ]= 7~MAX:salary', '"city" {} %RANGE:,[Phoenix,Chicago] & "age" << 3')
+        print(f"{'query':<52}{'python (ms)':>13}{'numpy (ms)':>12}{'columnar python':>17}{'columnar numpy':>16}")
+        for query in queries:
+            times = [best_of(lambda: list(instance.leer_datos_csv(query, engine=engine)), 3)
+                     for instance in (manager, columnar) for engine in ("python", "numpy")]
+            print(f"{query[:50]:<52}{times[0]:>13.3f}{times[1]:>12.3f}{times[2]:>17.3f}{times[3]:>16.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_delete() -> None:
+    """ tiempo de borrar_datos con patrones de indice y con DELETE ON <query> sobre un archivo
+    que se vuelve a crear antes de cada borrado"""
+    print(f"{'borrado':<40}{'filas borradas':>16}{'tiempo (ms)':>14}")
+    for delete_index in ("[25000]", "[10:20000]", "[1-100-1000-10000-40000]", 'DELETE ON "city" = Houston',
+                         'DELETE ON "age" > 60 & "salary" < 3000', 'DELETE ON "age" > 100'):
+        manager = create_manager("bench_delete", 50_000)
+        try:
+            start = perf_counter()
+            deleted = sum(1 for _ in manager.borrar_datos(delete_index)) - 1
+            print(f"{delete_index:<40}{deleted:>16}{(perf_counter() - start) * 1_000:>14.3f}")
+        finally:
+            remove_manager(manager)
+
+
+def bench_lazy_delete() -> None:
+    """ tiempo de borrar 200 entradas de una en una reescribiendo el csv comparado con lazy_delete=True
+    (filas borradas en el .tomb) y su compactación, y el tiempo de las lecturas con filas en el .tomb"""
+    print(f"{'modo':<34}{'tiempo (ms)':>14}")
+    for lazy_delete in (False, True):
+        manager = create_manager("bench_lazy", 50_000)
+        try:
+            manager.lazy_delete = lazy_delete
+            start = perf_counter()
+            for num in range(200):
+                for _ in manager.borrar_datos(f"[{1 + num * 97}]"):
+                    pass
+            print(f"{'lazy_delete' if lazy_delete else 'reescribir':<34}{(perf_counter() - start) * 1_000:>14.3f}")
+            if lazy_delete:
+                for search in ("", "[25000:25100]", '"age" > 30 & "city" = Houston'):
+                    print(f"{'leer ' + search[:28]:<34}{best_of(lambda: list(manager.leer_datos_csv(search)), 3):>14.3f}")
+                print(f"{'compact':<34}{best_of(manager.compact, 1):>14.3f}")
+        finally:
+            remove_manager(manager)
+
+
+def bench_save_many() -> None:
+    """ tiempo de guardar entradas una por una con guardar_datos_csv comparado con guardar_datos_csv_many,
+    con y sin enforce_unique"""
+    rnd = Random(0)
+    employees = [Employee(f"Person {rnd.randint(1, 5_000)}", rnd.choice(CITIES), rnd.randint(18, 70)) for _ in range(2_000)]
+    print(f"{'entradas':<12}{'enforce_unique':<18}{'una por una (ms)':>18}{'many (ms)':>12}")
+    for enforce_unique in (None, ("name",)):
+        times = []
+        for name in ("bench_single", "bench_many"):
+            manager = SingleCsvManager(name, Employee)
+            try:
+                start = perf_counter()
+                if name == "bench_single":
+                    for employee in employees:
+                        manager.writer_instance = employee
+                        manager.guardar_datos_csv(enforce_unique)
+                else:
+                    manager.guardar_datos_csv_many(employees, enforce_unique)
+                times.append((perf_counter() - start) * 1_000)
+            finally:
+                remove_manager(manager)
+        print(f"{len(employees):<12}{str(enforce_unique):<18}{times[0]:>18.3f}{times[1]:>12.3f}")
+
+
+def bench_sorted_index() -> None:
+    """ tiempo de queries selectivas sobre columnas con un indice ordenado (create_index) comparado con
+    leer todo el archivo, también el tiempo de crear los indices"""
+    manager = create_manager("bench_sorted", 50_000)
+    try:
+        queries = ('"salary" = 4500.25', '"date" = 2024-03-14', '"age" >= 69 & "city" = Houston',
+                   '"salary" > 8900 & "date" < 2024-07-01', '"age" > 30')
+        scans = [best_of(lambda: list(manager.leer_datos_csv(query))) for query in queries]
+        start = perf_counter()
+        for column in ("age", "salary", "date"):
+            manager.create_index(column)
+        print(f"crear indices de AGE, SALARY y DATE: {(perf_counter() - start) * 1_000:.3f} ms")
+        print(f"{'query':<42}{'filas':>8}{'sin indice (ms)':>18}{'indice (ms)':>14}")
+        for query, scan in zip(queries, scans):
+            print(f"{query:<42}{len(list(manager.leer_datos_csv(query))) - 1:>8}{scan:>18.3f}"
+                  f"{best_of(lambda: list(manager.leer_datos_csv(query))):>14.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_external_sort() -> None:
+    """ tiempo y memoria máxima de ~ASC y ~DESC ordenando todas las filas en memoria comparado con ordenar
+    en archivos temporales (runs) con un limite de memoria menor"""
+    manager = create_manager("bench_sort", 50_000)
+    try:
+        queries = ('"age" > 0~ASC:salary', '"age" > 0~DESC:date', '"city" [] o~ASC:name')
+        print(f"{'query':<26}{'memoria':>12}{'tiempo (ms)':>14}{'memoria máxima (MB)':>22}")
+        for query in queries:
+            for memory in (SingleCsvManager._sort_memory, 200_000):
+                manager._sort_memory = memory
+                elapsed = best_of(lambda: list(manager.leer_datos_csv(query)), repeat=3)
+                tracemalloc.start()
+                for _ in manager.leer_datos_csv(query):
+                    pass
+                peak = tracemalloc.get_traced_memory()[1] / 1_000_000
+                tracemalloc.stop()
+                print(f"{query:<26}{memory:>12}{elapsed:>14.3f}{peak:>22.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_top_rows() -> None:
+    """ tiempo y memoria máxima de obtener las primeras 10 filas de ~ASC o ~DESC ordenando todas las filas
+    comparado con ~LIMIT:10 (heap de 10 filas)"""
+    manager = create_manager("bench_top", 50_000)
+    try:
+        queries = ('"age" > 0~DESC:age', '"age" > 0~ASC:salary', '"city" [] o~DESC:date')
+        print(f"{'query':<26}{'ordenar todo (ms)':>20}{'MB':>8}{'~LIMIT:10 (ms)':>16}{'MB':>8}")
+        for query in queries:
+            results = []
+            for current in (query, f"{query}~LIMIT:10"):
+                elapsed = best_of(lambda: list(islice(manager.leer_datos_csv(current), 11)), repeat=3)
+                tracemalloc.start()
+                list(islice(manager.leer_datos_csv(current), 11))
+                results += [elapsed, tracemalloc.get_traced_memory()[1] / 1_000_000]
+                tracemalloc.stop()
+            print(f"{query:<26}{results[0]:>20.3f}{results[1]:>8.3f}{results[2]:>16.3f}{results[3]:>8.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_multiple_aggregates() -> None:
+    """ tiempo de calcular varias funciones con una query por función (una lectura del archivo por cada una)
+    comparado con una sola query con todas las funciones separadas por comas"""
+    manager = create_manager("bench_aggregates", 50_000)
+    try:
+        conditions = ('"age" > 30', '"city" = Houston', '"date" > 2024-06-01 | "salary" < 2000')
+        functions = ("SUM:salary", "AVG:age", "MAX:date", "COUNT:")
+        print(f"{'query':<40}{'una por función (ms)':>22}{'todas juntas (ms)':>20}")
+        for condition in conditions:
+            separate = best_of(lambda: [list(manager.leer_datos_csv(f"{condition}~{function}"))
+                                        for function in functions], repeat=3)
+            combined = best_of(lambda: list(manager.leer_datos_csv(f"{condition}~{','.join(functions)}")), repeat=3)
+            print(f"{condition:<40}{separate:>22.3f}{combined:>20.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_group() -> None:
+    """ tiempo de calcular AVG y COUNT por ciudad con ~UNIQUE y una query por cada valor comparado con ~GROUP,
+    también con pocos grupos en memoria (las filas de los demás grupos se agrupan desde archivos temporales)"""
+    manager = create_manager("bench_group", 50_000)
+    try:
+        def per_value(column: str) -> None:
+            values = list(manager.leer_datos_csv(f'"age" > 0~UNIQUE:{column}'))[-1][2]
+            for value in values:
+                list(manager.leer_datos_csv(f'"age" > 0 & "{column}" = {value}~AVG:salary,COUNT:'))
+        print(f"{'columna':<10}{'grupos':>8}{'una query por valor (ms)':>26}{'GROUP (ms)':>12}{'GROUP 10 en memoria (ms)':>26}")
+        for column in ("city", "age"):
+            query = f'"age" > 0~GROUP:{column}:AVG:salary,COUNT:'
+            groups = len(list(manager.leer_datos_csv(query))) - 1
+            separate = best_of(lambda: per_value(column), repeat=1)
+            grouped = best_of(lambda: list(manager.leer_datos_csv(query)), repeat=3)
+            manager._group_memory = 10
+            spilled = best_of(lambda: list(manager.leer_datos_csv(query)), repeat=3)
+            manager._group_memory = SingleCsvManager._group_memory
+            print(f"{column:<10}{groups:>8}{separate:>26.3f}{grouped:>12.3f}{spilled:>26.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_materialized() -> None:
+    """ tiempo de obtener ~COUNT:, ~SUM:salary y ~UNIQUE:city leyendo el csv comparado con queries registradas
+    con register_aggregate, también el costo extra de guardar una entrada con las queries registradas"""
+    # below max_row_limit so new entries can be saved
+    manager = create_manager("bench_materialized", 49_000)
+    try:
+        queries = ('"age" > 0~COUNT:', '"age" > 0~SUM:salary', '"age" > 0~UNIQUE:city')
+        registered = ("~COUNT:", "~SUM:salary", "~UNIQUE:city")
+        save = lambda: [manager.set_data("Person 0", "Houston", 30, "4500.00", "2024-01-01"), manager.guardar_datos_csv()]
+        manager.current_class = Record
+        saving = best_of(save)
+        for query in registered:
+            manager.register_aggregate(query)
+        print(f"{'query':<24}{'lectura (ms)':>14}{'registrada (ms)':>18}")
+        for query, materialized in zip(queries, registered):
+            print(f"{query:<24}{best_of(lambda: list(manager.leer_datos_csv(query)), repeat=3):>14.3f}"
+                  f"{best_of(lambda: manager.aggregate(materialized)):>18.3f}")
+        print(f"guardar una entrada: {saving:.3f} ms sin queries registradas y {best_of(save):.3f} ms con ellas")
+    finally:
+        remove_manager(manager)
+
+
+def bench_short_circuit() -> None:
+    """ tiempo de queries compiladas y número de comparaciones evaluadas y evitadas por matches (las condiciones
+    se evalúan hasta que se conoce el resultado de la fila y con un solo tipo de conector se ordenan)"""
+    manager = create_manager("bench_short_circuit", 50_000)
+    try:
+        queries = ('"city" [] o & "name" [] 1 & "age" > 65', '"age" > 30 & "city" = Houston',
+                   '"age" > 60 | "city" [] ous | "salary" < 1500', '"salary" >= 4500.5 & "date" > 2024-06-01 | "age" << 3')
+        print(f"{'query':<56}{'tiempo (ms)':>12}{'evaluadas':>12}{'evitadas':>12}  orden")
+        for query in queries:
+            compiled = manager.compile_query(query)
+            elapsed = best_of(lambda: list(manager.leer_datos_csv(compiled)), repeat=3)
+            list(manager.leer_datos_csv(compiled))
+            stats = manager.query_stats
+            print(f"{query:<56}{elapsed:>12.3f}{stats.evaluations:>12}{stats.skipped:>12}  {stats.order}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_text_search() -> None:
+    """ tiempo de búsquedas por texto (comparando las filas como bytes antes de separarlas) comparado con
+    buscar con una expresión regular en cada fila y con escaped=True (expresión regular compilada una vez)"""
+    manager = create_manager("bench_text", 50_000)
+    try:
+        def regex_scan(search: str) -> None:
+            rows = manager.leer_datos_csv()
+            next(rows)
+            for row in rows:
+                re.search(f"^.*{re.escape(search)}.*$", "".join(row[1:]), re.IGNORECASE)
+        print(f"{'búsqueda':<16}{'filas':>8}{'regex por fila (ms)':>22}{'texto (ms)':>12}{'escaped (ms)':>14}")
+        for search in ("Person 4999", "houston", "2024-03-1", "zzz"):
+            print(f"{search:<16}{len(list(manager.leer_datos_csv(search))) - 1:>8}"
+                  f"{best_of(lambda: regex_scan(search), repeat=3):>22.3f}"
+                  f"{best_of(lambda: list(manager.leer_datos_csv(search)), repeat=3):>12.3f}"
+                  f"{best_of(lambda: list(manager.leer_datos_csv(re.escape(search), escaped=True)), repeat=3):>14.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_text_index() -> None:
+    """ tiempo de búsquedas por texto con el indice de texto (create_text_index) comparado con leer todo el csv,
+    las búsquedas que seleccionan demasiadas filas o que no tienen palabras leen todo el csv igual que sin indice"""
+    manager = create_manager("bench_text_index", 50_000)
+    try:
+        searches: tuple[str, ...] = ("Person 4999", "person 12345", "2024-03-1", "houston", "zzz")
+        scans: list[float] = [best_of(lambda: list(manager.leer_datos_csv(search)), repeat=3) for search in searches]
+        print(f"crear indice: {best_of(manager.create_text_index, repeat=1):.3f} ms")
+        print(f"{'búsqueda':<16}{'filas':>8}{'sin indice (ms)':>18}{'indice (ms)':>14}")
+        for search, scan in zip(searches, scans):
+            print(f"{search:<16}{len(list(manager.leer_datos_csv(search))) - 1:>8}{scan:>18.3f}"
+                  f"{best_of(lambda: list(manager.leer_datos_csv(search)), repeat=3):>14.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_update() -> None:
+    """ tiempo de actualizar_datos según el número de filas seleccionadas por INDICE, query o texto, las filas
+    se seleccionan y actualizan mientras el csv se copia una sola vez, con dry_run no se copia el csv"""
+    manager = create_manager("bench_update", 50_000)
+    try:
+        print(f"{'selección':<24}{'filas':>8}{'tiempo (ms)':>14}{'dry_run (ms)':>14}")
+        for where in ("[25000]", "[1:20000]", '"AGE" < 39', "houston"):
+            query: str = f'UPDATE:~"CITY"=Houston ON {where}'
+            rows: int = sum(1 for _ in manager.actualizar_datos(query))
+            print(f"{where:<24}{rows:>8}{best_of(lambda: list(manager.actualizar_datos(query)), repeat=3):>14.3f}"
+                  f"{best_of(lambda: list(manager.actualizar_datos(query, dry_run=True)), repeat=3):>14.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_update_plan() -> None:
+    """ costo por fila de aplicar las actualizaciones de una query UPDATE con el plan compilado una vez
+    (UpdateOperation) comparado con resolver los valores y funciones de nuevo en cada fila como antes"""
+    manager = create_manager("bench_update_plan", 20_000)
+    try:
+        rows: list[list[str]] = list(manager.leer_datos_csv())[1:]
+        head: tuple[str, ...] = tuple(manager.new_head)
+        resolver: Callable = manager._SingleCsvManager__parsed_update_query_operation_resolver
+        updates: dict[str, list[tuple[str, str | list[str]]]] = {
+            '"CITY"=%UPPER': [("CITY", "%UPPER")],
+            '"AGE"=%ADD:~3': [("AGE", ["%ADD", "3"])],
+            '"DATE"=%ADD:~30': [("DATE", ["%ADD", "30"])],
+            '"SALARY"=%MUL:~USE:~age': [("SALARY", ["%MUL", "USE:~age"])],
+            '"NAME"=%COPY:~city': [("NAME", "%COPY:~city")],
+            '"SALARY"=%NUM-FORMAT:~1 "AGE"=%SUB:~1': [("SALARY", ["%NUM-FORMAT", "1"]), ("AGE", ["%SUB", "1"])],
+        }
+
+        def compiled(update: list[tuple[str, str | list[str]]]) -> list[saveclass.UpdateOperation]:
+            return [saveclass.UpdateOperation(column, head.index(column), new_val if isinstance(new_val, str) else tuple(new_val),
+                                              saveclass._update_operation(head.index(column), new_val, head))
+                    for column, new_val in update]
+
+        def per_row(update: list[tuple[str, str | list[str]]]) -> None:
+            for count, row in enumerate(rows, start=1):
+                resolver(list(row), compiled(update), count)
+
+        def once(update: list[tuple[str, str | list[str]]]) -> None:
+            operations: list[saveclass.UpdateOperation] = compiled(update)
+            for count, row in enumerate(rows, start=1):
+                resolver(list(row), operations, count)
+        print(f"{'actualización':<42}{'por fila (µs)':>16}{'plan (µs)':>12}")
+        for name, update in updates.items():
+            print(f"{name:<42}{best_of(lambda: per_row(update), repeat=3) * 1_000 / len(rows):>16.3f}"
+                  f"{best_of(lambda: once(update), repeat=3) * 1_000 / len(rows):>12.3f}")
+    finally:
+        remove_manager(manager)
+
+
+def bench_transaction() -> None:
+    """ tiempo de un borrado, dos actualizaciones y 50 entradas guardadas de una en una comparado con las
+    mismas operaciones en una transacción (una sola reescritura del csv)"""
+    rnd = Random(0)
+    records = [Record(f"Person {num}", rnd.choice(CITIES), rnd.randint(18, 70), "1000.00", "2024-01-01")
+               for num in range(50)]
+    print(f"{'modo':<24}{'tiempo (ms)':>14}")
+    for mode in ("una por una", "transaction"):
+        manager = create_manager("bench_transaction", 20_000)
+        manager.current_class = Record
+        try:
+            start = perf_counter()
+            if mode == "una por una":
+                for _ in manager.borrar_datos('DELETE ON "age" > 65'):
+                    pass
+                for _ in manager.actualizar_datos('UPDATE:~"city"=Dallas ON [1:500]'):
+                    pass
+                for _ in manager.actualizar_datos('UPDATE:~"salary"=%MUL:~2 ON "age" < 20'):
+                    pass
+                for record in records:
+                    manager.writer_instance = record
+                    manager.guardar_datos_csv()
+            else:
+                with manager.transaction() as transaction:
+                    transaction.borrar_datos('DELETE ON "age" > 65')
+                    transaction.actualizar_datos('UPDATE:~"city"=Dallas ON [1:500]')
+                    transaction.actualizar_datos('UPDATE:~"salary"=%MUL:~2 ON "age" < 20')
+                    transaction.guardar_datos_csv_many(records)
+            print(f"{mode:<24}{(perf_counter() - start) * 1_000:>14.3f}")
+        finally:
+            remove_manager(manager)
+
+
+BENCHMARKS: dict[str, Callable[[], None]] = {
+    "index_lookup": bench_index_lookup,
+    "query": bench_query,
+    "column_types": bench_column_types,
+    "columnar": bench_columnar,
+    "numpy_engine": bench_numpy_engine,
+    "delete": bench_delete,
+    "lazy_delete": bench_lazy_delete,
+    "save_many": bench_save_many,
+    "sorted_index": bench_sorted_index,
+    "external_sort": bench_external_sort,
+    "top_rows": bench_top_rows,
+    "multiple_aggregates": bench_multiple_aggregates,
+    "group": bench_group,
+    "materialized": bench_materialized,
+    "short_circuit": bench_short_circuit,
+    "text_search": bench_text_search,
+    "text_index": bench_text_index,
+    "update": bench_update,
+    "update_plan": bench_update_plan,
+    "transaction": bench_transaction,
+}
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as backup_dir:
+        BaseCsvManager.backup = Path(backup_dir)
+        for name in sys.argv[1:] or BENCHMARKS:
+            print(f"\n== {name} ==")
+            BENCHMARKS[name]()
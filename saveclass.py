@@ -1,12 +1,38 @@
 import csv
+import io
+import json
+import mmap
+import os
 import re
+import shutil
+import sys
 import tempfile
-from typing import Generator, Callable, Type, TextIO, Self
-from math import isnan, ceil, floor
+from typing import Generator, Callable, Collection, Iterable, Iterator, Type, TextIO, Self
+from array import array
+from contextlib import contextmanager, nullcontext
+from itertools import accumulate, chain, compress, islice, repeat
+from operator import ge, le, lt, gt, eq, ne, or_, and_, add, sub, mul
+
+try:
+    # optional, only needed for leer_datos_csv(engine="numpy")
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    # optional, only available on unix, without it the files are not locked between processes
+    import fcntl
+except ImportError:
+    fcntl = None
+from math import isnan, isfinite, ceil, floor
 from pathlib import Path
 from datetime import date, timedelta
 from keyword import iskeyword
-from dataclasses import make_dataclass
+from dataclasses import make_dataclass, dataclass, field
+from functools import lru_cache
+from collections import Counter
+from fractions import Fraction
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge, heappush, heapreplace
 from random import randint
 from inspect import isclass
 
@@ -117,6 +143,10 @@ class BaseCsvManager(metaclass=Meta):
     para que funcione para incluir envés de excluir el primer elemento del tuple debe ser el un "!"
     """
 
+    # extensiones de los archivos auxiliares que acompañan a cada csv del backup
+    # (se renombran y eliminan junto con el csv)
+    _sidecar_suffixes: tuple[str, ...] = (".meta", ".tomb", ".uniq", ".idx", ".aggr", ".fts", ".lock")
+
     def __init__(self, file_name: str, current_class: Type | None = None,
                  delimiter: str = "|", exclude: None | tuple = None) -> None:
         self.file_name = file_name
@@ -221,12 +251,29 @@ class BaseCsvManager(metaclass=Meta):
         - None
         """
         directory = Path(file_name.parent)
-        if not directory.is_dir():
-            directory.mkdir()
+        directory.mkdir(exist_ok=True)
         if not file_name.is_file():
-            with open(str(file_name), "w", newline="", encoding="utf-8") as _:
+            # append mode so a file created at the same time by another process is not truncated
+            with open(str(file_name), "a", newline="", encoding="utf-8") as _:
                 pass
 
+    @staticmethod
+    def _wal_paths(file_name: Path) -> list[Path]:
+        """ método estático privado _wal_paths retorna las rutas de los archivos .wal de las transacciones
+        del archivo csv file_name, cada transacción tiene su propio .wal con el nombre <nombre>.<id>.wal
+        (ver Transaction), también se renombran y eliminan junto con el csv
+
+        Argumento:
+
+        - file_name un objeto de tipo Path que designa el archivo csv
+
+        Valor de retorno:
+
+        - una lista con las rutas ordenadas por nombre
+        """
+        wal_name: re.Pattern = re.compile(re.escape(file_name.stem) + r"\.[a-z0-9_]+\.wal")
+        return sorted(path for path in file_name.parent.glob("*.wal") if wal_name.fullmatch(path.name))
+
     @staticmethod
     def return_pattern(str_pattern) -> tuple | None:
         """ método estático publico return_pattern
@@ -304,13 +351,15 @@ class BaseCsvManager(metaclass=Meta):
             if isinstance(val, str):
                 file_names.append(val)
         if file_names:
-            if "borrar todo" in file_names:
-                for csv_file in BaseCsvManager.return_current_file_names():
-                    Path(fr"{BaseCsvManager.backup}\{csv_file}.csv").unlink(missing_ok=True)
-            else:
-                for present_file in BaseCsvManager.return_current_file_names():
-                    if present_file in file_names:
-                        Path(fr"{BaseCsvManager.backup}\{present_file}.csv").unlink(missing_ok=True)
+            # se usa una lista ya que se eliminan archivos del directorio que se esta recorriendo
+            for present_file in list(BaseCsvManager.return_current_file_names()):
+                if "borrar todo" in file_names or present_file in file_names:
+                    csv_path = Path(fr"{BaseCsvManager.backup}\{present_file}.csv")
+                    csv_path.unlink(missing_ok=True)
+                    for suffix in BaseCsvManager._sidecar_suffixes:
+                        csv_path.with_suffix(suffix).unlink(missing_ok=True)
+                    for wal_path in BaseCsvManager._wal_paths(csv_path):
+                        wal_path.unlink(missing_ok=True)
 
     def rename_file(self, new_name) -> None:
         """ método público rename_file
@@ -330,7 +379,16 @@ class BaseCsvManager(metaclass=Meta):
         """
         # this is to call the property setter
         self.file_name = new_name
+        old_path: Path = self.instance_file_path
         self.instance_file_path: Path = self.instance_file_path.rename(Path(fr"{BaseCsvManager.backup}\{new_name}.csv"))
+        # rename does not change the mtime so the sidecar files are still valid
+        for suffix in BaseCsvManager._sidecar_suffixes:
+            if (sidecar := old_path.with_suffix(suffix)).is_file():
+                sidecar.replace(self.instance_file_path.with_suffix(suffix))
+        # the .wal of each transaction keeps its id
+        for wal_path in BaseCsvManager._wal_paths(old_path):
+            wal_path.replace(self.instance_file_path.with_name(
+                f"{self.instance_file_path.stem}{wal_path.name[len(old_path.stem):]}"))
 
     # right way of passing data to current object
     # TEST GUARDAR_DATOS WITH WRITER_INSTANCE = NONE AND CHANGE THE CORRESPONDING TEST
@@ -364,6 +422,1554 @@ class BaseCsvManager(metaclass=Meta):
             return self
         return None
 
+
+# the query regex is the same for every search so is only built once
+_QUERY_REGEX: re.Pattern = re.compile(
+    r'^(?:!?\[([^\[,\s><=\|&!:"+*-\.\'/\?\]]+)*\] )?"([^\s,><=\|&!":+*-\.\'#/\?\[\]]+)" '
+    r'(>=|>|<=|<|=|!=|\[=|\]=|\[\]|\]\[|<>|><|<<|>>|\{\}|\}\{) (.+?)'
+    + r"(?: (\||&) "
+    + r"(?: (\||&) ".join([r'"([^,\s><=\|&!:"+*-\.\'#/\?\[\]]+)" (>=|>|<=|<|=|!=|\[=|\]=|\[\]|\]\[|<>|><|<<|>>|\{\}\}\{) (.+?))?'
+                           for _ in range(0, 3)])
+    + r'(?:~((?:LIMIT|UNIQUE):(?:[^:,\s><=!\|&"+*\'#/\?\[\]]+)*'
+    # AVG, MAX, MIN, SUM and COUNT can be separated by commas to get all of them in the same search
+    + r'|(?:AVG|MAX|MIN|SUM|COUNT):(?:[^:,\s><=!\|&"+*\'#/\?\[\]]+)*'
+    + r'(?:,(?:AVG|MAX|MIN|SUM|COUNT):(?:[^:,\s><=!\|&"+*\'#/\?\[\]]+)*)*'
+    # GROUP is followed by the column to group by and the functions calculated for each group
+    + r'|GROUP:[^:,\s><=!\|&"+*\'#/\?\[\]]+:(?:AVG|MAX|MIN|SUM|COUNT):(?:[^:,\s><=!\|&"+*\'#/\?\[\]]+)*'
+    + r'(?:,(?:AVG|MAX|MIN|SUM|COUNT):(?:[^:,\s><=!\|&"+*\'#/\?\[\]]+)*)*'
+    # ASC and DESC can be followed by LIMIT to get only the first rows of the result
+    + r'|(?:ASC|DESC):(?:[^:,\s><=!\|&"+*\'#/\?\[\]]+)*(?:~LIMIT:\d+)?))?$')
+_RANGE_REGEX: re.Pattern = re.compile(r"^%RANGE:(.)\[(.+)\]$")
+_LOGICAL_OPERATORS: tuple[str, ...] = ("<=", ">=", ">", "<", "=", "!=", "[=", "]=", "[]", "][",
+                                       "<>", "><", "<<", ">>", "{}", "}{")
+_COMPARISON_OPERATORS: dict[str, Callable] = {">=": ge, "<=": le, "<": lt, ">": gt, "=": eq, "!=": ne}
+# the values of a column are compared and aggregated as float, then as date and finally as str
+_CASCADE_CASTS: tuple[Callable, ...] = (float, date.fromisoformat, str)
+# if every value of a column has the same type only the cast of that type is needed
+_TYPE_CASTS: dict[str, tuple[Callable, ...]] = {
+    "int": (float,), "float": (float,), "date": (date.fromisoformat,), "str": (str,)
+}
+# type of the keys of a sorted index (create_index) for each type of column, mixed columns can't be sorted
+_INDEX_KINDS: dict[str, str] = {"int": "float", "float": "float", "date": "date", "str": "str"}
+_INDEX_OPERATORS: tuple[str, ...] = ("=", ">", ">=", "<", "<=")
+# relative cost of evaluating each operator, the comparisons (<, =, ...) convert the value to float or date
+# and cost one more if the type of the column is not known (every conversion is tried)
+_OPERATOR_COSTS: dict[str, int] = {"{}": 1, "}{": 1, "<>": 1, "><": 1, "<<": 1, ">>": 1,
+                                   "[=": 2, "]=": 2, "[]": 2, "][": 2}
+# number of rows after which the conditions of a query with a single kind of connector are sorted again
+_REORDER_ROWS: int = 1_000
+# functions of an UPDATE query that change the case of a value
+_CASE_FUNCTIONS: dict[str, Callable[[str], str]] = {"%UPPER": str.upper, "%LOWER": str.lower,
+                                                    "%TITLE": str.title, "%CAPITALIZE": str.capitalize}
+# functions of an UPDATE query between the value of the column and a number, date or str
+_ARITHMETIC_FUNCTIONS: dict[str, Callable] = {"%ADD": add, "%SUB": sub, "%MUL": mul,
+                                              "%DIV": lambda x, y: x if not y else x / y}
+# UPDATE query of actualizar_datos, up to four columns to update and the search of the rows to update
+# this works but use .strip() on the values to update
+# current re implementation only captures a group as needed
+# that why this is as verbose as it gets
+_UPDATE_QUERY_REGEX: re.Pattern = re.compile(
+    r'^UPDATE:~"([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?)(?: "([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?))?'
+    r'(?: "([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?))?(?: "([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?))? ON (.+?)$')
+# size of the parts of a mapped csv that are copied at once to check if it only has ASCII characters
+_SCAN_CHUNK: int = 1 << 20
+# words of the full text index (create_text_index), letters, numbers and _ that follow each other
+_TEXT_TOKEN_REGEX: re.Pattern = re.compile(r"\w+")
+
+
+def _index_key(kind: str, value: str) -> float | int | str:
+    """ función privada _index_key convierte value en la llave de un indice ordenado del tipo kind ('float',
+    'date' o 'str'), las fechas se guardan como ordinal para poder guardar el indice en json
+
+    Excepciones:
+
+    - ValueError si value no se puede convertir al tipo kind (o es nan ya que no se puede ordenar)
+    """
+    if kind == "float":
+        if isnan(key := float(value)):
+            raise ValueError("nan no se puede ordenar")
+        return key
+    elif kind == "date":
+        return date.fromisoformat(value).toordinal()
+    return value
+
+
+def _text_tokens(row: list[str]) -> set[str]:
+    """ función privada _text_tokens retorna las palabras del indice de texto de una fila, las palabras se
+    obtienen de sus valores (sin el INDICE) unidos y convertidos con casefold igual que en la búsqueda de texto
+    de leer_datos_csv
+    """
+    return set(_TEXT_TOKEN_REGEX.findall("".join(row[1:]).casefold()))
+
+
+def _csv_rows(csv_file: TextIO, delimiter: str) -> Iterator[list[str]]:
+    """ función privada _csv_rows retorna un iterador con las filas del archivo csv abierto csv_file igual que
+    csv.reader pero sin las lineas en blanco (csv.reader las entrega como listas vacías), ninguna lectura del
+    csv cuenta una linea en blanco como fila por lo que no ocupan un INDICE ni una posición en el .meta,
+    el .tomb o los indices"""
+    return filter(None, csv.reader(csv_file, delimiter=delimiter))
+
+
+def _value_type(value: str) -> str:
+    """ función privada _value_type retorna el tipo de un valor del csv ('int', 'float', 'date' o 'str')
+    siguiendo el mismo orden en que se intenta convertir un valor al compararlo (float, fecha y str)"""
+    try:
+        int(value)
+    except ValueError:
+        pass
+    else:
+        return "int"
+    for type_name, is_type in (("float", float), ("date", date.fromisoformat)):
+        try:
+            is_type(value)
+        except ValueError:
+            pass
+        else:
+            return type_name
+    return "str"
+
+
+def _merge_row_types(types: list[str | None], row: list[str]) -> None:
+    """ función privada _merge_row_types actualiza types (el tipo de cada columna) con los valores de row,
+    None es una columna sin valores, int y float se combinan como float y cualquier otra combinación
+    de tipos distintos es 'mixed'"""
+    for position, value in enumerate(row[:len(types)]):
+        # the index is compared without the []
+        kind = _value_type(value if position else value.replace("[", "").replace("]", ""))
+        if (current := types[position]) != kind:
+            if current is None:
+                types[position] = kind
+            elif current in ("int", "float") and kind in ("int", "float"):
+                types[position] = "float"
+            else:
+                types[position] = "mixed"
+
+
+def _parse_query(string_pattern: str, header: tuple[str, ...]) -> list:
+    """ función privada _parse_query
+    permite aplicar operaciones lógicas (>=, <=, <, >, =, != [=, ]=, [], ][, <>, ><, <<, >>, {}, }{) a las búsquedas
+    del usuario dando más posibilidades al momento de filtrar datos
+
+    Argumentos:
+
+    - string_pattern str introducida por el usuario la cual sera ocupada
+    para hacer las comparaciones requeridas a la hora de buscar datos el formato
+    general debe ser '"<nombre_columna>" <operador_lógico> <valor>'
+
+    - header tuple con el encabezado del csv en mayúsculas
+
+    Valor de retorno:
+
+    - una lista con los tokens a utilizar para filtrar resultados si se encontró un
+    patron de otra forma un lista vacía
+
+    Excepciones:
+
+    - ValueError si el tipo del argumento requerido no es el indicado
+    """
+    if not isinstance(string_pattern, str):
+        raise ValueError(
+            f"el tipo del argumento string_pattern debe ser str pero fue {type(string_pattern).__name__}")
+    new_pattern = _QUERY_REGEX.search(string_pattern)
+    if new_pattern is not None:
+        valid_tokens = list(filter(None, new_pattern.groups()))
+        function_group = []
+        if any([val in valid_tokens[-1] for val in
+                ("AVG:", "MAX:", "MIN:", "COUNT:", "SUM:", "LIMIT:", "ASC:", "DESC:", "UNIQUE:", "GROUP:")]):
+            function_group.append(valid_tokens.pop())
+        exclude_group = []
+        for exclude in valid_tokens:
+            if exclude in _LOGICAL_OPERATORS:
+                exclude_group.pop()
+                break
+            else:
+                exclude_group.append(exclude)
+        if exclude_group:
+            valid_tokens.pop(0)
+        contents: list = []
+        sub_queries: list = []
+        for count, token in enumerate(valid_tokens, 1):
+            if count % 4 == 0:
+                new_query: list = [] + sub_queries
+                contents.append(new_query)
+                contents.append(token)
+                sub_queries.clear()
+            else:
+                sub_queries.append(token)
+        contents.append([] + sub_queries)
+        sub_queries.clear()
+        next_token: bool = True
+        for query in contents:
+            if isinstance(query, list) and query:
+                if str(query[0]).upper() in header:
+                    try:
+                        sub_queries.append([str(query[0]).upper(), query[1], query[2]])
+                    # query has syntax error that produce
+                    # operations like a > 2 to end like a >
+                    except IndexError:
+                        return []
+                    if not next_token:
+                        next_token = True
+                else:
+                    next_token = False
+                    try:
+                        if isinstance(sub_queries[-1], str):
+                            sub_queries.pop()
+                    except IndexError:
+                        pass
+            else:
+                if next_token:
+                    sub_queries.append(query)
+        if exclude_group:
+            exclude_group[0] = tuple(
+                (header.index(str(item).upper()) for item in exclude_group[0].split("#") if
+                 str(item).upper() in header))
+            if exclude_group[0]:
+                if string_pattern[0] != "!":
+                    exclude_group[0] = tuple(
+                        (val for val in range(1, len(header)) if val not in exclude_group[0]))
+                sub_queries.insert(0, exclude_group[0])
+        if function_group:
+            sub_queries.append(function_group[0])
+        return sub_queries
+    return []
+
+
+def _condition_test(operator: str, operand: str, column_type: str | None = None) -> Callable[[str], bool] | str:
+    """ función privada _condition_test convierte una comparación de una query en una función
+    que recibe el valor de la columna y retorna el resultado de la comparación, los valores con
+    los que se compara (float, fecha, largo o rango) se convierten una sola vez
+
+    Argumentos:
+
+    - operator str con el operador lógico de la comparación
+
+    - operand str con el valor con el cual comparar
+
+    - column_type tipo de los valores de la columna ('int', 'float', 'date', 'str'), si es 'mixed' o None
+    se intenta convertir cada valor a float, luego a fecha y finalmente se compara como str
+
+    Valor de retorno:
+
+    - la función que realiza la comparación o un str con el error de sintaxis si el operando no es valido
+    """
+    # [= is the str star with operator and ]= is the str end with operator
+    # for a = "hola" a[5] gives index error but a[5:] or a[5:10] gives ""
+    if operator in ("]=", "[=", "[]", "]["):
+        # this operator only accept values as str no matter if both can
+        # be numbers of dates otherwise when parsing to float the comparison
+        # may be False when is True
+        lowered, size = operand.lower(), len(operand)
+        if operator == "[=":
+            return lambda val: lowered in val[0:size].lower()
+        elif operator == "]=":
+            return lambda val: lowered in val[-size:].lower()
+        elif operator == "[]":
+            return lambda val: lowered in val.lower()
+        return lambda val: lowered not in val.lower()
+    elif operator in ("{}", "}{"):
+        if (match_group := _RANGE_REGEX.match(operand)) is None:
+            return f"error de sintaxis al ocupar el operador {operator}"
+        range_values = tuple(filter(None, match_group.group(2).split(match_group.group(1))))
+        if operator == "{}":
+            return lambda val: val in range_values
+        return lambda val: val not in range_values
+    elif operator in ("<>", "><", "<<", ">>",):
+        try:
+            size = int(operand)
+        except ValueError:
+            return lambda val: False
+        if operator == "<>":
+            return lambda val: len(val) == size
+        elif operator == "><":
+            return lambda val: len(val) != size
+        elif operator == ">>":
+            return lambda val: len(val) > size
+        return lambda val: len(val) < size
+    compare: Callable = _COMPARISON_OPERATORS[operator]
+    # the row value is compared as float, then as date (the only standard I will support)
+    # and finally as str, only if the operand can be converted to that type
+    try:
+        number: float | None = float(operand)
+    except ValueError:
+        number = None
+    try:
+        day: date | None = date.fromisoformat(operand)
+    except ValueError:
+        day = None
+    # with the type of the column known the result of the conversions is also known
+    # so there is no need to try (and fail) to convert every value
+    if column_type in ("int", "float") and number is not None:
+        return lambda val: compare(float(val), number)
+    elif column_type == "date":
+        if day is not None:
+            return lambda val: compare(date.fromisoformat(val), day)
+        return lambda val: compare(val, operand)
+    elif column_type == "str":
+        return lambda val: compare(val, operand)
+
+    def test(val: str) -> bool:
+        if number is not None:
+            try:
+                return compare(float(val), number)
+            except ValueError:
+                pass
+        if day is not None:
+            try:
+                return compare(date.fromisoformat(val), day)
+            except ValueError:
+                pass
+        return compare(val, operand)
+    return test
+
+
+@dataclass(frozen=True)
+class QueryCondition:
+    """ clase QueryCondition representa una comparación ya compilada de una query
+    ('"<nombre_columna>" <operador_lógico> <valor>')
+
+    - column nombre de la columna en mayúsculas
+
+    - head_index posición de la columna en el encabezado
+
+    - operator operador lógico de la comparación
+
+    - operand valor con el cual se compara tal como fue escrito en la query
+
+    - test función que recibe el valor de la columna y retorna el resultado de la comparación
+
+    - cost costo relativo de evaluar la comparación (ver _OPERATOR_COSTS)
+    """
+    column: str
+    head_index: int
+    operator: str
+    operand: str
+    test: Callable[[str], bool] = field(repr=False, compare=False)
+    cost: int = field(default=2, compare=False)
+
+    def matches(self, row: list[str]) -> bool:
+        """ método publico matches retorna el resultado de la comparación para la fila row"""
+        if self.head_index > 0:
+            return self.test(row[self.head_index])
+        # for using [= ]= with index you don't have to consider []
+        return self.test(row[0].replace("[", "").replace("]", ""))
+
+
+class QueryStats:
+    """ clase QueryStats contadores de las comparaciones evaluadas por el método matches de un CompiledQuery
+    al que se le pasan, se obtiene con el método new_stats de CompiledQuery y cada búsqueda ocupa uno propio
+    (las búsquedas con cache='columnar' evalúan columnas completas y no los actualizan), si la query solo tiene
+    conectores & o solo | el orden en que se evalúan sus condiciones no cambia el resultado por lo que cada
+    _REORDER_ROWS filas se ordenan según su costo y la fracción de filas que cumplen cada una
+
+    Argumentos de iniciación:
+
+    - conditions tuple de QueryCondition de la query
+
+    - chain el conector de la query si solo tiene un tipo de conector (& o |) o None
+
+    Atributos (propiedades):
+
+    - rows número de filas comprobadas
+
+    - evaluations número de comparaciones evaluadas, las demás no se evaluaron porque el resultado de la fila
+    ya se conocía (ver skipped)
+
+    - skipped número de comparaciones que no se evaluaron comparado con evaluar todas en cada fila
+
+    - tested número de veces que se evaluó cada condición (en el orden de la query, solo con un tipo de conector)
+
+    - passed número de veces que cada condición fue verdadera (en el orden de la query, solo con un tipo
+    de conector)
+
+    - order orden en que se evalúan las condiciones (con los dos tipos de conectores se evalúan en el orden
+    de la query)
+    """
+
+    def __init__(self, conditions: tuple[QueryCondition, ...] = (), chain: str | None = None) -> None:
+        self.conditions: tuple[QueryCondition, ...] = conditions
+        self.chain: str | None = chain
+        self.reset()
+
+    def reset(self) -> None:
+        """ método publico reset vuelve a cero los contadores y ordena las condiciones de menor a mayor costo"""
+        self.__rows: int = 0
+        self.__evaluations: int = 0
+        self.__tested: list[int] = [0] * len(self.conditions)
+        self.__passed: list[int] = [0] * len(self.conditions)
+        self.order: list[int] = sorted(range(len(self.conditions)), key=lambda position: self.conditions[position].cost)
+        # the matches method of the conditions in the order they are evaluated
+        self.sequence: list[Callable[[list[str]], bool]] = [self.conditions[position].matches for position in self.order]
+        # number of rows decided by the condition in each position of order (the last one are the rows that
+        # no condition decided), the counters of each condition are only updated when they are needed, with
+        # both kinds of connectors it is the number of rows in which 1, 2, ... conditions were evaluated
+        self.decided: list[int] = [0] * (len(self.conditions) + 1)
+        self.countdown: int = _REORDER_ROWS
+
+    @property
+    def rows(self) -> int:
+        self.__flush()
+        return self.__rows
+
+    @property
+    def evaluations(self) -> int:
+        self.__flush()
+        return self.__evaluations
+
+    @property
+    def skipped(self) -> int:
+        return self.rows * len(self.conditions) - self.evaluations
+
+    @property
+    def tested(self) -> list[int]:
+        self.__flush()
+        return list(self.__tested)
+
+    @property
+    def passed(self) -> list[int]:
+        self.__flush()
+        return list(self.__passed)
+
+    def reorder(self) -> None:
+        """ método publico reorder ordena las condiciones según la fracción de filas que cumplieron cada una
+        dividida por su costo, con & primero la que es falsa más seguido y con | la que es verdadera más seguido"""
+        self.__flush()
+        any_true: bool = self.chain == "|"
+
+        def rank(position: int) -> float:
+            tested: int = self.__tested[position]
+            pass_rate: float = self.__passed[position] / tested if tested else 0.5
+            return self.conditions[position].cost / max(pass_rate if any_true else 1 - pass_rate, 0.001)
+        self.order.sort(key=rank)
+        self.sequence = [self.conditions[position].matches for position in self.order]
+        self.countdown = _REORDER_ROWS
+
+    def __flush(self) -> None:
+        """ método privado flush actualiza los contadores de cada condición con las filas de decided, las
+        condiciones evaluadas antes de la que decidió el resultado no lo decidieron (con & fueron verdaderas
+        y con | falsas)"""
+        any_true: bool = self.chain == "|"
+        for slot, rows in enumerate(self.decided):
+            if not rows:
+                continue
+            if self.chain is None:
+                self.__rows += rows
+                self.__evaluations += rows * (slot + 1)
+                self.decided[slot] = 0
+                continue
+            for evaluated, position in enumerate(self.order[:slot + 1]):
+                self.__tested[position] += rows
+                if (evaluated == slot) == any_true:
+                    self.__passed[position] += rows
+            self.__rows += rows
+            self.__evaluations += rows * min(slot + 1, len(self.order))
+            self.decided[slot] = 0
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """ clase CompiledQuery plan inmutable de una query de búsqueda, se obtiene con el método
+    compile_query de SingleCsvManager y puede ser pasado a leer_datos_csv y borrar_datos en vez de la
+    query en str para no tener que volver a analizarla
+
+    - query str original de la query
+
+    - header encabezado del csv para el cual fue compilada
+
+    - except_col tuple con la posición de las columnas que no se muestran en el resultado
+
+    - conditions tuple de QueryCondition en el orden de la query
+
+    - connectors tuple con los operadores (| o &) entre cada condición, se aplican de izquierda a derecha
+
+    - function tuple con la función de la query y su columna (por ejemplo ('AVG', 'age')) o None, si la query
+    tiene varias funciones es la primera
+
+    - functions tuple con todas las funciones de la query y sus columnas (por ejemplo ~SUM:age,COUNT: es
+    (('SUM', 'age'), ('COUNT', ''))) o un tuple vacío si no tiene funciones
+
+    - group nombre de la columna por la cual se agrupan las filas cuando la query tiene GROUP (por ejemplo
+    ~GROUP:city:AVG:age), en ese caso functions son las funciones que se calculan para cada grupo, o None
+
+    - limit número de filas a entregar de ASC o DESC cuando la query termina con ~LIMIT (por ejemplo
+    ~DESC:age~LIMIT:10) o None si se entregan todas
+
+    - error str con el error de sintaxis de la query o None si no tiene errores
+
+    - types tuple con el tipo de cada columna del csv para el cual fue compilada o None si no se
+    conocían los tipos (las comparaciones prueban convertir cada valor a float, fecha y str)
+
+    - chain el conector de la query si solo tiene un tipo de conector (& o |) o None, en ese caso el orden
+    en que se evalúan sus condiciones no cambia el resultado
+
+    - sequence tuple con el método matches de cada condición ordenadas de menor a mayor costo
+
+    El plan no guarda el estado de ninguna búsqueda, los contadores y el orden de las condiciones que ocupa
+    una búsqueda están en el QueryStats (ver new_stats) que se le pasa a matches
+    """
+    query: str
+    header: tuple[str, ...]
+    except_col: tuple[int, ...] = ()
+    conditions: tuple[QueryCondition, ...] = ()
+    connectors: tuple[str, ...] = ()
+    function: tuple[str, str] | None = None
+    error: str | None = None
+    types: tuple[str | None, ...] | None = None
+    limit: int | None = None
+    functions: tuple[tuple[str, str], ...] = ()
+    group: str | None = None
+    chain: str | None = field(init=False, repr=False, compare=False)
+    sequence: tuple[Callable[[list[str]], bool], ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # the conditions can be sorted if the query has a single kind of connector
+        object.__setattr__(self, "chain", self.connectors[0] if len(set(self.connectors)) == 1 else None)
+        object.__setattr__(self, "sequence", tuple(
+            condition.matches for condition in sorted(self.conditions, key=lambda condition: condition.cost)))
+
+    def new_stats(self) -> QueryStats:
+        """ método publico new_stats retorna un QueryStats nuevo para contar las comparaciones de una búsqueda
+        con esta query (se pasa a matches)"""
+        return QueryStats(self.conditions, self.chain)
+
+    def value_casts(self, head_index: int) -> tuple[Callable, ...]:
+        """ método publico value_casts retorna las conversiones que se deben probar (en orden) para
+        comparar o acumular los valores de la columna en la posición head_index"""
+        if self.types is None or head_index >= len(self.types):
+            return _CASCADE_CASTS
+        return _TYPE_CASTS.get(self.types[head_index], _CASCADE_CASTS)
+
+    def matches(self, row: list[str], stats: QueryStats | None = None) -> bool:
+        """ método publico matches retorna True si la fila row cumple con las condiciones de la query, si se
+        pasa stats (ver new_stats) se cuentan en él las comparaciones evaluadas y con un solo tipo de conector
+        las condiciones se evalúan en su orden, sin stats se evalúan de menor a mayor costo"""
+        if self.chain is not None:
+            if stats is None:
+                if self.chain == "|":
+                    return any(matches(row) for matches in self.sequence)
+                return all(matches(row) for matches in self.sequence)
+            return self.__chain_matches(row, self.chain == "|", stats)
+        # the connectors are applied from left to right so once the result is True before a | or
+        # False before a & the next condition can't change it
+        current_value: bool = self.conditions[0].matches(row)
+        evaluations: int = 0
+        for connector, condition in zip(self.connectors, self.conditions[1:]):
+            if (connector == "|") == current_value:
+                continue
+            current_value = condition.matches(row)
+            evaluations += 1
+        if stats is not None:
+            stats.decided[evaluations] += 1
+        return current_value
+
+    def __chain_matches(self, row: list[str], any_true: bool, stats: QueryStats) -> bool:
+        """ método privado chain_matches evalúa una query en que todos los conectores son | (any_true) o
+        todos son &, las condiciones se evalúan en el orden de stats hasta que una decide el resultado"""
+        stats.countdown -= 1
+        if not stats.countdown:
+            stats.reorder()
+        slot: int = 0
+        if any_true:
+            for matches in stats.sequence:
+                if matches(row):
+                    stats.decided[slot] += 1
+                    return True
+                slot += 1
+        else:
+            for matches in stats.sequence:
+                if not matches(row):
+                    stats.decided[slot] += 1
+                    return False
+                slot += 1
+        stats.decided[-1] += 1
+        return not any_true
+
+
+@lru_cache(maxsize=128)
+def _compile_query(query: str, header: tuple[str, ...],
+                   types: tuple[str | None, ...] | None = None) -> CompiledQuery | None:
+    """ función privada _compile_query analiza la query una sola vez por encabezado y tipos de columnas
+    y retorna su CompiledQuery o None si query no es una query valida (se busca como texto)"""
+    tokens: list = _parse_query(query, header)
+    if not tokens:
+        return None
+    except_col: tuple[int, ...] = tokens.pop(0) if isinstance(tokens[0], tuple) else ()
+    function: tuple[str, str] | None = None
+    functions: tuple[tuple[str, str], ...] = ()
+    group: str | None = None
+    limit: int | None = None
+    if tokens and isinstance(tokens[-1], str):
+        function_token, _, top_limit = tokens.pop().partition("~LIMIT:")
+        if function_token.startswith("GROUP:"):
+            _, group, function_token = function_token.split(":", 2)
+        functions = tuple((operand, column) for operand, column, *_ in
+                          (function_item.split(":") for function_item in function_token.split(",")))
+        function = functions[0]
+        # as with LIMIT alone a limit of 0 returns every row
+        limit = int(top_limit) or None if top_limit else None
+    conditions: list[QueryCondition] = []
+    connectors: list[str] = []
+    error: str | None = None if tokens else "error de sintaxis"
+    for element in tokens:
+        if isinstance(element, list):
+            head_index: int = header.index(element[0])
+            test = _condition_test(element[1], element[2],
+                                   types[head_index] if types and head_index < len(types) else None)
+            if isinstance(test, str):
+                error = error or test
+                continue
+            column_type: str | None = types[head_index] if types and head_index < len(types) else None
+            cost: int = _OPERATOR_COSTS.get(element[1], 2 if column_type in ("int", "float", "date", "str") else 3)
+            conditions.append(QueryCondition(element[0], head_index, element[1], element[2], test, cost))
+        else:
+            connectors.append(element)
+    return CompiledQuery(query, header, except_col, tuple(conditions), tuple(connectors), function, error, types, limit,
+                         functions, group)
+
+
+def _update_arguments(argument: str) -> list[tuple[Callable, float | int | str]]:
+    """ función privada _update_arguments retorna las conversiones que se prueban en orden sobre el valor de la
+    columna en una función %ADD, %SUB, %MUL o %DIV (float, fecha y str) junto con el argumento ya convertido
+    al tipo que le corresponde (float, número de días o str), se omiten las que el argumento no acepta
+    """
+    arguments: list[tuple[Callable, float | int | str]] = []
+    for value_cast, argument_cast in ((float, float), (date.fromisoformat, int), (str, str)):
+        try:
+            arguments.append((value_cast, argument_cast(argument)))
+        except ValueError:
+            pass
+    return arguments
+
+
+def _update_operation(position: int, new_val: str | list[str], head: list[str] | tuple[str, ...],
+                      map_values: dict | None = None) -> Callable[[list[str], int], str | list[str]]:
+    """ función privada _update_operation convierte el valor o la función con que se actualiza una columna en
+    una query UPDATE en una función que recibe la fila y su INDICE (número) y retorna el nuevo valor de la columna
+    o una lista con los errores por los que no se pudo actualizar, las columnas de USE:~ y %COPY:~ y los
+    argumentos de las funciones se obtienen y convierten una sola vez
+
+    Argumentos:
+
+    - position la posición en el encabezado de la columna a actualizar
+
+    - new_val str con el valor o la función sin argumentos o una lista con la función y sus argumentos
+
+    - head el encabezado del csv
+
+    - map_values el dict que ocupa %MAP-VALUE, si no es dict la función retorna un error para cada fila
+    """
+    if isinstance(new_val, str):
+        if (change_case := _CASE_FUNCTIONS.get(new_val)) is not None:
+            return lambda row, current_row: change_case(row[position])
+        elif new_val == "%MAP-VALUE":
+            if isinstance(map_values, dict):
+                return lambda row, current_row: map_values.get(row[position], row[position])
+            not_dict: str = (f"para poder aplicar la función {new_val} map_values debe ser un dict con los valores "
+                             f"a ocupar pero fue {type(map_values).__name__}")
+            return lambda row, current_row: [not_dict]
+        # NAN AND INF DO NOT PASS THIS TRY THEY RAISE VALUE ERROR
+        elif new_val in ("%CEIL", "%FLOOR"):
+            rounding: Callable[[float], int] = ceil if new_val == "%CEIL" else floor
+
+            def round_value(row: list[str], current_row: int) -> str | list[str]:
+                try:
+                    return str(rounding(float(row[position])))
+                except ValueError:
+                    return [f"solo es posible aplicar la función {new_val} a números y su valor fue {row[position]}"]
+            return round_value
+        # using regex is better for case insensitive col name reference handling
+        elif (copy_value := re.search(r"^%COPY:~(.+)$", new_val)) is not None:
+            if (target_copy := copy_value.group(1).upper()) not in head:
+                return lambda row, current_row: [
+                    ("la función %COPY solo se puede usar para copiar el valor de una columna a otra para lo cual "
+                     f"debe seleccionar el nombre de una columna, su valor fue {target_copy} pero las opciones son {head[1:]} "
+                     f"entrada [{current_row}] no actualizada")]
+            source: int = head.index(target_copy)
+            if target_copy == "INDICE":
+                return lambda row, current_row: row[source].replace("[", "").replace("]", "")
+            return lambda row, current_row: row[source]
+        return lambda row, current_row: new_val
+    function_name: str = new_val[0]
+    if function_name == "%REPLACE":
+        old, new = new_val[1], new_val[-1] if new_val[-1] != "%VOID" else ""
+        return lambda row, current_row: row[position].replace(old, new)
+    elif function_name == "%RANDOM-INT":
+        try:
+            limits: list[int] = sorted((int(new_val[1]), int(new_val[-1])))
+        except ValueError:
+            return lambda row, current_row: [
+                ("para usar la función %RANDOM-INT debe pasar dos números enteros como limites inferior "
+                 f"y superior pero introdujo {new_val[1]} y {new_val[-1]} entrada [{current_row}] no actualizada")]
+        return lambda row, current_row: str(randint(*limits))
+    elif function_name == "%NUM-FORMAT":
+        try:
+            digits: int | None = int(new_val[-1])
+        except ValueError:
+            digits = None
+
+        def format_value(row: list[str], current_row: int) -> str | list[str]:
+            errors: list[str] = []
+            try:
+                number: float = float(row[position])
+            except ValueError:
+                errors.append("para usar la función %NUM-FORMAT debe ocupar una columna que contenga valores decimales "
+                              f"o enteros pero el valor fue de tipo {type(row[position]).__name__}")
+            if digits is None:
+                errors.append("para usar la función %NUM-FORMAT debe pasar como argumento un número entero "
+                              f"pero el valor fue de tipo {type(new_val[-1]).__name__}")
+            if errors:
+                return errors
+            # consider for future release a config file to
+            # allow easier manipulation of global variables like 25
+            # (formatting limit for float)
+            # PASSING 0 TO %INT-FORMAT IS LIKE USING %CEIL range is 1 to 25
+            # since we already have a floor function
+            if not (25 >= digits > 0):
+                return [f"el segundo argumento para la función %NUM-FORMAT debe ser un número entre 1 y 25 pero fue {digits}"]
+            return f"{number:.{digits}f}"
+        return format_value
+    operation: Callable = _ARITHMETIC_FUNCTIONS[function_name]
+    # this code is for allowing to do arithmetics with another value of the same row
+    if (use_another := re.search(r"^USE:~(.+)$", new_val[-1])) is not None:
+        # to not consider the index
+        if (other_col_val := use_another.group(1).upper()) not in head[1:]:
+            not_column: str = ("el selector USE:~ solo se puede usar para pasar como argumento el valor de otra columna en la fila a la función "
+                               f"seleccionada por lo que el valor debe ser el nombre de una columna ({head[1:]}) pero fue {other_col_val}")
+            return lambda row, current_row: [not_column]
+        other_col: int | None = head.index(other_col_val)
+        arguments: list[tuple[Callable, float | int | str]] = []
+    else:
+        other_col, arguments = None, _update_arguments(new_val[-1])
+
+    def calculate(row: list[str], current_row: int) -> str | list[str]:
+        # you can do operations between dates but is better to do operations
+        # between dates and numbers since you can't sum dates but you can sum and
+        # subtract numbers from dates
+        for value_cast, argument in arguments if other_col is None else _update_arguments(row[other_col]):
+            try:
+                current_value: float | date | str = value_cast(row[position])
+            except ValueError:
+                continue
+            if isinstance(current_value, float):
+                # nan and inf operations are defined internally for float
+                return str(operation(current_value, argument))
+            elif isinstance(current_value, date):
+                if function_name not in ("%ADD", "%SUB"):
+                    return [("solo es posible aplicar una función %ADD o %SUB sobre una fecha "
+                             f"y su elección fue {function_name} entrada [{current_row}] no actualizada")]
+                elif not 0 < argument <= 1_000:
+                    return [("superado el número de días que se puede añadir o restar a una fecha "
+                             f"(entre 1 y 1000) ya que su valor fue {argument} entrada [{current_row}] no actualizada")]
+                return str(operation(current_value, timedelta(days=argument)))
+            elif function_name != "%ADD":
+                return [("no se puede aplicar una función que no sea %ADD sobre un str "
+                         f"y su elección fue {function_name} entrada [{current_row}] no actualizada")]
+            return current_value + argument
+        # every value can be used as str
+        return row[position]
+    return calculate
+
+
+@dataclass(frozen=True)
+class UpdateOperation:
+    """ clase UpdateOperation representa la actualización ya compilada de una columna en una query UPDATE
+    ('"<nombre_columna>"=<valor o función>')
+
+    - column nombre de la columna en mayúsculas
+
+    - position posición de la columna en el encabezado
+
+    - new_val el valor o la función tal como fue extraída de la query (una lista si la función tiene argumentos)
+
+    - apply función que recibe la fila y su INDICE (número) y retorna el nuevo valor o una lista de errores
+    (ver _update_operation)
+    """
+    column: str
+    position: int
+    new_val: str | tuple[str, ...]
+    apply: Callable[[list[str], int], str | list[str]] = field(repr=False, compare=False)
+
+
+class ColumnarSnapshot:
+    """ clase ColumnarSnapshot copia en memoria de un archivo csv guardada por columnas, es ocupada por
+    SingleCsvManager cuando se inicia con cache='columnar' para responder las búsquedas sin volver a leer
+    el archivo
+
+    Cada comparación de una query se evalúa sobre toda su columna obteniendo una mascara (un bool por fila)
+    y las mascaras se combinan con | y & de izquierda a derecha, la conversión de una columna a float o fecha
+    se realiza una sola vez la primera vez que se necesita
+
+    Argumentos de iniciación:
+
+    - file_path la ruta del archivo csv
+
+    - delimiter el delimitador del archivo csv
+
+    - signature tuple con el tamaño y fecha de modificación del archivo y el número de filas borradas
+    usados para saber si la copia sigue vigente
+
+    - types tuple con el tipo de cada columna (ver SingleCsvManager)
+
+    - tombstones números de las filas borradas que siguen en el archivo (ver lazy_delete de SingleCsvManager),
+    estas no se copian y el INDICE de las demás filas pasa a ser su posición entre las filas copiadas
+    """
+
+    def __init__(self, file_path: Path, delimiter: str, signature: tuple[int, ...],
+                 types: tuple[str | None, ...], tombstones: Collection[int] = ()) -> None:
+        with open(file_path, "r", newline="", encoding="utf-8") as csv_reader:
+            rows: list[list[str]] = list(_csv_rows(csv_reader, delimiter))
+        if tombstones and rows:
+            tombstones = set(tombstones)
+            rows = [rows[0], *([f"[{count}]", *row[1:]] for count, row in enumerate(
+                (row for position, row in enumerate(rows[1:], start=1) if position not in tombstones), start=1))]
+        self.signature: tuple[int, ...] = signature
+        self.types: tuple[str | None, ...] = types
+        self.header: list[str] = rows[0] if rows else []
+        # the rows can only be stored as columns if all of them have a value for each column
+        self.valid: bool = bool(self.header) and all(len(row) == len(self.header) for row in rows)
+        # the same str is shared by all the rows that have that value
+        self.columns: list[list[str]] = ([list(map(sys.intern, column)) for column in zip(*rows[1:])]
+                                         or [[] for _ in self.header]) if self.valid else []
+        # conversions of the columns made when needed (float, date and the ones used by numpy)
+        self.__conversions: dict[tuple[str, int], tuple] = {}
+        self.__index_values: list[str] | None = None
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def reader(self) -> Iterator[list[str]]:
+        """ método publico reader retorna un iterador con el encabezado y todas las filas (como listas nuevas)
+        igual que si se leyera el archivo con csv.reader"""
+        return chain((list(self.header),), map(list, zip(*self.columns)))
+
+    def select(self, mask) -> Iterator[list[str]]:
+        """ método publico select retorna un iterador con las filas (como listas nuevas) cuyo valor en mask
+        (obtenida con mask o numpy_mask) es True"""
+        return map(list, compress(zip(*self.columns), mask))
+
+    def mask(self, compiled: CompiledQuery) -> list[bool]:
+        """ método publico mask retorna una lista con un bool por fila que indica si la fila cumple
+        con las condiciones de compiled"""
+        current: list[bool] = self.__condition_mask(compiled.conditions[0])
+        for connector, condition in zip(compiled.connectors, compiled.conditions[1:]):
+            current = list(map(or_ if connector == "|" else and_, self.__condition_mask(condition), current))
+        return current
+
+    def numpy_mask(self, compiled: CompiledQuery) -> "np.ndarray":
+        """ método publico numpy_mask igual que mask pero cada comparación se evalúa con operaciones de numpy
+        sobre toda la columna, retorna un array de bool (requiere que numpy este instalado)"""
+        current = self.__numpy_condition(compiled.conditions[0])
+        for connector, condition in zip(compiled.connectors, compiled.conditions[1:]):
+            current = (np.logical_or if connector == "|" else np.logical_and)(self.__numpy_condition(condition), current)
+        return current
+
+    def numpy_aggregate(self, operation: str, head_index: int, mask: "np.ndarray") -> float | int | None:
+        """ método publico numpy_aggregate calcula AVG, SUM, MIN o MAX de la columna head_index para las filas
+        seleccionadas en mask con el mismo resultado que al acumular fila por fila, retorna None si la columna
+        no es numérica (en ese caso se debe acumular fila por fila)
+        """
+        floats, is_float = self.__converted(head_index, "float")
+        if is_float is not True:
+            return None
+        selected = np.frombuffer(floats, dtype=np.float64)[mask]
+        if operation in ("SUM", "AVG"):
+            if not selected.size:
+                return 0
+            # cumsum adds the values in order like the row by row sum (np.sum does not)
+            total = float(np.cumsum(selected)[-1])
+            return total if operation == "SUM" else total / selected.size
+        # nan is never bigger or smaller than the current value
+        selected = selected[~np.isnan(selected)]
+        if not selected.size:
+            return float("-inf") if operation == "MAX" else float("inf")
+        # the first of the repeated values like when comparing row by row
+        return float(selected[np.argmax(selected) if operation == "MAX" else np.argmin(selected)])
+
+    def __numpy_condition(self, condition: QueryCondition) -> "np.ndarray":
+        """ método privado numpy_condition retorna el resultado de la comparación condition para cada fila
+        como un array de bool"""
+        values: list[str] = self.__values(condition.head_index)
+        operator: str = condition.operator
+        if (compare := _COMPARISON_OPERATORS.get(operator)) is not None:
+            try:
+                number: float | None = float(condition.operand)
+            except ValueError:
+                number = None
+            try:
+                day: int | None = date.fromisoformat(condition.operand).toordinal()
+            except ValueError:
+                day = None
+            floats, is_float = self.__converted(condition.head_index, "float") if number is not None else (None, False)
+            if is_float is True:
+                return compare(np.frombuffer(floats, dtype=np.float64), number)
+            dates, is_date = self.__converted(condition.head_index, "date") if day is not None else (None, False)
+            if is_date is True and is_float is False:
+                return compare(np.frombuffer(dates, dtype=np.int64), day)
+            # same order as the comparison of a single value float, date and str
+            result = compare(np.array(values, dtype=object), condition.operand).astype(bool)
+            if is_date is not False:
+                by_date = compare(np.frombuffer(dates, dtype=np.int64), day)
+                result = by_date if is_date is True else np.where(np.frombuffer(is_date, dtype=np.bool_), by_date, result)
+            if is_float is not False:
+                by_float = compare(np.frombuffer(floats, dtype=np.float64), number)
+                result = np.where(np.frombuffer(is_float, dtype=np.bool_), by_float, result)
+            return result
+        if ((text := self.__numpy_text(condition.head_index)) is not None and condition.operand.isascii()
+                and "\x00" not in condition.operand):
+            if operator in ("[=", "]=", "[]", "]["):
+                lowered: str = condition.operand.lower()
+                if (key := ("lower", condition.head_index)) not in self.__conversions:
+                    self.__conversions[key] = np.char.lower(text), True
+                lower_text = self.__conversions[key][0]
+                if operator == "[=":
+                    return np.char.startswith(lower_text, lowered)
+                elif operator == "]=":
+                    return np.char.endswith(lower_text, lowered)
+                found = np.char.find(lower_text, lowered) >= 0
+                return found if operator == "[]" else ~found
+            elif operator in ("<>", "><", "<<", ">>"):
+                try:
+                    size = int(condition.operand)
+                except ValueError:
+                    return np.zeros(len(values), dtype=bool)
+                length_compare: Callable = {"<>": eq, "><": ne, ">>": gt, "<<": lt}[operator]
+                return length_compare(np.char.str_len(text), size)
+            elif (match_group := _RANGE_REGEX.match(condition.operand)) is not None:
+                range_values = list(filter(None, match_group.group(2).split(match_group.group(1))))
+                found = np.isin(text, np.array(range_values, dtype=str)) if range_values else np.zeros(len(values), dtype=bool)
+                return found if operator == "{}" else ~found
+        return np.fromiter(map(condition.test, values), dtype=bool, count=len(values))
+
+    def __numpy_text(self, head_index: int) -> "np.ndarray | None":
+        """ método privado numpy_text retorna los valores de la columna como un array de str de numpy, solo si
+        todos son ascii y sin caracteres nulos (los str de numpy eliminan los nulos al final), de lo contrario None
+        """
+        if (key := ("text", head_index)) not in self.__conversions:
+            values: list[str] = self.__values(head_index)
+            joined: str = "".join(values)
+            self.__conversions[key] = (np.array(values, dtype=str) if joined.isascii() and "\x00" not in joined
+                                       else None), True
+        return self.__conversions[key][0]
+
+    def __values(self, head_index: int) -> list[str]:
+        """ método privado values retorna los valores de la columna tal como se comparan en una query"""
+        if head_index > 0:
+            return self.columns[head_index]
+        if self.__index_values is None:
+            # for using [= ]= with index you don't have to consider []
+            self.__index_values = [value.replace("[", "").replace("]", "") for value in self.columns[0]]
+        return self.__index_values
+
+    def __converted(self, head_index: int, kind: str) -> tuple[array, bytearray | bool]:
+        """ método privado converted retorna los valores de la columna convertidos a float (kind 'float') o
+        a fecha como ordinal (kind 'date') y una mascara de los valores que se pudieron convertir que es
+        True si se convirtieron todos y False si no se convirtió ninguno
+        """
+        if (key := (kind, head_index)) not in self.__conversions:
+            values: list[str] = self.__values(head_index)
+            column_type: str | None = self.types[head_index] if head_index < len(self.types) else None
+            convert: Callable = float if kind == "float" else lambda value: date.fromisoformat(value).toordinal()
+            converted: array = array("d" if kind == "float" else "q")
+            if (kind, column_type) in (("float", "int"), ("float", "float"), ("date", "date")):
+                converted.extend(map(convert, values))
+                self.__conversions[key] = converted, True
+            elif (kind, column_type) in (("float", "date"), ("float", "str"), ("date", "str")):
+                self.__conversions[key] = converted, False
+            else:
+                is_converted = bytearray(len(values))
+                for position, value in enumerate(values):
+                    try:
+                        converted.append(convert(value))
+                    except ValueError:
+                        converted.append(0)
+                    else:
+                        is_converted[position] = 1
+                self.__conversions[key] = converted, (True if all(is_converted) else
+                                                      bool(any(is_converted)) and is_converted)
+        return self.__conversions[key]
+
+    def __condition_mask(self, condition: QueryCondition) -> list[bool]:
+        """ método privado condition_mask retorna el resultado de la comparación condition para cada fila"""
+        values: list[str] = self.__values(condition.head_index)
+        if (compare := _COMPARISON_OPERATORS.get(condition.operator)) is None:
+            # the str, length and range operators don't convert the values
+            return list(map(condition.test, values))
+        # same order as the comparison of a single value float, date and str
+        try:
+            number: float | None = float(condition.operand)
+        except ValueError:
+            number = None
+        try:
+            day: int | None = date.fromisoformat(condition.operand).toordinal()
+        except ValueError:
+            day = None
+        floats, is_float = self.__converted(condition.head_index, "float") if number is not None else (None, False)
+        if is_float is True:
+            return list(map(compare, floats, repeat(number)))
+        dates, is_date = self.__converted(condition.head_index, "date") if day is not None else (None, False)
+        if is_float is False and is_date is True:
+            return list(map(compare, dates, repeat(day)))
+        elif is_float is False and is_date is False:
+            return list(map(compare, values, repeat(condition.operand)))
+        # the column has values of different types
+        is_float = is_float or bytes(len(values))
+        is_date = bytes([is_date]) * len(values) if isinstance(is_date, bool) else is_date
+        return [compare(floats[position], number) if is_float[position] else
+                compare(dates[position], day) if is_date[position] else compare(value, condition.operand)
+                for position, value in enumerate(values)]
+
+
+class SharedMapping:
+    """ clase SharedMapping archivo csv mapeado en memoria (mmap) en modo de solo lectura, es ocupado por
+    SingleCsvManager para buscar las filas como bytes y solo decodificar y separar en columnas las que se
+    entregan (al leer por INDICE, con un indice o al filtrar las filas de una búsqueda de texto)
+
+    Los generadores de una instancia de SingleCsvManager que leen al mismo tiempo comparten el mismo mapeo
+    mientras el archivo no cambie, el mapeo se cierra cuando el ultimo de ellos termina, el mapeo guarda el
+    número de filas y las posiciones del .meta del archivo mapeado por lo que los generadores lo pueden seguir
+    leyendo aunque otro proceso remplace el csv
+
+    Argumentos:
+
+    - file_path la ruta del archivo csv
+
+    - meta el dict del .meta del archivo (ver SingleCsvManager._build_meta)
+    """
+
+    def __init__(self, file_path: Path, meta: dict) -> None:
+        # size and modification date used to know if the mapping is still current
+        self.signature: tuple[int, int] = (meta["size"], meta["mtime_ns"])
+        self.rows: int = meta["rows"]
+        self.step: int = meta["step"]
+        # appending rows only adds offsets so the list can be shared with the .meta
+        self.offsets: list[int] = meta["offsets"]
+        # number of generators using the mapping
+        self.users: int = 0
+        # if the file only has ASCII characters, None until isascii is called
+        self.__ascii: bool | None = None
+        with open(file_path, "rb") as raw_reader:
+            # an empty file can't be mapped
+            self.data: mmap.mmap | bytes = (mmap.mmap(raw_reader.fileno(), 0, access=mmap.ACCESS_READ)
+                                            if os.fstat(raw_reader.fileno()).st_size else b"")
+
+    def records(self, offset: int = 0) -> Generator[tuple[int, bytes], None, None]:
+        """ método publico records envía las filas del archivo desde la posición en bytes offset (que debe ser
+        el inicio de una fila) igual que SingleCsvManager._raw_records (sin las lineas en blanco), el final de
+        cada fila se busca en el mapeo sin copiar las lineas que forman parte de la fila y la posición de lectura
+        del mapeo no se ocupa por lo que varios generadores pueden recorrerlo a la vez
+        """
+        data: mmap.mmap | bytes = self.data
+        end: int = len(data)
+        while offset < end:
+            stop: int = data.find(b"\n", offset) + 1 or end
+            record: bytes = data[offset:stop]
+            # an odd number of quotes means a quoted value is still open
+            while record.count(b'"') % 2 and stop < end:
+                stop = data.find(b"\n", stop) + 1 or end
+                record = data[offset:stop]
+            # blank lines are not rows (see _csv_rows)
+            if record.strip(b"\r\n"):
+                yield offset, record
+            offset = stop
+
+    def isascii(self) -> bool:
+        """ método publico isascii retorna True si el archivo solo tiene caracteres ASCII, se revisa una sola vez
+        por partes de _SCAN_CHUNK bytes para no copiar todo el archivo"""
+        if self.__ascii is None:
+            data: mmap.mmap | bytes = self.data
+            self.__ascii = all(data[start:start + _SCAN_CHUNK].isascii() for start in range(0, len(data), _SCAN_CHUNK))
+        return self.__ascii
+
+    def close(self) -> None:
+        """ método publico close cierra el mapeo"""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class FileLock:
+    """ clase FileLock bloqueo compartido (lecturas) o exclusivo (escrituras) de un archivo csv entre procesos
+    ocupando fcntl.flock sobre su archivo auxiliar .lock, el cual no se remplaza al reescribir el csv, es
+    ocupado por SingleCsvManager alrededor de cada lectura y escritura (ver file_lock)
+
+    Todas las instancias de SingleCsvManager de un proceso que ocupan el mismo archivo comparten la misma
+    instancia de FileLock (ver _FILE_LOCKS) por lo que dentro de un proceso los bloqueos solo se cuentan,
+    si fcntl no esta disponible (windows) los bloqueos solo se cuentan
+
+    flock no cambia un bloqueo compartido a exclusivo (ni al revés) de forma atómica, por lo que si el proceso
+    tiene el bloqueo compartido al empezar una escritura este se libera antes de esperar el exclusivo y otro
+    proceso puede modificar el archivo entre ambos (acquire retorna True para volver a cargar el .meta), lo mismo
+    ocurre al volver al compartido cuando termina la escritura, las lecturas y escrituras de SingleCsvManager
+    solo tienen el bloqueo mientras abren o reescriben el csv (ver locked_start) por lo que normalmente el
+    bloqueo no cambia de tipo
+
+    El bloqueo exclusivo también protege los archivos .wal de las transacciones, cada transacción crea su .wal
+    con el bloqueo y lo mantiene bloqueado mientras esta abierta (ver Transaction) y los .wal solo se revisan y
+    eliminan con el bloqueo (ver replay_wal)
+
+    El archivo .lock se mantiene abierto entre bloqueos para no tener que abrirlo en cada lectura o escritura,
+    si fue eliminado o remplazado (por ejemplo con delete_record) o si el proceso es una copia (fork) del que
+    lo abrió se vuelve a abrir ya que el bloqueo pertenece al archivo abierto (la copia tampoco tiene los
+    bloqueos que contaba el proceso original)
+
+    Argumento:
+
+    - lock_path la ruta del archivo .lock
+    """
+
+    def __init__(self, lock_path: Path) -> None:
+        self.lock_path: Path = lock_path
+        self.lock_file: TextIO | None = None
+        # process that opened lock_file
+        self.pid: int = os.getpid()
+        # number of reads and writes of the process that hold the lock
+        self.shared: int = 0
+        self.exclusive: int = 0
+
+    def acquire(self, exclusive: bool) -> bool:
+        """ método publico acquire obtiene el bloqueo compartido o exclusivo esperando a que los demás procesos
+        lo liberen y retorna True si el bloqueo se obtuvo del sistema operativo (no estaba bloqueado en este
+        proceso o paso de compartido a exclusivo), en ese caso otro proceso pudo haber modificado el archivo
+        """
+        if self.pid != os.getpid():
+            # a copy (fork) of the process does not hold the locks of the process that opened lock_file
+            self.shared = self.exclusive = 0
+        if self.exclusive or (self.shared and not exclusive):
+            self.__count(exclusive, 1)
+            return False
+        if fcntl is not None:
+            if not self.shared:
+                self.__open()
+            else:
+                # flock would also drop the shared lock before waiting, this makes it explicit (see FileLock)
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self.__count(exclusive, 1)
+        return True
+
+    def release(self, exclusive: bool) -> None:
+        """ método publico release libera el bloqueo obtenido con acquire, si todavía hay lecturas en el
+        proceso el bloqueo exclusivo vuelve a ser compartido (sin ser atómico, ver FileLock)
+        """
+        self.__count(exclusive, -1)
+        if self.exclusive or self.lock_file is None or (self.shared and not exclusive):
+            return
+        fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_UN)
+
+    def __open(self) -> None:
+        """ método privado open abre el archivo .lock si no esta abierto o si el archivo abierto ya no es el de
+        lock_path (los demás procesos bloquean el archivo nuevo)"""
+        if self.lock_file is not None:
+            try:
+                if self.pid == os.getpid() and os.path.samestat(os.fstat(self.lock_file.fileno()),
+                                                                os.stat(self.lock_path)):
+                    return
+            except FileNotFoundError:
+                pass
+            self.lock_file.close()
+        self.lock_file, self.pid = open(self.lock_path, "a", encoding="utf-8"), os.getpid()
+
+    def __count(self, exclusive: bool, step: int) -> None:
+        """ método privado count suma step al número de lecturas o escrituras que tienen el bloqueo"""
+        if exclusive:
+            self.exclusive += step
+        else:
+            self.shared += step
+
+
+# one FileLock for each .lock file used by the process
+_FILE_LOCKS: dict[str, FileLock] = {}
+
+
+class ExternalSort:
+    """ clase ExternalSort ordena las filas de una búsqueda con las funciones ~ASC o ~DESC sin tener que
+    guardarlas todas en memoria, cuando las filas guardadas superan el tamaño memory se ordenan y se escriben
+    en un archivo temporal (run) y al terminar los runs se combinan mientras se entregan las filas
+
+    El tipo de los valores de la columna con el que se ordena es la primera conversión de value_casts que
+    acepta todos los valores (se comprueba al agregar cada fila), si ninguna los acepta se prueban las demás
+    conversiones de _CASCADE_CASTS y al final los valores se comparan como str, igual que al ordenar todas las
+    filas en memoria, los runs que se ordenaron con una conversión que luego dejo de servir se vuelven a ordenar
+    uno a la vez. De las filas con el mismo valor en la columna solo se guarda la primera que se agrega (en
+    memoria solo se mantienen los valores distintos de la columna)
+
+    Argumentos de iniciación:
+
+    - column la posición de la columna en las filas que se agregan
+
+    - reverse si es True se ordena de mayor a menor (~DESC)
+
+    - value_casts las conversiones que se prueban en orden (ver CompiledQuery.value_casts)
+
+    - memory tamaño aproximado (suma del largo de los valores) de las filas que se ordenan en memoria
+    """
+
+    def __init__(self, column: int, reverse: bool, value_casts: tuple[Callable, ...], memory: int) -> None:
+        self.column: int = column
+        self.reverse: bool = reverse
+        # the first conversion accepted every value added until now, the others are checked when it fails,
+        # str accepts every value so there is always one
+        self.casts: list[Callable] = [*value_casts, *(cast for cast in _CASCADE_CASTS if cast not in value_casts)]
+        self.memory: int = memory
+        self.__values: set[str] = set()
+        self.__rows: list[list[str]] = []
+        self.__size: int = 0
+        # temporary files with the sorted runs and the conversion used to sort each one
+        self.__runs: list[tuple[TextIO, Callable]] = []
+
+    def add(self, row: list[str]) -> None:
+        """ método publico add agrega la fila row si su valor no se había agregado antes, si las filas guardadas
+        superan memory se escriben en un run"""
+        if (value := row[self.column]) in self.__values:
+            return
+        self.__values.add(value)
+        try:
+            self.casts[0](value)
+        except ValueError:
+            self.casts.pop(0)
+            while not self.__accepts_all(self.casts[0]):
+                self.casts.pop(0)
+        self.__rows.append(row)
+        self.__size += sum(map(len, row))
+        if self.__size > self.memory:
+            self.__spill()
+
+    def __accepts_all(self, cast: Callable) -> bool:
+        """ método privado accepts_all retorna True si cast puede convertir todos los valores agregados"""
+        try:
+            for value in self.__values:
+                cast(value)
+        except ValueError:
+            return False
+        return True
+
+    def __sort_key(self, cast: Callable) -> Callable[[list[str]], object]:
+        """ método privado sort_key retorna la función que obtiene el valor con el que se ordena una fila"""
+        return lambda row: cast(row[self.column])
+
+    def __spill(self) -> None:
+        """ método privado spill ordena las filas guardadas y las escribe en un nuevo run"""
+        cast: Callable = self.casts[0]
+        self.__rows.sort(key=self.__sort_key(cast), reverse=self.reverse)
+        run: TextIO = tempfile.TemporaryFile("w+", newline="", encoding="utf-8")
+        csv.writer(run).writerows(self.__rows)
+        self.__runs.append((run, cast))
+        self.__rows, self.__size = [], 0
+
+    def __read_run(self, run: TextIO) -> Iterator[list[str]]:
+        """ método privado read_run retorna un iterador con las filas de un run desde su inicio"""
+        run.seek(0)
+        return csv.reader(run)
+
+    def sorted_rows(self) -> Generator[list[str], None, None]:
+        """ método publico sorted_rows entrega las filas ordenadas, solo se puede ocupar una vez"""
+        cast: Callable = self.casts[0]
+        reverse: bool = self.reverse
+        key: Callable[[list[str]], object] = self.__sort_key(cast)
+        try:
+            if not self.__runs:
+                self.__rows.sort(key=key, reverse=reverse)
+                yield from self.__rows
+                return
+            for run, run_cast in self.__runs:
+                if run_cast is not cast:
+                    # only one run is in memory at a time
+                    rows: list[list[str]] = sorted(self.__read_run(run), key=key, reverse=reverse)
+                    run.seek(0)
+                    run.truncate()
+                    csv.writer(run).writerows(rows)
+                    del rows
+            self.__spill()
+            # with equal keys the rows of the first runs go first so the order in which they were added is kept
+            yield from merge(*(self.__read_run(run) for run, _ in self.__runs), key=key, reverse=reverse)
+        finally:
+            for run, _ in self.__runs:
+                run.close()
+            self.__runs, self.__rows, self.__values = [], [], set()
+
+
+class GroupAggregate:
+    """ clase GroupAggregate agrupa las filas de una búsqueda con ~GROUP por el valor de una columna y acumula
+    las funciones de la query para cada grupo (hash aggregation), si el número de grupos supera memory las filas
+    de los grupos nuevos se escriben en archivos temporales según el hash de su valor y cada archivo se agrupa
+    después por separado
+
+    Argumentos de iniciación:
+
+    - column la posición de la columna por la cual se agrupa en las filas que se agregan
+
+    - new_states función que retorna una lista con el estado inicial y las conversiones de cada función de un
+    grupo nuevo
+
+    - update función que actualiza el estado de una función con una fila (recibe la fila, el estado y las
+    conversiones)
+
+    - memory número máximo de grupos que se guardan en memoria
+    """
+    # number of temporary files in which the rows of the groups that don't fit in memory are split
+    partitions: int = 16
+
+    def __init__(self, column: int, new_states: Callable[[], list[tuple[list, tuple[Callable, ...]]]],
+                 update: Callable[[list[str], list, tuple[Callable, ...]], object], memory: int,
+                 depth: int = 0) -> None:
+        self.column: int = column
+        self.new_states: Callable[[], list[tuple[list, tuple[Callable, ...]]]] = new_states
+        self.update: Callable[[list[str], list, tuple[Callable, ...]], object] = update
+        self.memory: int = max(memory, 1)
+        # the rows of a partition are split again with another hash if they still have too many groups
+        self.__depth: int = depth
+        self.__groups: dict[str, list[tuple[list, tuple[Callable, ...]]]] = {}
+        self.__partitions: list[TextIO] = []
+        self.__writers: list = []
+
+    def add(self, row: list[str]) -> None:
+        """ método publico add actualiza las funciones del grupo de la fila row o la escribe en un archivo
+        temporal si es de un grupo nuevo y ya no caben más grupos en memoria"""
+        value: str = row[self.column]
+        if (states := self.__groups.get(value)) is None:
+            if len(self.__groups) >= self.memory:
+                self.__spill(row)
+                return
+            states = self.__groups[value] = self.new_states()
+        for status, value_casts in states:
+            self.update(row, status, value_casts)
+
+    def __spill(self, row: list[str]) -> None:
+        """ método privado spill escribe la fila row en el archivo temporal que le corresponde a su grupo"""
+        if not self.__partitions:
+            self.__partitions = [tempfile.TemporaryFile("w+", newline="", encoding="utf-8")
+                                 for _ in range(self.partitions)]
+            self.__writers = [csv.writer(partition) for partition in self.__partitions]
+        self.__writers[hash((self.__depth, row[self.column])) % self.partitions].writerow(row)
+
+    def groups(self) -> Generator[tuple[str, list[list]], None, None]:
+        """ método publico groups entrega el valor de cada grupo junto al estado de sus funciones, primero los
+        grupos que estaban en memoria (en el orden en que aparecieron) y luego los de cada archivo temporal,
+        solo se puede ocupar una vez"""
+        try:
+            for value, states in self.__groups.items():
+                yield value, [status for status, _ in states]
+            self.__groups = {}
+            for partition in self.__partitions:
+                partition.seek(0)
+                grouped = GroupAggregate(self.column, self.new_states, self.update, self.memory, self.__depth + 1)
+                for row in csv.reader(partition):
+                    grouped.add(row)
+                yield from grouped.groups()
+        finally:
+            for partition in self.__partitions:
+                partition.close()
+            self.__groups, self.__partitions, self.__writers = {}, [], []
+
+
+class _Descending:
+    """ clase privada _Descending invierte el orden de un valor al compararlo (para guardar en un heap
+    las filas de mayor valor primero)"""
+    __slots__ = ("value",)
+
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+
+class TopRows:
+    """ clase TopRows obtiene las primeras limit filas de una búsqueda con ~ASC o ~DESC seguida de ~LIMIT
+    guardando solo esas filas en un heap (se ocupa en vez de ExternalSort cuando la columna tiene un solo tipo),
+    el resultado es el mismo que ordenar todas las filas y entregar las primeras limit, si un valor no se puede
+    convertir con cast las filas se ordenan comparando los valores como str (igual que ExternalSort) por lo que
+    también se guardan las primeras limit filas según su valor como str
+
+    Argumentos de iniciación:
+
+    - column la posición de la columna en las filas que se agregan
+
+    - reverse si es True se ordena de mayor a menor (~DESC)
+
+    - cast la conversión del tipo de la columna (ver CompiledQuery.value_casts)
+
+    - limit número de filas a entregar
+    """
+
+    def __init__(self, column: int, reverse: bool, cast: Callable, limit: int) -> None:
+        self.column: int = column
+        self.reverse: bool = reverse
+        self.cast: Callable = cast
+        self.limit: int = limit
+        # the rows kept by their key with cast (None once a value can't be converted) and by their value as str,
+        # each heap has the worst row kept first, (priority, -position, key, row) so with the same key the rows
+        # added first are kept, and the values of its rows
+        self.__heap: list[tuple] | None = None if cast is str else []
+        self.__values: set[str] = set()
+        self.__str_heap: list[tuple] = []
+        self.__str_values: set[str] = set()
+        self.__added: int = 0
+
+    def add(self, row: list[str]) -> None:
+        """ método publico add agrega la fila row si es una de las primeras limit filas ordenadas"""
+        value: str = row[self.column]
+        self.__added += 1
+        if self.__heap is not None:
+            try:
+                self.__push(self.__heap, self.__values, self.cast(value), row)
+            except ValueError:
+                # only the rows kept by their value as str are left
+                self.cast, self.__heap, self.__values = str, None, set()
+        self.__push(self.__str_heap, self.__str_values, value, row)
+
+    def __push(self, heap: list[tuple], values: set[str], key, row: list[str]) -> None:
+        """ método privado push guarda la fila row con la clave key en heap si es una de las primeras limit
+        filas y no hay otra fila con su valor"""
+        if len(heap) == self.limit:
+            # with the same key the row already kept goes first
+            if (key <= heap[0][2]) if self.reverse else (key >= heap[0][2]):
+                return
+            if (value := row[self.column]) in values:
+                return
+            values.discard(heap[0][3][self.column])
+            heapreplace(heap, (key if self.reverse else _Descending(key), -self.__added, key, row))
+        else:
+            if (value := row[self.column]) in values:
+                return
+            heappush(heap, (key if self.reverse else _Descending(key), -self.__added, key, row))
+        values.add(value)
+
+    def sorted_rows(self) -> Generator[list[str], None, None]:
+        """ método publico sorted_rows entrega las filas ordenadas"""
+        # the sort is stable so the rows with the same key stay in the order they were added
+        entries: list[tuple] = sorted(self.__str_heap if self.__heap is None else self.__heap,
+                                      key=lambda entry: -entry[1])
+        entries.sort(key=lambda entry: entry[2], reverse=self.reverse)
+        for entry in entries:
+            yield entry[3]
+
+
+class Transaction:
+    """ clase Transaction agrupa varias operaciones de borrado, actualización y escritura sobre el archivo csv
+    de una instancia de SingleCsvManager para aplicarlas juntas (ver SingleCsvManager.transaction), se
+    obtiene con el método transaction y no se debe crear directamente
+
+    Cada operación se guarda al momento de agregarla en un archivo auxiliar .wal propio de la transacción
+    (<nombre>.<id>.wal en el directorio del csv) y al terminar el bloque with se aplican todas en una sola
+    lectura del csv, en el orden en que se agregaron, como si se hubieran ocupado de a una los métodos del mismo
+    nombre de SingleCsvManager, si el bloque termina con una excepción ninguna operación se aplica
+
+    El .wal se crea con el bloqueo exclusivo del csv (ver FileLock) y queda bloqueado con fcntl.flock hasta que
+    la transacción termina, asi las demás instancias (de este u otro proceso) saben que sigue abierta y no lo
+    eliminan (ver SingleCsvManager.replay_wal)
+
+    Argumento:
+
+    - manager la instancia de SingleCsvManager sobre cuyo archivo se aplican las operaciones
+
+    Después de aplicar las operaciones el atributo results contiene una lista por operación con sus resultados:
+    las filas borradas (str) de borrar_datos, los dict de cada fila seleccionada de actualizar_datos y las
+    entradas guardadas (o mensajes de advertencia) de guardar_datos_csv y guardar_datos_csv_many
+    """
+
+    def __init__(self, manager: "SingleCsvManager") -> None:
+        self.manager: SingleCsvManager = manager
+        csv_path: Path = manager.instance_file_path
+        # the name is unique so other transactions of the same csv never write to it
+        self.wal_file: TextIO = tempfile.NamedTemporaryFile("w", encoding="utf-8", prefix=f"{csv_path.stem}.",
+                                                             suffix=".wal", dir=csv_path.parent, delete=False)
+        self.wal_path: Path = Path(self.wal_file.name)
+        if fcntl is not None:
+            # kept until the transaction ends, it tells replay_wal that the transaction is still open
+            fcntl.flock(self.wal_file.fileno(), fcntl.LOCK_EX)
+        # the operations as they are written to the .wal
+        self.operations: list[dict] = []
+        self.results: list[list] | None = None
+        self.closed: bool = False
+
+    def borrar_datos(self, delete_index) -> None:
+        """ método publico borrar_datos agrega a la transacción el borrado de las entradas seleccionadas, los
+        valores validos de delete_index son los de SingleCsvManager.borrar_datos excepto 'borrar todo' y
+        CompiledQuery
+
+        Excepciones:
+
+        - ValueError si delete_index no es un str con un formato valido o si la transacción ya termino
+        """
+        if not isinstance(delete_index, str):
+            raise ValueError(f"el argumento delete_index debe ser str pero fue {type(delete_index).__name__}")
+        if delete_index == "borrar todo":
+            raise ValueError("no es posible borrar todo dentro de una transacción")
+        if not isinstance(self.manager.return_pattern(delete_index), tuple) and re.search(r'^DELETE ON (.+?)$', delete_index) is None:
+            raise ValueError("utilize uno de los siguientes formatos para borrar una entrada:\n"
+                             "[n], [n:m], [n:], [n-m-p] (hasta 10) remplazando las letras por el indice\n"
+                             "de lo que desee eliminar o escribiendo una consulta usando la palabra clave DELETE para selecciones más complejas")
+        self.__record({"op": "delete", "query": delete_index})
+
+    def actualizar_datos(self, update_query, map_values=None) -> None:
+        """ método publico actualizar_datos agrega a la transacción la actualización de update_query, los
+        argumentos son los mismos de SingleCsvManager.actualizar_datos, los errores de las columnas o de la
+        búsqueda de la query se comprueban al aplicar la transacción
+
+        Excepciones:
+
+        - ValueError si update_query no es un str con la estructura de una query UPDATE o si la transacción ya termino
+        """
+        if not isinstance(update_query, str):
+            raise ValueError(
+                f"debe ingresar un str como instrucción para actualizar valores, pero se introdujo {type(update_query).__name__}")
+        if _UPDATE_QUERY_REGEX.search(update_query) is None:
+            raise ValueError("error de sintaxis")
+        # the values of map_values are compared as str so they can be saved in the .wal
+        self.__record({"op": "update", "query": update_query,
+                       "map_values": ({str(key): str(value) for key, value in map_values.items()}
+                                      if isinstance(map_values, dict) else None)})
+
+    def guardar_datos_csv(self) -> None:
+        """ método publico guardar_datos_csv agrega a la transacción una nueva entrada con los datos de
+        writer_instance de la instancia de SingleCsvManager (ver set_data)
+
+        Excepciones:
+
+        - ValueError si no se pasaron los datos de la entrada, si el objeto tiene atributos con nombres
+        distintos a las columnas del csv o si la transacción ya termino
+        """
+        if self.manager.writer_instance is None:
+            raise ValueError("para poder crear una nueva entrada primero debe pasar sus datos usando el método set_data")
+        self.guardar_datos_csv_many([self.manager.writer_instance])
+
+    def guardar_datos_csv_many(self, instances) -> None:
+        """ método publico guardar_datos_csv_many agrega a la transacción una entrada por cada objeto de
+        instances igual que SingleCsvManager.guardar_datos_csv_many (sin enforce_unique)
+
+        Excepciones:
+
+        - ValueError si algún objeto tiene atributos con nombres distintos a las columnas del csv, más
+        atributos que el máximo de columnas o no tiene __dict__ o si la transacción ya termino
+        """
+        self.__record({"op": "save", "rows": self.manager._entry_values(instances)})
+
+    def __record(self, operation: dict) -> None:
+        """ método privado record agrega la operación al final del archivo .wal"""
+        if self.closed:
+            raise ValueError("la transacción ya termino")
+        self.wal_file.write(f"{json.dumps(operation)}\n")
+        self.wal_file.flush()
+        self.operations.append(operation)
+
+    def _commit(self, commit: dict) -> None:
+        """ método privado _commit escribe en el .wal la linea commit que confirma la transacción y espera a que
+        llegue al disco, es ocupado por SingleCsvManager.transaction antes de aplicar las operaciones"""
+        self.wal_file.write(f"{json.dumps(commit)}\n")
+        self.wal_file.flush()
+        os.fsync(self.wal_file.fileno())
+
+    def _discard(self) -> None:
+        """ método privado _discard elimina el .wal y luego lo cierra (liberando su bloqueo) para que ninguna
+        otra instancia lo encuentre sin bloquear, es ocupado por SingleCsvManager.transaction al terminar"""
+        self.closed = True
+        self.wal_path.unlink(missing_ok=True)
+        self.wal_file.close()
+
+
 # IMPORTANTE PARA LEER Y ESCRIBIR A UN CSV QUE YA TENIA DATOS
 # DEBES PASAR ESE ARCHIVO USANDO EL MÉTODO DE CLASE INDEX PRIMERO
 # A SI SE COPIAN SUS DATOS AL BACKUP Y AL INICIAR LA CLASE EN FILE_NAME
@@ -378,21 +1984,114 @@ class SingleCsvManager(BaseCsvManager):
     de lectura, escritura, edición y borrado de los datos en un archivo csv
 
     Los argumentos de iniciación son los mismos que ocupa la clase BaseCsvManager, por lo que se
-    recomienda referirse a la documentación de esa clase para obtener más información
+    recomienda referirse a la documentación de esa clase para obtener más información, adicionalmente
+    se puede pasar el argumento cache:
+
+    - cache None o 'columnar', si es 'columnar' el archivo se lee una sola vez y se guarda en memoria por
+    columnas (ver ColumnarSnapshot) para responder las lecturas y búsquedas de leer_datos_csv, la copia se
+    vuelve a crear si el archivo cambia de tamaño o fecha de modificación o si la instancia escribe en él
+
+    - lazy_delete bool, si es True borrar_datos no reescribe el csv sino que guarda el número de las filas
+    borradas en un archivo auxiliar .tomb, las lecturas, búsquedas y actualizaciones omiten esas filas y
+    muestran el INDICE de las filas restantes como si el archivo hubiera sido reescrito, el csv se reescribe
+    sin esas filas con el método compact, al actualizar datos o automáticamente cuando las filas borradas
+    superan la fracción _compact_ratio de las filas del archivo
 
     Importante: para obtener la ruta absoluta del archivo csv que ocupa la instancia actual
     ocupe el atributo instance_file_path de esta clase o el padre de ella
+
+    Junto a cada csv se mantiene un archivo auxiliar .meta (json) con el número de filas, el encabezado,
+    el tamaño y la fecha de modificación del csv y la posición en bytes de una de cada _offset_step filas,
+    de esta forma al crear una instancia no es necesario leer todo el archivo, el .meta solo se reconstruye
+    si el csv fue modificado por fuera de esta clase. El .meta también guarda el tipo de cada columna
+    (int, float, date, str o mixed) para que las búsquedas comparen los valores directamente con el tipo de
+    su columna en vez de intentar convertir cada valor a float, fecha y str
+
+    Con el método create_index se puede crear un indice ordenado (archivo .idx) de una columna, las búsquedas
+    (también las de DELETE ON con lazy_delete y las de actualizar_datos) que comparan esa columna con =, >, >=,
+    < o <= y que solo unen sus comparaciones con & leen solo las filas que selecciona el indice si estas no
+    superan la fracción _index_ratio del archivo
+
+    Con el método transaction se pueden agrupar varios borrados, actualizaciones y escrituras que se guardan
+    en un archivo auxiliar .wal y se aplican juntos en una sola reescritura del csv, si el programa se detiene
+    mientras se aplican la transacción se vuelve a aplicar al crear una nueva instancia con el mismo archivo
     """
 
+    # cada cuantas filas se guarda su posición en bytes en el archivo .meta
+    _offset_step: int = 64
+    # fracción de filas borradas (en el .tomb) a partir de la cual borrar_datos reescribe el csv
+    _compact_ratio: float = 0.25
+    # fracción máxima de filas que puede seleccionar un indice ordenado (create_index) para ocuparlo,
+    # con más filas es más rápido leer todo el archivo
+    _index_ratio: float = 0.1
+    # tamaño aproximado (suma del largo de los valores) de las filas de ~ASC y ~DESC que se ordenan en memoria,
+    # las demás se ordenan en archivos temporales (ver ExternalSort)
+    _sort_memory: int = 8_000_000
+    # número de grupos de ~GROUP que se acumulan en memoria, las filas de los demás grupos se agrupan
+    # después desde archivos temporales (ver GroupAggregate)
+    _group_memory: int = 100_000
+
     def __init__(self, file_name: str, current_class: Type | None = None, delimiter: str = "|",
-                 exclude: None | tuple = None) -> None:
+                 exclude: None | tuple = None, cache: str | None = None, lazy_delete: bool = False) -> None:
         super().__init__(file_name, current_class, delimiter, exclude)
         self._create_folders(self.instance_file_path)
+        self._meta: dict = {}
+        # numbers (position in the csv) of the rows deleted with lazy_delete sorted from lowest to highest
+        self._tombstones: list[int] = []
+        self._tomb_signature: tuple[int, int] | None = None
+        # hash index of the columns used in enforce_unique (value -> number of rows with it) and the
+        # signature of the csv it belongs to
+        self._unique_index: dict[str, Counter] = {}
+        self._unique_signature: tuple[int, int, int] | None = None
+        # sorted indexes of create_index (column -> kind of key, keys and the rows with each key)
+        self._sorted_indexes: dict[str, dict] = {}
+        self._sorted_signature: tuple[int, int, int] | None = None
+        # standing aggregates of register_aggregate (query -> state of each function) and the signature
+        # of the csv they belong to
+        self._aggregates: dict[str, list[dict]] = {}
+        self._aggregates_signature: tuple[int, int, int] | None = None
+        # full text index of create_text_index (word -> positions of the rows with it, None if the csv has none),
+        # the signature of the csv it belongs to and its words sorted to find the ones with part of a search
+        self._text_index: dict[str, list[int]] | None = None
+        self._text_signature: tuple[int, int, int] | None = None
+        self._text_vocabulary: tuple[list[str], str, list[int]] | None = None
+        # the csv mapped in memory while one or more generators read it as bytes
+        self._mapping: SharedMapping | None = None
+        # the transaction of the with block of transaction
+        self._transaction: Transaction | None = None
+        # the counters of the last search with a query of leer_datos_csv (each search has its own)
+        self.query_stats: QueryStats | None = None
+        self.cache = cache
+        self.lazy_delete = lazy_delete
         # format the current file correctly
         # so the index col is as expected
         self.current_rows: int = self.__len__()
-        if self.current_rows:
-            self.new_head = tuple((val.upper() for val in next(self.leer_datos_csv())))
+        # the aggregates saved by other instances are kept up to date by this one too
+        self.__load_aggregates()
+        # a transaction that was committed but not applied (the program stopped) is applied now
+        with self.__file_lock(exclusive=True):
+            self.__replay_wal()
+
+    @property
+    def cache(self) -> str | None:
+        return self._cache
+
+    @cache.setter
+    def cache(self, value) -> None:
+        if value is not None and value != "columnar":
+            raise ValueError(f"el valor de cache debe ser None o 'columnar' pero fue {value}")
+        self._cache: str | None = value
+        self._snapshot: ColumnarSnapshot | None = None
+
+    @property
+    def lazy_delete(self) -> bool:
+        return self._lazy_delete
+
+    @lazy_delete.setter
+    def lazy_delete(self, value) -> None:
+        if not isinstance(value, bool):
+            raise ValueError(f"el valor de lazy_delete debe ser bool pero fue {type(value).__name__}")
+        self._lazy_delete: bool = value
 
     def guardar_datos_csv(self, enforce_unique=None) -> str:
         """ método publico guardar_datos_csv
@@ -405,7 +2104,9 @@ class SingleCsvManager(BaseCsvManager):
         si es tuple debe ser de la siguiente forma ('nombre_atributo',) para un atributo y
         ('nombre_atributo1', 'nombre_atributo2', 'nombre_atributo3') para multiples ideal si se guardan
         atributos de solo una clase o un conjunto de clases con un padre y atributos en común, si su
-        valor es None no se chequea que el atributo deba ser único
+        valor es None no se chequea que el atributo deba ser único, la entrada esta presente si el valor
+        (como str) de alguno de los atributos ya esta en su columna, para esto se mantiene en memoria un
+        indice hash con los valores de cada columna ocupada (ver save_unique_index)
 
         Valor de retorno:
 
@@ -416,135 +2117,328 @@ class SingleCsvManager(BaseCsvManager):
 
         Excepciones:
 
-        - ValueError si el valor del argumento no es el apropiado o
+        - ValueError si el valor del argumento no es el apropiado (incluido si alguno de los atributos
+        de enforce_unique no es una columna del csv) o
         se intenta guardar una entrada con más valores (atributos) que la cantidad de columnas
         disponibles o con nombres de valores que no sean iguales a los ya presentes (nombre columnas)
         """
+        with self.__file_lock(exclusive=True):
+            return self.__save_entry(enforce_unique)
+
+    def __save_entry(self, enforce_unique: tuple[str, ...] | None) -> str:
+        """ método privado save_entry guarda la entrada de writer_instance para guardar_datos_csv con el
+        bloqueo exclusivo"""
         if not self.can_save:
-            return (f"\nAdvertencia: Actualmente esta ocupando un objeto de tipo {type(self.current_class).__name__}"
-                    "el cual no posee un __dict__ por lo que es imposible guardar entradas con él")
+            return self.__save_warning("class")
         if self.writer_instance is None:
             return ("\nAdvertencia: Para poder crear una nueva entrada primero debe pasar sus datos usando el método set_data "
                     "para acceder a métodos de su clase pasada o cambiar sus datos debe hacerlo a través del atributo writer_instance")
+        # only a stat call if the file was not modified outside of this instance
+        self.__sync_meta()
         # self.current_rows can't be less than zero so even if self.max_row_limit
         # is negative (truthy) the firs condition still checks
         if self.current_rows - 1 >= BaseCsvManager.max_row_limit or not BaseCsvManager.max_row_limit:
-            return ("\nAdvertencia: Su entrada no fue creada ya que para mantener la eficiencia de este programa "
-                    f"recomendamos\nlimitar el numero de entrada a {BaseCsvManager.max_row_limit - 3_000} "
-                    f"favor de ir a\n{self.instance_file_path}\nhacer una, copia reiniciar el programa y\n"
-                    "borrar todas las entradas para proseguir normalmente\nde aquí en adelante "
-                    "solo se aceptaran operaciones de lectura y borrado de entradas solamente")
+            return self.__save_warning("rows")
 
+        class_repr: list[tuple[str, str]] = self.__class_repr(self.writer_instance)
         if enforce_unique is not None and self.current_rows > 1:
-            if not isinstance(enforce_unique, tuple):
-                raise ValueError(
-                    f"el parámetro enforce_unique debe ser una tuple pero fue {type(enforce_unique).__name__}")
-            elif not enforce_unique:
-                raise ValueError(f"la tuple debe contener al menos un str")
-            elif not all([isinstance(item, str) for item in enforce_unique]):
-                raise ValueError(
-                    "la tuple solo debe contener str "
-                    f"su tuple contiene {', '.join([str(type(item).__name__) for item in enforce_unique])}")
-            # strip("_") para eliminar el _ que es puesto cuando
-            # se tiene atributos que usan algún tipo decorador como
-            # el property y setter
-            # asi puedo buscar en atributos no consecutivos para ver si son únicos
-            vals_to_check = " | ".join([f'"{str(key).strip("_")}" = {val}' for
-                                        key, val in self.writer_instance.__dict__.items() if
-                                        str(key).strip("_") in enforce_unique])
-            skip_first = self.leer_datos_csv(search=vals_to_check)
-            next(skip_first)
-            for _ in skip_first:
+            self.__check_enforce_unique(enforce_unique)
+            # the column names are the attributes without the _ (property and setter) in uppercase
+            # so a value is present if it is in the hash index of any of the columns
+            columns: tuple[str, ...] = tuple(item.upper() for item in enforce_unique)
+            unique_index: dict[str, Counter] = self.__unique_index(columns)
+            new_values: dict[str, str] = dict(class_repr)
+            if any(new_values.get(column) in unique_index[column] for column in columns):
                 return "presente"
-        if self.exclude is not None:
-            if self.exclude[0] == "!":
-                class_repr = [(str(key).strip('_').upper(),
-                                str(val)) for key, val in self.writer_instance.__dict__.items()
-                                if str(key).strip("_") in self.exclude]
-            else:
-                class_repr = [(str(key).strip('_').upper(), str(val)) for key, val in self.writer_instance.__dict__.items()
-                                if str(key).strip("_") not in self.exclude]
-        else:
-            class_repr = [(str(key).strip('_').upper(), str(val)) for key, val in self.writer_instance.__dict__.items()]
         if len(class_repr) > BaseCsvManager.max_col_limit:
-            return ("\nAdvertencia su entrada no fue creada ya que el objeto a guardar contiene un "
-                    f"__dict__ que supera el máximo de columnas que puede tener un objeto ({BaseCsvManager.max_col_limit}) "
-                    "puede usar el argumento exclude de esta clase para excluir algunos atributos y disminuir el número de columnas")
+            return self.__save_warning("cols")
+        new_rows: list[list[str]] = []
         if not self.current_rows:
-            with open(self.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
-                write = csv.writer(csv_writer, delimiter=self.delimiter)
-                if self.exclude is not None:
-                    if self.exclude[0] == "!":
-                        self.new_head = ["INDICE", *[str(key).strip("_").upper() for key in self.writer_instance.__dict__ if
-                                            str(key).strip("_") in self.exclude]]
-                        write.writerow(self.new_head)
-                    else:
-                        self.new_head = ["INDICE", *[str(key).strip("_").upper() for key in self.writer_instance.__dict__ if
-                                            str(key).strip("_") not in self.exclude]]
-                        write.writerow(self.new_head)
-                else:
-                    self.new_head = ["INDICE", *[str(key).strip("_").upper() for key in self.writer_instance.__dict__]]
-                    write.writerow(self.new_head)
-            self.current_rows += 1
+            self.new_head = ["INDICE", *[val[0] for val in class_repr]]
+            new_rows.append(self.new_head)
         if tuple((val[0] for val in class_repr)) != tuple(self.new_head[1:]):
             raise ValueError("solo se permiten objetos "
                             "con el mismo número de atributos y nombres "
                             f"que el actual {', '.join(self.new_head[1:])}")
-        with open(self.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
-            write = csv.writer(csv_writer, delimiter=self.delimiter)
-            self.current_rows += 1
-            write.writerow([f"[{self.current_rows - 1}]", *[val[1] for val in class_repr]])
+        # the header (if needed) and the new entry are written with a single open
+        # the INDICE written is the position in the file, the deleted rows of the .tomb are still there
+        new_rows.append([f"[{self._meta['rows'] + len(new_rows)}]", *[val[1] for val in class_repr]])
+        self.__append_rows(new_rows)
+        self.current_rows = self._meta["rows"] - len(self._tombstones)
         return (f"\n{f'{self.delimiter}'.join([*self.new_head])}\n[{self.current_rows - 1}]"
                     f"{self.delimiter}{f'{self.delimiter}'.join([val[1] for val in class_repr])}")
 
-
-    def leer_datos_csv(self, search="", escaped=False, query_functions=True) -> Generator[list[str] | str, None, str]:
-        """ método publico leer_datos_csv
+    def guardar_datos_csv_many(self, instances, enforce_unique=None) -> list[str]:
+        """ método publico guardar_datos_csv_many
+        permite escribir varias entradas en el archivo csv abriéndolo una sola vez, el encabezado se
+        comprueba una vez y cada entrada solo se compara con los nombres de sus columnas
 
         Argumentos:
 
-        - search es la str que se usa para buscar dentro del csv
-
-        - escaped es para saber si se debe escapar algún carácter especial
-        en el search str cuando se realize la búsqueda mediante expresiones regulares
+        - instances un iterable con los objetos a guardar (por ejemplo instancias de current_class),
+        cada objeto se guarda igual que el atributo writer_instance en guardar_datos_csv
 
-        - query_function es para determinar si se debe aplicar o no las funciones
-        pasadas en una query
+        - enforce_unique igual que en guardar_datos_csv, los valores también se comparan con los de
+        las entradas guardadas antes en la misma llamada
 
         Valor de retorno:
 
-        - un generador que permite enviar de una en una las lineas dentro del archivo csv
-        Para saber que sintaxis es ocupada para buscar por indice refiérase al método estático publico
-        return_pattern (siempre el primer dato enviado sera el encabezado del csv
-        independiente de la query usada en el argumento search). Si se ocupa alguna de las siguientes funciones
-        en una query (UNIQUE, MIN, MAX, SUM, AVG, COUNT) adicionalmente el ultimo item tendrá la siguiente estructura:
+        - una lista con un str por cada objeto de instances (en el mismo orden) igual al que retornaría
+        guardar_datos_csv al guardar ese objeto: la nueva entrada creada, "presente" si se especifico
+        enforce_unique y la entrada ya estaba presente o un mensaje de advertencia que comienza con
+        "Advertencia: " si la entrada no pudo ser guardada
 
-        1- si fue MIN, MAX, SUM, AVG: una lista donde el primer item es el nombre de la operación, el segundo es la
-        columna en la cual se efectuó y el ultimo el resultado de la operación (si se ocupa en datos no numéricos es 0)
+        Excepciones:
 
-        2- si fue COUNT: una lista con dos items el primero el nombre de la operación y el segundo el total de entradas
+        - ValueError si el valor de enforce_unique no es el apropiado, si alguno de sus atributos no es
+        una columna del csv o si algún objeto tiene atributos con nombres distintos a las columnas del csv,
+        en ese caso no se guarda ninguna de las entradas
+        """
+        with self.__file_lock(exclusive=True):
+            return self.__save_entries(instances, enforce_unique)
 
-        3- si fue UNIQUE: una lista con 4 items el primero el nombre de la operación, el segundo la columna donde
-        fue aplicada, el tercero un dict de la frecuencia de cada valor y el cuarto el total
-        de filas con valores únicos
+    def __save_entries(self, instances: Iterable, enforce_unique: tuple[str, ...] | None) -> list[str]:
+        """ método privado save_entries guarda las entradas para guardar_datos_csv_many con el bloqueo exclusivo"""
+        instances = list(instances)
+        if not self.can_save:
+            return [self.__save_warning("class") for _ in instances]
+        if not instances:
+            return []
+        self.__sync_meta()
+        if enforce_unique is not None:
+            self.__check_enforce_unique(enforce_unique)
+        # all the entries are checked before writing so if there is an error nothing is saved
+        class_reprs: list[list[tuple[str, str]]] = [self.__class_repr(instance) for instance in instances]
+        if len(class_reprs[0]) > BaseCsvManager.max_col_limit:
+            return [self.__save_warning("cols") for _ in instances]
+        new_rows: list[list[str]] = []
+        if not self.current_rows:
+            new_head: list[str] = ["INDICE", *[val[0] for val in class_reprs[0]]]
+            new_rows.append(new_head)
+        else:
+            new_head = list(self.new_head)
+        columns: tuple[str, ...] = tuple(new_head[1:])
+        for class_repr in class_reprs:
+            if tuple((val[0] for val in class_repr)) != columns:
+                raise ValueError("solo se permiten objetos "
+                                 "con el mismo número de atributos y nombres "
+                                 f"que el actual {', '.join(columns)}")
+        # the position of each enforce_unique column with the values in the csv (hash index)
+        # and the values of the entries saved by this call
+        unique_values: dict[int, tuple[Counter, set[str]]] = {}
+        if enforce_unique is not None:
+            for item in enforce_unique:
+                if (column := str(item).upper()) not in columns:
+                    raise ValueError(f"los atributos de enforce_unique deben ser columnas del csv ({', '.join(columns)}) "
+                                     f"pero uno de ellos fue {item}")
+            unique_index: dict[str, Counter] = (self.__unique_index(tuple(item.upper() for item in enforce_unique))
+                                                if self.current_rows > 1 else {})
+            for item in enforce_unique:
+                unique_values[columns.index(item.upper())] = (unique_index.get(item.upper(), Counter()), set())
+        results: list[str] = []
+        head_str: str = f"{self.delimiter}".join(new_head)
+        # INDICE of the entries without counting the rows of the .tomb and position in the csv
+        current_rows: int = self.current_rows
+        file_rows: int = self._meta["rows"]
+        for class_repr in class_reprs:
+            if current_rows - 1 >= BaseCsvManager.max_row_limit or not BaseCsvManager.max_row_limit:
+                results.append(self.__save_warning("rows"))
+                continue
+            values: list[str] = [val[1] for val in class_repr]
+            if any(values[position] in existing or values[position] in pending
+                   for position, (existing, pending) in unique_values.items()):
+                results.append("presente")
+                continue
+            for position, (_, pending) in unique_values.items():
+                pending.add(values[position])
+            new_rows.append([f"[{file_rows + len(new_rows)}]", *values])
+            current_rows = (current_rows or 1) + 1
+            results.append(f"\n{head_str}\n[{current_rows - 1}]{self.delimiter}{f'{self.delimiter}'.join(values)}")
+        if len(new_rows) > (0 if self.current_rows else 1):
+            # every new row (and the header if needed) is written with a single open
+            self.__append_rows(new_rows)
+            if not self.current_rows:
+                self.new_head = new_head
+            self.current_rows = self._meta["rows"] - len(self._tombstones)
+        return results
+
+    def __check_enforce_unique(self, enforce_unique) -> None:
+        """ método privado check_enforce_unique comprueba que enforce_unique sea una tuple con al menos un str
 
         Excepciones:
 
-        - ValueError si los tipos de los argumentos no son los apropiados
+        - ValueError si enforce_unique no es una tuple, esta vacía o alguno de sus valores no es str
         """
-        if not isinstance(search, str):
-            raise ValueError(f"el argumento search debe ser un str pero fue {type(search).__name__}")
-        for name, item in {"escaped": escaped, "query_functions": query_functions}.items():
-            if not isinstance(item, bool):
-                raise ValueError(f"el argumento {name} debe ser un bool pero fue {type(item).__name__}")
-        if self.current_rows > 0:
-            with open(str(self.instance_file_path), "r", newline="", encoding="utf-8") as csv_reader:
-                read = csv.reader(csv_reader, delimiter=self.delimiter)
-                # usando generadores para evitar cargar todo el archivo a memoria
-                if search:
-                    if isinstance(to_search := self.return_pattern(search), tuple):
-                        yield next(read)
-                        operation: str | None = to_search[0]
+        if not isinstance(enforce_unique, tuple):
+            raise ValueError(
+                f"el parámetro enforce_unique debe ser una tuple pero fue {type(enforce_unique).__name__}")
+        elif not enforce_unique:
+            raise ValueError(f"la tuple debe contener al menos un str")
+        elif not all([isinstance(item, str) for item in enforce_unique]):
+            raise ValueError(
+                "la tuple solo debe contener str "
+                f"su tuple contiene {', '.join([str(type(item).__name__) for item in enforce_unique])}")
+
+    def __class_repr(self, instance) -> list[tuple[str, str]]:
+        """ método privado class_repr retorna una lista con el nombre de la columna (atributo en mayúsculas y
+        sin _) y el valor como str de cada atributo de instance que se guarda según el atributo exclude
+        """
+        if self.exclude is not None:
+            if self.exclude[0] == "!":
+                return [(str(key).strip('_').upper(), str(val)) for key, val in instance.__dict__.items()
+                        if str(key).strip("_") in self.exclude]
+            return [(str(key).strip('_').upper(), str(val)) for key, val in instance.__dict__.items()
+                    if str(key).strip("_") not in self.exclude]
+        return [(str(key).strip('_').upper(), str(val)) for key, val in instance.__dict__.items()]
+
+    def _entry_values(self, instances) -> list[list[str]]:
+        """ método privado _entry_values retorna los valores (como str) de cada objeto de instances en el orden
+        de las columnas del csv, es ocupado por Transaction para guardar las entradas en el archivo .wal
+
+        Excepciones:
+
+        - ValueError si current_class no tiene __dict__ o si algún objeto tiene más atributos que el máximo de
+        columnas o atributos con nombres distintos a las columnas del csv
+        """
+        if not self.can_save:
+            raise ValueError(f"no es posible guardar entradas con un objeto de tipo {type(self.current_class).__name__} "
+                             "ya que no posee un __dict__")
+        columns: tuple[str, ...] = tuple(self.new_head[1:])
+        entries: list[list[str]] = []
+        for instance in instances:
+            class_repr: list[tuple[str, str]] = self.__class_repr(instance)
+            if len(class_repr) > BaseCsvManager.max_col_limit:
+                raise ValueError(f"el objeto a guardar supera el máximo de columnas ({BaseCsvManager.max_col_limit})")
+            if tuple((val[0] for val in class_repr)) != columns:
+                raise ValueError("solo se permiten objetos "
+                                 "con el mismo número de atributos y nombres "
+                                 f"que el actual {', '.join(columns)}")
+            entries.append([val[1] for val in class_repr])
+        return entries
+
+    def __save_warning(self, reason: str) -> str:
+        """ método privado save_warning retorna el mensaje de advertencia de guardar_datos_csv cuando una
+        entrada no se puede guardar, reason es 'class' si current_class no tiene __dict__, 'rows' si se
+        alcanzo el máximo de filas y 'cols' si se supera el máximo de columnas
+        """
+        if reason == "class":
+            return (f"\nAdvertencia: Actualmente esta ocupando un objeto de tipo {type(self.current_class).__name__}"
+                    "el cual no posee un __dict__ por lo que es imposible guardar entradas con él")
+        if reason == "rows":
+            return ("\nAdvertencia: Su entrada no fue creada ya que para mantener la eficiencia de este programa "
+                    f"recomendamos\nlimitar el numero de entrada a {BaseCsvManager.max_row_limit - 3_000} "
+                    f"favor de ir a\n{self.instance_file_path}\nhacer una, copia reiniciar el programa y\n"
+                    "borrar todas las entradas para proseguir normalmente\nde aquí en adelante "
+                    "solo se aceptaran operaciones de lectura y borrado de entradas solamente")
+        return ("\nAdvertencia su entrada no fue creada ya que el objeto a guardar contiene un "
+                f"__dict__ que supera el máximo de columnas que puede tener un objeto ({BaseCsvManager.max_col_limit}) "
+                "puede usar el argumento exclude de esta clase para excluir algunos atributos y disminuir el número de columnas")
+
+
+    def leer_datos_csv(self, search="", escaped=False, query_functions=True,
+                       engine="python") -> Generator[list[str] | str, None, str]:
+        """ método publico leer_datos_csv
+
+        Argumentos:
+
+        - search es la str que se usa para buscar dentro del csv o un CompiledQuery obtenido
+        con el método compile_query
+
+        - escaped es para saber si se debe escapar algún carácter especial
+        en el search str cuando se realize la búsqueda mediante expresiones regulares, si es False search
+        se busca como texto sin distinguir mayúsculas de minúsculas (casefold) en los valores de cada fila
+
+        - query_function es para determinar si se debe aplicar o no las funciones
+        pasadas en una query
+
+        - engine 'python' o 'numpy', con 'numpy' las comparaciones de una query se evalúan sobre columnas
+        completas y AVG, SUM, MIN y MAX sobre columnas numéricas se calculan con numpy (el resultado es el
+        mismo que con 'python'), requiere que el paquete numpy este instalado, sin cache='columnar' las columnas
+        se crean en cada búsqueda por lo que conviene ocuparlo junto a ese cache
+
+        Valor de retorno:
+
+        - un generador que permite enviar de una en una las lineas dentro del archivo csv
+        Para saber que sintaxis es ocupada para buscar por indice refiérase al método estático publico
+        return_pattern (siempre el primer dato enviado sera el encabezado del csv
+        independiente de la query usada en el argumento search). Si se ocupa alguna de las siguientes funciones
+        en una query (UNIQUE, MIN, MAX, SUM, AVG, COUNT) adicionalmente el ultimo item tendrá la siguiente estructura:
+
+        1- si fue MIN, MAX, SUM, AVG: una lista donde el primer item es el nombre de la operación, el segundo es la
+        columna en la cual se efectuó y el ultimo el resultado de la operación (si se ocupa en datos no numéricos es 0)
+
+        2- si fue COUNT: una lista con dos items el primero el nombre de la operación y el segundo el total de entradas
+
+        3- si fue UNIQUE: una lista con 4 items el primero el nombre de la operación, el segundo la columna donde
+        fue aplicada, el tercero un dict de la frecuencia de cada valor y el cuarto el total
+        de filas con valores únicos
+
+        Las funciones AVG, MAX, MIN, SUM y COUNT se pueden separar por comas para calcularlas todas leyendo el csv
+        una sola vez (por ejemplo ~SUM:age,AVG:salary,COUNT:), en ese caso se envía un item por cada función
+        en el orden de la query
+
+        Con GROUP las filas se agrupan por el valor de una columna y se calculan las funciones AVG, MAX, MIN, SUM
+        o COUNT (separadas por comas) para cada grupo (por ejemplo ~GROUP:city:AVG:age,COUNT:), en vez de las filas
+        se envía un item por grupo con la forma ['GROUP', <columna>, <valor>, <resultado de cada función>] donde
+        cada resultado tiene la misma forma que el de la función sola
+
+        Las funciones ASC y DESC pueden ir seguidas de LIMIT para obtener solo las primeras filas ordenadas
+        (por ejemplo ~DESC:age~LIMIT:10), si la columna tiene un solo tipo solo se guardan esas filas mientras
+        se lee el csv
+
+        Cada búsqueda con una query cuenta sus comparaciones en un QueryStats propio, el de la última búsqueda
+        que se empezó a leer queda en el atributo query_stats
+
+        El bloqueo compartido del csv (ver FileLock) solo se mantiene hasta obtener el encabezado y la primera
+        fila, las demás filas se leen del archivo que ya estaba abierto por lo que el generador entrega las filas
+        que tenia el csv al empezar aunque otro proceso lo modifique mientras se lee y no lo hace esperar
+
+        Excepciones:
+
+        - ValueError si los tipos de los argumentos no son los apropiados
+        """
+        # the csv, the mapping and the indexes are opened before the first row (see locked_start)
+        return (yield from self.__locked_start(self.__read_csv(search, escaped, query_functions, engine),
+                                               exclusive=False, started=2))
+
+    def __read_csv(self, search: str | CompiledQuery, escaped: bool, query_functions: bool,
+                   engine: str) -> Generator[list[str] | str, None, str]:
+        """ método privado read_csv lee el archivo csv para leer_datos_csv, el encabezado y la primera fila se
+        obtienen con el bloqueo compartido y las demás del archivo que ya estaba abierto (ver locked_start)"""
+        if not isinstance(search, (str, CompiledQuery)):
+            raise ValueError(f"el argumento search debe ser un str pero fue {type(search).__name__}")
+        for name, item in {"escaped": escaped, "query_functions": query_functions}.items():
+            if not isinstance(item, bool):
+                raise ValueError(f"el argumento {name} debe ser un bool pero fue {type(item).__name__}")
+        if engine not in ("python", "numpy"):
+            raise ValueError(f"el argumento engine debe ser 'python' o 'numpy' pero fue {engine}")
+        if engine == "numpy" and np is None:
+            raise ValueError("para ocupar engine='numpy' necesita instalar el paquete numpy, use pip install numpy")
+        # the rows deleted with lazy_delete (.tomb) might have changed since the last operation
+        self.__sync_meta()
+        if self.current_rows > 0:
+            snapshot: ColumnarSnapshot | None = None
+            if self.cache == "columnar":
+                snapshot = self.__columnar_snapshot()
+            elif engine == "numpy" and (isinstance(search, CompiledQuery) or
+                                        search and self.return_pattern(search) is None):
+                # the columns are only kept in memory for this search
+                snapshot = self.__columnar_snapshot(keep=False)
+            with (open(str(self.instance_file_path), "r", newline="", encoding="utf-8") if snapshot is None
+                  else nullcontext()) as csv_reader:
+                # the rows appended by other processes once the lock is released are not read
+                read = (islice(_csv_rows(csv_reader, self.delimiter), self._meta["rows"]) if snapshot is None
+                        else snapshot.reader())
+                if snapshot is None and self._tombstones:
+                    # skip the rows of the .tomb (the snapshot is created without them)
+                    read = self.__live_rows(read)
+                # usando generadores para evitar cargar todo el archivo a memoria
+                if search:
+                    if isinstance(search, str) and isinstance(to_search := self.return_pattern(search), tuple):
+                        yield next(read)
+                        # the offsets of the .meta must match the current file
+                        self.__sync_meta()
+                        operation: str | None = to_search[0]
                         vals_to_search: list = [num for num in to_search[-1] if self.current_rows >= num >= 0]
                         if not vals_to_search:
                             operation = "-"
@@ -552,39 +2446,47 @@ class SingleCsvManager(BaseCsvManager):
                         if operation == ":":
                             if len(vals_to_search) == 1:
                                 vals_to_search.append(self.current_rows)
-                            # mypy is a pain in the ass
-                            vals_to_search.append(float("nan"))
-                        mark: float | int = vals_to_search[-1]
-                        for count, row in enumerate(read, 1):
-                            if isnan(mark):
-                                low_lim: int = vals_to_search[0]
-                                up_lim: int = vals_to_search[1]
-                                if low_lim <= count <= up_lim:
-                                    yield row
-                                elif count > up_lim:
-                                    break
-                            else:
-                                if count in vals_to_search:
-                                    yield row
-                                # return pattern sort the values so we are sure
-                                # that mark is the biggest one
-                                elif count > mark:
-                                    break
-                    elif (list_of_match:= self.__query_parser(search)):
-                        except_col = ()
-                        if isinstance(list_of_match[0], tuple):
-                            except_col = except_col + list_of_match.pop(0)
+                            # INDICE is always [1]..[N] so the row number is also its position in the file
+                            yield from self.__rows_in_range(max(vals_to_search[0], 1), vals_to_search[1])
+                        else:
+                            # return pattern sort the values but they can be repeated
+                            yield from self.__rows_at(sorted(set(num for num in vals_to_search if num > 0)))
+                    elif (compiled := self.__compiled_query(search)) is not None:
+                        except_col: tuple[int, ...] = compiled.except_col
+                        if except_col:
                             header = next(read)
                             yield [header[0]] + [header[val] for val in range(1, len(header)) if
                                                 val not in except_col]
                         else:
                             yield next(read)
                         function_match: list = []
-                        if list_of_match and isinstance(list_of_match[-1], str):
+                        # conversions tried on the values of the function column
+                        value_casts: tuple[Callable, ...] = _CASCADE_CASTS
+                        # the state and conversions of every function when the query has more than one
+                        aggregates: list[tuple[list, tuple[Callable, ...]]] = []
+                        grouping: GroupAggregate | None = None
+                        if compiled.group is not None:
+                            if query_functions and compiled.group.upper() in self.new_head and (
+                                    group_index := self.new_head.index(compiled.group.upper())) not in except_col:
+                                def new_states() -> list[tuple[list, tuple[Callable, ...]]]:
+                                    return [state for operand, column in compiled.functions if
+                                            (state := self.__aggregate_state(operand, column, compiled)) is not None]
+                                # the rows are only grouped if at least one function is valid
+                                if new_states():
+                                    grouping = GroupAggregate(
+                                        group_index, new_states, lambda row, status, casts:
+                                        self.__query_function_state_updater(row, except_col, status, casts),
+                                        self._group_memory)
+                        elif len(compiled.functions) > 1:
+                            if query_functions:
+                                aggregates = [state for operand, column in compiled.functions if
+                                              (state := self.__aggregate_state(operand, column, compiled)) is not None]
+                        elif compiled.function is not None:
                             if query_functions:
-                                operand, column, *_ = str(list_of_match.pop()).split(":")
-                                if operand == "COUNT":
-                                    function_match += ["COUNT", 0]
+                                operand, column = compiled.function
+                                if operand in ("AVG", "MAX", "MIN", "SUM", "COUNT"):
+                                    if (state := self.__aggregate_state(operand, column, compiled)) is not None:
+                                        function_match, value_casts = state
                                 elif operand == "LIMIT":
                                     try:
                                         limit_result = int(column)
@@ -596,97 +2498,210 @@ class SingleCsvManager(BaseCsvManager):
                                 elif column and column.upper() in self.new_head:
                                     col_index = self.new_head.index(str(column).upper())
                                     if not except_col or col_index not in except_col:
-                                        if operand == "AVG":
-                                            function_match += [operand, 0, 0, col_index]
-                                        elif operand == "MIN":
-                                            function_match += [operand, [float("inf"), None], col_index]
-                                        elif operand == "MAX":
-                                            function_match += [operand, [float("-inf"), None], col_index]
-                                        elif operand == "SUM":
-                                            function_match += [operand, 0, col_index]
-                                        elif operand == "UNIQUE":
+                                        value_casts = compiled.value_casts(col_index)
+                                        if operand == "UNIQUE":
                                             function_match += [operand, set(), [0, dict()], col_index]
                                         elif operand == "ASC" or operand == "DESC":
                                             header_offset = sum((1 for item in except_col if item < col_index))
-                                            function_match += [operand, [], col_index - header_offset, set()]
-                            else:
-                                list_of_match.pop()
-                        for row in read:
-                            bool_values: list | str = self.__parsed_query_operation_resolver(row, list_of_match)
-                            if isinstance(bool_values, str):
-                                yield bool_values
-                                return "sintaxis no valida búsqueda terminada"
-                            elif not bool_values:
-                                yield "error de sintaxis"
+                                            # with ~LIMIT only the first rows are kept if the type of the
+                                            # column (and its conversion) is known before reading it
+                                            if compiled.limit is not None and len(value_casts) == 1:
+                                                sorter: ExternalSort | TopRows = TopRows(
+                                                    col_index - header_offset, operand == "DESC", value_casts[0],
+                                                    compiled.limit)
+                                            else:
+                                                sorter = ExternalSort(col_index - header_offset, operand == "DESC",
+                                                                      value_casts, self._sort_memory)
+                                            function_match += [operand, sorter, col_index - header_offset, col_index]
+                                if not function_match and compiled.limit is not None:
+                                    # the order is not possible (the column is not shown) but the limit still applies
+                                    function_match += ["LIMIT", compiled.limit + 1]
+                        if compiled.error is not None:
+                            # the error is only shown if there is at least one row to search
+                            for _ in read:
+                                yield compiled.error
                                 return "sintaxis no valida búsqueda terminada"
+                        if snapshot is None:
+                            # with a sorted index (create_index) only the rows it selects are read
+                            positions: list[int] | None = self.__index_positions(compiled)
+                            # the counters and the order of the conditions belong to this search only
+                            self.query_stats = stats = compiled.new_stats()
+                            selected: Iterator[list[str]] = filter(
+                                lambda row: compiled.matches(row, stats),
+                                read if positions is None else self.__rows_at_positions(positions))
+                        elif engine == "numpy":
+                            mask = snapshot.numpy_mask(compiled)
+                            if function_match and (result := self.__numpy_aggregate_result(
+                                    snapshot, function_match, mask)) is not None:
+                                yield result
+                                return "búsqueda completa"
+                            # the functions are only calculated with numpy if all of them can be
+                            if aggregates and None not in (results := [self.__numpy_aggregate_result(
+                                    snapshot, status, mask) for status, _ in aggregates]):
+                                yield from results
+                                return "búsqueda completa"
+                            selected = snapshot.select(mask)
+                        else:
+                            # with the snapshot every condition is evaluated over the whole column at once
+                            selected = snapshot.select(snapshot.mask(compiled))
+                        for row in selected:
+                            if grouping is not None:
+                                grouping.add(row)
+                                continue
+                            if aggregates:
+                                for status, casts in aggregates:
+                                    self.__query_function_state_updater(row, except_col, status, casts)
+                                continue
+                            if function_match:
+                                new_function_state: str = self.__query_function_state_updater(
+                                    row, except_col, function_match, value_casts)
+                                if new_function_state == "REACHED-LIMIT":
+                                    return ("se alcanzo el limite de entradas "
+                                            f"requeridas LIMIT:{function_match[-1]}")
+                                # this is only because this two functions should
+                                # be able to yield rows at this point
+                                if new_function_state not in ("LIMIT", "UNIQUE"):
+                                    continue
+                            if except_col:
+                                yield [row[0]] + [row[item] for item in range(1, len(row)) if
+                                                item not in except_col]
                             else:
-                                current_value = bool_values.pop(0)
-                                if len(bool_values) != 1:
-                                    for current in range(0, len(bool_values), 2):
-                                        if bool_values[current] == "|":
-                                            current_value = current_value or bool_values[current + 1]
-                                        else:
-                                            current_value = current_value and bool_values[current + 1]
-                                if current_value:
-                                    if function_match:
-                                        new_function_state: str = self.__query_function_state_updater(row, except_col, function_match)
-                                        if new_function_state == "REACHED-LIMIT":
-                                            return ("se alcanzo el limite de entradas "
-                                                    f"requeridas LIMIT:{function_match[-1]}")
-                                        # this is only because this two functions should
-                                        # be able to yield rows at this point
-                                        if new_function_state not in ("LIMIT", "UNIQUE"):
-                                            continue
-                                    if except_col:
-                                        yield [row[0]] + [row[item] for item in range(1, len(row)) if
-                                                        item not in except_col]
-                                    else:
-                                        yield row
+                                yield row
                         if function_match:
-                            if len(function_match) == 4:
-                                if function_match[0] not in ("UNIQUE", "PRESENT"):
-                                    if function_match[0] not in ("ASC", "DESC"):
-                                        yield ["AVG", self.new_head[function_match[-1]],
-                                            function_match[1] / function_match[2] if function_match[2] else 0]
-                                    else:
-                                        for types_comp in (float, date.fromisoformat, str):
-                                            try:
-                                                function_match[1].sort(
-                                                    key=lambda x: types_comp(x[function_match[2]]),
-                                                    reverse=True if function_match[0] == "DESC" else False)
-                                            except ValueError:
-                                                pass
-                                            else:
-                                                break
-                                        for sorted_item in function_match[1]:
-                                            yield sorted_item
-                                else:
-                                    yield ["UNIQUE", self.new_head[function_match[-1]], function_match[2][-1], function_match[2][0]]
-                            elif len(function_match) == 3:
-                                if function_match[0] not in ("MIN", "MAX"):
-                                    yield [function_match[0], self.new_head[function_match[-1]],
-                                        function_match[1] if not isnan(function_match[1]) else 0]
-                                else:
-                                    yield [function_match[0], self.new_head[function_match[-1]],
-                                        function_match[1][0] if function_match[1][0] != "STR"
-                                        else function_match[1][1]]
+                            if function_match[0] in ("ASC", "DESC"):
+                                sorted_rows: Generator[list[str], None, None] = function_match[1].sorted_rows()
+                                yield from islice(sorted_rows, compiled.limit)
+                                sorted_rows.close()
+                            elif function_match[0] in ("UNIQUE", "PRESENT"):
+                                yield ["UNIQUE", self.new_head[function_match[-1]], function_match[2][-1], function_match[2][0]]
                             # LIMIT might be able to get to here in is set
                             # bigger than the total amount of entries on a search
-                            elif function_match[0] == "COUNT":
-                                yield ["COUNT", function_match[-1]]
+                            elif function_match[0] != "LIMIT":
+                                yield self.__aggregate_result(function_match)
+                        # one result for each function in the order of the query
+                        for status, _ in aggregates:
+                            yield self.__aggregate_result(status)
+                        if grouping is not None:
+                            group_name: str = self.new_head[grouping.column]
+                            for value, statuses in grouping.groups():
+                                yield ["GROUP", group_name, value, *map(self.__aggregate_result, statuses)]
                         return "búsqueda completa"
                     else:
+                        # the search is compiled once, without escaped it is a plain substring search
+                        if escaped:
+                            pattern: re.Pattern = re.compile(search, re.IGNORECASE)
+                            is_match: Callable[[str], bool] = lambda text: pattern.search(text) is not None
+                        else:
+                            needle: str = search.casefold()
+                            is_match = lambda text: needle in text.casefold()
+                            if snapshot is None and (positions := self.__text_positions(needle)) is not None:
+                                # with the full text index (create_text_index) only the rows with the words are read
+                                read = chain((list(self._meta["header"]),), self.__rows_at_positions(positions))
+                            elif snapshot is None:
+                                # the lines that can't contain the search are not decoded or split into columns
+                                read = self.__prefiltered_rows(needle)
                         yield next(read)
                         for row in read:
-                            if row and re.search(f"^.*{re.escape(search) if not escaped else search}.*$",
-                                                "".join(row[1:]), re.IGNORECASE) is not None:
+                            if is_match("".join(row[1:])):
                                 yield row
                 else:
-                    for row in read:
-                        if row:
-                            yield row
+                    yield from read
+
+    def compile_query(self, search) -> CompiledQuery:
+        """ método publico compile_query
+        analiza una query de búsqueda una sola vez para poder ocuparla varias veces en leer_datos_csv
+        o borrar_datos sin tener que volver a analizarla (las query en str también se guardan en un cache
+        por lo que este método es util principalmente para reutilizar y revisar una query), el CompiledQuery es
+        compartido por todas las instancias que compilen la misma query con el mismo encabezado y tipos de columnas,
+        no guarda el estado de las búsquedas por lo que se puede ocupar en varias a la vez
+
+        Argumentos:
+
+        - search str con la query de búsqueda, la misma que se pasa a leer_datos_csv
+
+        Valor de retorno:
+
+        - un CompiledQuery con las columnas, operadores y valores de la query ya convertidos
+
+        Excepciones:
+
+        - ValueError si search no es str, si el csv no tiene datos o si search no es una query valida
+        """
+        if not isinstance(search, str):
+            raise ValueError(f"el argumento search debe ser un str pero fue {type(search).__name__}")
+        self.__sync_meta()
+        if not self.current_rows:
+            raise ValueError("no es posible compilar una query si no hay datos disponibles")
+        if (compiled := self.__compiled_query(search)) is None:
+            raise ValueError(f"{search} no es una query valida para las columnas {', '.join(self.new_head)}")
+        return compiled
+
+    def __compiled_query(self, search: str | CompiledQuery) -> CompiledQuery | None:
+        """ método privado compiled_query retorna el CompiledQuery de search usando el cache de queries
+        o None si search no es una query, si search ya es un CompiledQuery se comprueba que haya sido
+        compilado para el encabezado actual, si los tipos de las columnas cambiaron la query se compila
+        de nuevo para los tipos actuales
+
+        Excepciones:
+
+        - ValueError si search es un CompiledQuery de un csv con otro encabezado
+        """
+        if isinstance(search, CompiledQuery):
+            if search.header != tuple(self.new_head):
+                raise ValueError("el CompiledQuery fue compilado para un csv con columnas "
+                                 f"{', '.join(search.header)} pero las actuales son {', '.join(self.new_head)}")
+            compiled: CompiledQuery | None = search
+        # the types are only needed if search is a query
+        elif (compiled := _compile_query(search, tuple(self.new_head))) is None:
+            return None
+        if compiled.types != (types := self.__column_types()):
+            compiled = _compile_query(compiled.query, compiled.header, types)
+        return compiled
+
+    def __aggregate_state(self, operand: str, column: str,
+                          compiled: CompiledQuery) -> tuple[list, tuple[Callable, ...]] | None:
+        """ método privado aggregate_state retorna la lista con el estado inicial de la función operand (AVG, MAX,
+        MIN, SUM o COUNT) sobre la columna column (ver query_function_state_updater) junto a las conversiones
+        de los valores de esa columna o None si la columna no existe o no se muestra en el resultado"""
+        if operand == "COUNT":
+            return ["COUNT", 0], _CASCADE_CASTS
+        if not column or column.upper() not in self.new_head:
+            return None
+        col_index: int = self.new_head.index(column.upper())
+        if col_index in compiled.except_col:
+            return None
+        if operand == "AVG":
+            status: list = [operand, 0, 0, col_index]
+        elif operand == "MIN":
+            status = [operand, [float("inf"), None], col_index]
+        elif operand == "MAX":
+            status = [operand, [float("-inf"), None], col_index]
+        else:
+            status = [operand, 0, col_index]
+        return status, compiled.value_casts(col_index)
+
+    def __aggregate_result(self, status: list) -> list:
+        """ método privado aggregate_result retorna el resultado de la función AVG, MAX, MIN, SUM o COUNT
+        a partir de su estado acumulado status (el ultimo item que entrega leer_datos_csv)"""
+        if status[0] == "COUNT":
+            return ["COUNT", status[-1]]
+        elif status[0] == "AVG":
+            return ["AVG", self.new_head[status[-1]], status[1] / status[2] if status[2] else 0]
+        elif status[0] in ("MIN", "MAX"):
+            return [status[0], self.new_head[status[-1]], status[1][0] if status[1][0] != "STR" else status[1][1]]
+        return [status[0], self.new_head[status[-1]], status[1] if not isnan(status[1]) else 0]
+
+    def __numpy_aggregate_result(self, snapshot: ColumnarSnapshot, status: list, mask: "np.ndarray") -> list | None:
+        """ método privado numpy_aggregate_result igual que aggregate_result pero calcula la función sobre las
+        filas seleccionadas en mask con numpy, retorna None si la función debe acumularse fila por fila"""
+        if status[0] == "COUNT":
+            return ["COUNT", int(np.count_nonzero(mask))]
+        elif status[0] in ("AVG", "SUM", "MIN", "MAX"):
+            if (result := snapshot.numpy_aggregate(status[0], status[-1], mask)) is not None:
+                return [status[0], self.new_head[status[-1]], 0 if status[0] == "SUM" and isnan(result) else result]
+        return None
 
-    def borrar_datos(self, delete_index="") -> Generator[str, None, str]:
+    def borrar_datos(self, delete_index="") -> Generator[str, None, str | int]:
         """ método publico borrar_datos
         permite borrar las entradas seleccionadas del archivo csv
 
@@ -695,117 +2710,344 @@ class SingleCsvManager(BaseCsvManager):
         - delete_index str que especifica que entradas a borrar
         los valores validos para borrar entradas son 'borrar todo', alguno de los
         patrones validos establecidos por el método estático return_pattern o una query
-        valida para buscar datos que sea de estructura DELETE ON <query búsqueda>
+        valida para buscar datos que sea de estructura DELETE ON <query búsqueda>, también se puede pasar
+        un CompiledQuery (método compile_query) en vez de la query de búsqueda, si la instancia se creo con
+        lazy_delete=True las filas borradas solo se agregan al archivo .tomb (ver compact)
 
         Valor de retorno:
 
         - un generador que devuelve de una en una las entradas borradas si alguna se borro
-        como un str
+        como un str, al terminar retorna el nuevo número de filas del csv (incluido el encabezado)
+        o un str con el motivo por el que no se borro ninguna entrada. Las entradas se borran con el bloqueo
+        exclusivo del csv al pedir el primer valor del generador y luego se entregan sin el bloqueo, por lo que
+        cerrar el generador antes de terminar no cancela el borrado
 
         Excepciones:
 
         - ValueError si alguno de los argumentos no es del tipo esperado o si se introduce
         un formato para el argumento delete_index que no devuelva algún valor del csv
         """
-        if not isinstance(delete_index, str):
+        return (yield from self.__locked_start(self.__delete_data(delete_index), exclusive=True, started=None))
+
+    def __delete_data(self, delete_index: str | CompiledQuery) -> Generator[str, None, str | int]:
+        """ método privado delete_data borra las entradas para borrar_datos con el bloqueo exclusivo"""
+        if not isinstance(delete_index, (str, CompiledQuery)):
             raise ValueError(f"el argumento delete_index debe ser str pero fue {type(delete_index).__name__}")
         if delete_index == "borrar todo":
             if self.current_rows <= 1:
                 yield "nada"
                 return "no hay datos para borrar"
-            with open(self.instance_file_path, "w", newline="", encoding="utf-8") as _:
+            # the csv is replaced instead of truncated because other processes may still be reading
+            # the previous file (see leer_datos_csv)
+            with tempfile.NamedTemporaryFile("w", newline="", encoding="utf-8", suffix=".tmp",
+                                             dir=self.instance_file_path.parent, delete=False) as write_empty:
                 pass
-            self.current_rows = 0
+            shutil.copymode(self.instance_file_path, write_empty.name)
+            os.replace(write_empty.name, self.instance_file_path)
+            self.__refresh_meta()
+            # without a header there are no columns for the hash index of enforce_unique
+            self._unique_index, self._unique_signature = {}, None
+            # the sorted indexes are created again if the columns are still in the new header
+            self._sorted_signature = None
             yield "todo"
             return "todos los items ya se borraron"
         else:
+            self.__sync_meta()
             if self.current_rows <= 1:
                 yield "nada"
                 return "no hay datos para borrar"
             # use regex to accept multiple entries to delete
-            if isinstance(to_delete := self.return_pattern(delete_index), tuple):
+            if isinstance(delete_index, str) and isinstance(to_delete := self.return_pattern(delete_index), tuple):
                 # to get rid of things like 00 or 03, 056
                 operation: str | None = to_delete[0]
                 vars_to_delete: list = [num for num in to_delete[-1] if self.current_rows >= num >= 0]
                 if not vars_to_delete:
                     raise ValueError("ninguno de los valores ingresados corresponde al indice de alguna entrada")
-                # we are hoping that the user does not pass a not indexed file for this to work properly
-                yield f"{self.delimiter}".join([*self.new_head])
                 if operation == ":":
-                    if len(vars_to_delete) == 1:
-                        vars_to_delete.append(self.current_rows)
-                    vars_to_delete.append("range")
-                else:
-                    vars_to_delete = [f"[{num}]" for num in vars_to_delete]
-
-                # copying all the data except entries to delete from backup file to main file
-                # CHECK THE USE OF W+B MODE IS COMPATIBLE WITH THE USE OF CSV WRITEROW
-                with tempfile.TemporaryFile(mode="w+t", encoding="utf-8", newline="", suffix=".csv") as write_filter:
-                    filter_ = csv.writer(write_filter, delimiter=self.delimiter)
-                    count: int = 1
-                    mark: str = vars_to_delete[-1]
-                    row_generator: Generator[list[str] | str, None, str] = self.leer_datos_csv()
-                    # to not count header
-                    filter_.writerow(next(row_generator))
-                    for entry in row_generator:
-                        if mark == "range":
-                            low_lim: int = vars_to_delete[0]
-                            up_lim: int = vars_to_delete[1]
-                            current = int(re.sub(r"[\[\]]", "", entry[0]))
-                            if current < low_lim or current > up_lim:
-                                entry[0] = f"[{count}]"
-                                filter_.writerow(entry)
-                                count += 1
-                            else:
-                                yield f"{self.delimiter}".join(val for val in entry)
+                    low_lim: int = vars_to_delete[0]
+                    up_lim: int = vars_to_delete[1] if len(vars_to_delete) > 1 else self.current_rows
 
-                        else:
-                            if entry[0] not in vars_to_delete:
-                                entry[0] = f"[{count}]"
-                                filter_.writerow(entry)
-                                count += 1
-                            else:
-                                yield f"{self.delimiter}".join(val for val in entry)
-                    self.__rewrite_data(write_filter)
-
-            elif (regex_delete := re.search(r'^DELETE ON (.+?)$', delete_index)) is not None:
-                delete_on = self.leer_datos_csv(search=regex_delete.group(1), query_functions=False)
-                # header is not required
-                next(delete_on)
-                to_delete: list = []
-                for entry_index in delete_on:
-                    if isinstance(entry_index, str):
-                        yield entry_index
+                    def is_deleted(entry: list[str]) -> bool:
+                        return low_lim <= int(re.sub(r"[\[\]]", "", entry[0])) <= up_lim
+                else:
+                    index_to_delete: set[str] = {f"[{num}]" for num in vars_to_delete}
+
+                    def is_deleted(entry: list[str]) -> bool:
+                        return entry[0] in index_to_delete
+                if self.lazy_delete:
+                    # only the selected rows are read using the offsets of the .meta
+                    selected = self.leer_datos_csv(search=delete_index)
+                    next(selected)
+                    return (yield from self.__tombstone_rows(selected, lazy_header=False))
+                # we are hoping that the user does not pass a not indexed file for this to work properly
+                return (yield from self.__delete_rows(is_deleted, lazy_header=False))
+
+            elif (isinstance(delete_index, CompiledQuery) or
+                  (regex_delete := re.search(r'^DELETE ON (.+?)$', delete_index)) is not None):
+                where_delete: str | CompiledQuery = (delete_index if isinstance(delete_index, CompiledQuery)
+                                                     else regex_delete.group(1))
+                if (compiled := self.__compiled_query(where_delete)) is not None:
+                    if compiled.error is not None:
+                        yield compiled.error
                         return "sintaxis no valida operación cancelada"
-                    to_delete.append(entry_index[0])
-                if not to_delete:
+                    stats: QueryStats = compiled.new_stats()
+                    is_deleted: Callable[[list[str]], bool] = lambda entry: compiled.matches(entry, stats)
+                elif isinstance(self.return_pattern(where_delete), tuple):
+                    # the selected rows are read using the offsets of the .meta so this does not read the whole file
+                    delete_on = self.leer_datos_csv(search=where_delete)
+                    # header is not required
+                    next(delete_on)
+                    index_to_delete = {entry[0] for entry in delete_on}
+                    is_deleted = lambda entry: entry[0] in index_to_delete
+                else:
+                    # the same text search of leer_datos_csv
+                    needle: str = where_delete.casefold()
+                    is_deleted = lambda entry: needle in "".join(entry[1:]).casefold()
+                if self.lazy_delete:
+                    # with a sorted index (create_index) only the rows it selects are read
+                    if compiled is None or (positions := self.__index_positions(compiled)) is None:
+                        live_rows = self.leer_datos_csv()
+                        next(live_rows)
+                    else:
+                        live_rows = self.__rows_at_positions(positions)
+                    new_rows: int | None = yield from self.__tombstone_rows(filter(is_deleted, live_rows), lazy_header=True)
+                else:
+                    new_rows = yield from self.__delete_rows(is_deleted, lazy_header=True)
+                if new_rows is None:
                     yield "no se encontraron entradas para eliminar"
                     return "sintaxis valida pero sin entradas seleccionadas para la operación"
-
-                with tempfile.TemporaryFile(mode="w+t", encoding="utf-8", newline="", suffix=".csv") as delete_query:
-                    deleter = csv.writer(delete_query, delimiter=self.delimiter)
-                    reader: Generator[list[str] | str, None, str] = self.leer_datos_csv()
-                    yield f"{self.delimiter}".join([*self.new_head])
-                    deleter.writerow(next(reader))
-                    counter: int  = 1
-                    for entry in reader:
-                        if entry[0] not in to_delete:
-                            entry[0] = f"[{counter}]"
-                            deleter.writerow(entry)
-                            counter += 1
-                        else:
-                            yield f"{self.delimiter}".join(val for val in entry)
-                    self.__rewrite_data(delete_query)
+                return new_rows
             else:
                 raise ValueError("utilize uno de los siguientes formatos para borrar una entrada:\n"
                                  "[n], [n:m], [n:], [n-m-p] (hasta 10) remplazando las letras por el indice\n"
                                  "de lo que desee eliminar o escribiendo una consulta usando la palabra clave DELETE para selecciones más complejas")
-            # deleting all data on backup (is not up to date)
-            # synchronizing backup
-            # should I use asyncio?
-            self.current_rows = self.__len__()
 
-    def actualizar_datos(self, update_query, map_values = None) -> Generator[dict | str, None, str]:
+    def __delete_rows(self, is_deleted: Callable[[list[str]], bool],
+                      lazy_header: bool) -> Generator[str, None, int | None]:
+        """ método privado delete_rows copia en una sola lectura las filas que no se borran a un archivo
+        temporal en el mismo directorio del csv renumerando el INDICE y luego remplaza el csv con este,
+        el archivo .meta se crea durante la copia por lo que no es necesario volver a leer el csv, las filas
+        del .tomb tampoco se copian (sin entregarlas) y el .tomb se elimina
+
+        Argumentos:
+
+        - is_deleted una función que recibe una fila del csv (con su INDICE sin contar las filas del .tomb)
+        y retorna True si se debe borrar
+
+        - lazy_header si es True el encabezado solo se entrega antes de la primera fila borrada
+        y si no se borra ninguna fila el csv no se modifica
+
+        Valor de retorno:
+
+        - un generador que devuelve el encabezado y las filas borradas como str y que retorna
+        el nuevo número de filas (incluido el encabezado) o None si no se borro ninguna fila
+        """
+        # deleting rows does not change the type of the remaining values
+        kept_types: list[str | None] | None = self._meta.get("types")
+        signature: tuple[int, int, int] = self.__index_signature()
+        # the deleted rows are only kept if the hash index of enforce_unique or the aggregates have to be updated
+        removed: list[list[str]] | None = [] if self._unique_index or self._aggregates else None
+        # the sorted indexes are created again with the rows that are kept
+        indexed: tuple[str, ...] = tuple(self.__sorted_indexes() or self._sorted_indexes)
+        if indexed:
+            add_index_row, finish_indexes = self.__sorted_index_builder(indexed)
+        # and so is the full text index
+        text_index: dict[str, list[int]] | None = None if self.__text_index() is None else {}
+        offsets: list[int] = []
+        rows: int = 0
+        deleted: int = 0
+        if not lazy_header:
+            yield f"{self.delimiter}".join([*self.new_head])
+        # the temporary file is in the same directory (and file system) so os.replace is atomic,
+        # its suffix keeps it out of return_current_file_names if the process stops midway
+        write_filter = tempfile.NamedTemporaryFile("w", newline="", encoding="utf-8", suffix=".tmp",
+                                                   dir=self.instance_file_path.parent, delete=False)
+        try:
+            with write_filter, open(self.instance_file_path, "r", newline="", encoding="utf-8") as csv_reader:
+                filter_ = csv.writer(write_filter, delimiter=self.delimiter)
+                read = _csv_rows(csv_reader, self.delimiter)
+                header: list[str] = next(read)
+                tombstones: set[int] = set(self._tombstones)
+                position: int = 0
+                for entry in chain((header,), read):
+                    if rows:
+                        position += 1
+                        if position in tombstones:
+                            continue
+                        if tombstones:
+                            # the INDICE the row had before this delete
+                            entry[0] = f"[{rows + deleted}]"
+                        if is_deleted(entry):
+                            if lazy_header and not deleted:
+                                yield f"{self.delimiter}".join([*self.new_head])
+                            deleted += 1
+                            if removed is not None:
+                                removed.append(entry)
+                            yield f"{self.delimiter}".join(val for val in entry)
+                            continue
+                        entry[0] = f"[{rows}]"
+                        if indexed:
+                            add_index_row(rows, entry)
+                        if text_index is not None:
+                            for token in _text_tokens(entry):
+                                text_index.setdefault(token, []).append(rows)
+                    if not rows % self._offset_step:
+                        # the file is opened in write only mode so tell is the position in bytes
+                        offsets.append(write_filter.tell())
+                    filter_.writerow(entry)
+                    rows += 1
+            if lazy_header and not deleted:
+                os.unlink(write_filter.name)
+                return None
+            shutil.copymode(self.instance_file_path, write_filter.name)
+            os.replace(write_filter.name, self.instance_file_path)
+        except BaseException:
+            # if the copy is interrupted the csv is left as it was
+            write_filter.close()
+            Path(write_filter.name).unlink(missing_ok=True)
+            raise
+        self.__replace_meta(header, rows, offsets, kept_types)
+        self.__update_unique_index(signature, removed=removed or ())
+        self.__update_aggregates(signature, removed=removed or ())
+        if indexed:
+            self._sorted_indexes, self._sorted_signature = finish_indexes(), self.__index_signature()
+            self.__write_sorted_indexes()
+        if text_index is not None:
+            self._text_index, self._text_signature, self._text_vocabulary = text_index, self.__index_signature(), None
+            self.__write_text_index()
+        return self.current_rows
+
+    def __tombstone_rows(self, selected: Iterable[list[str]], lazy_header: bool) -> Generator[str, None, int | None]:
+        """ método privado tombstone_rows borra las filas de selected agregando su posición en el csv al
+        archivo .tomb sin modificar el csv, si las filas del .tomb superan la fracción _compact_ratio de las
+        filas del csv este se reescribe sin ellas (método compact)
+
+        Argumentos:
+
+        - selected un iterable con las filas a borrar (con su INDICE sin contar las filas del .tomb)
+
+        - lazy_header si es True el encabezado solo se entrega antes de la primera fila borrada
+
+        Valor de retorno:
+
+        - un generador que devuelve el encabezado y las filas borradas como str y que retorna
+        el nuevo número de filas (incluido el encabezado) o None si no se borro ninguna fila
+        """
+        if not lazy_header:
+            yield f"{self.delimiter}".join([*self.new_head])
+        signature: tuple[int, int, int] = self.__index_signature()
+        row_numbers: list[int] = []
+        removed: list[list[str]] = []
+        for entry in selected:
+            if lazy_header and not row_numbers:
+                yield f"{self.delimiter}".join([*self.new_head])
+            row_numbers.append(int(re.sub(r"[\[\]]", "", entry[0])))
+            removed.append(entry)
+            yield f"{self.delimiter}".join(val for val in entry)
+        if lazy_header and not row_numbers:
+            return None
+        # the tombstones are only written once all the rows were delivered
+        positions: list[int] = list(self.__physical_rows(row_numbers))
+        with open(tomb_path := self.instance_file_path.with_suffix(".tomb"), "a", encoding="utf-8") as tomb_writer:
+            tomb_writer.writelines(f"{position}\n" for position in positions)
+        for position in positions:
+            insort(self._tombstones, position)
+        tomb_stat = os.stat(tomb_path)
+        self._tomb_signature = (tomb_stat.st_size, tomb_stat.st_mtime_ns)
+        self._snapshot = None
+        self.__update_unique_index(signature, removed=removed)
+        self.__update_aggregates(signature, removed=removed)
+        # the positions of the sorted indexes don't change, the rows of the .tomb are omitted when they are used
+        if self._sorted_signature == signature:
+            self._sorted_signature = self.__index_signature()
+        # the same goes for the full text index
+        if self._text_signature == signature:
+            self._text_signature = self.__index_signature()
+        self.current_rows = self._meta["rows"] - len(self._tombstones)
+        if len(self._tombstones) > self._compact_ratio * (self._meta["rows"] - 1):
+            self.compact()
+        return self.current_rows
+
+    def compact(self) -> int:
+        """ método publico compact
+        reescribe el archivo csv sin las filas borradas con lazy_delete que siguen en él (archivo .tomb)
+
+        Valor de retorno:
+
+        - el número de filas que se eliminaron del archivo csv
+        """
+        with self.__file_lock(exclusive=True):
+            self.__sync_meta()
+            if not (removed := len(self._tombstones)):
+                return 0
+            for _ in self.__delete_rows(lambda entry: False, lazy_header=False):
+                pass
+            return removed
+
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """ método publico transaction
+        permite agrupar varias operaciones de borrado, actualización y escritura en un bloque with para
+        aplicarlas juntas leyendo y reescribiendo el csv una sola vez en vez de una vez por operación:
+
+        with manager.transaction() as transaction:
+            transaction.borrar_datos('DELETE ON "age" > 60')
+            transaction.actualizar_datos('UPDATE:~"city"=Dallas ON [1:5]')
+            transaction.guardar_datos_csv_many(employees)
+
+        Cada operación se guarda en el archivo auxiliar .wal de la transacción al agregarla (ver Transaction)
+        y al terminar el bloque se marca como confirmada antes de aplicarlas, si el bloque termina con una
+        excepción el .wal se elimina sin modificar el csv y si el programa se detiene mientras se aplican las
+        operaciones estas se aplican al crear una nueva instancia del mismo archivo, si solo se guardan entradas
+        estas se agregan al final del csv sin reescribirlo, varias instancias pueden tener una transacción
+        abierta sobre el mismo archivo al mismo tiempo y sus operaciones se aplican en el orden en que terminan
+
+        Valor de retorno:
+
+        - un Transaction con los métodos borrar_datos, actualizar_datos, guardar_datos_csv y
+        guardar_datos_csv_many, al terminar el bloque su atributo results contiene los resultados de cada operación
+
+        Excepciones:
+
+        - ValueError si el csv no tiene datos, si ya hay una transacción abierta en la instancia o al terminar
+        el bloque si alguna de las operaciones no es valida (error de sintaxis de una query) o si otro proceso
+        borro todas las filas, en ese caso no se aplica ninguna operación
+        """
+        if self._transaction is not None:
+            raise ValueError("ya hay una transacción abierta en esta instancia")
+        with self.__file_lock(exclusive=True):
+            self.__sync_meta()
+            if not self.current_rows:
+                raise ValueError("no es posible iniciar una transacción si no hay datos disponibles")
+            # the .wal is created and locked while replay_wal can't run so it is never found without its lock
+            self._transaction = transaction = Transaction(self)
+        try:
+            yield transaction
+            transaction.closed = True
+            with self.__file_lock(exclusive=True):
+                # another process may have changed the csv while the operations were added
+                self.__sync_meta()
+                if not self.current_rows:
+                    raise ValueError("no es posible aplicar la transacción si no hay datos disponibles")
+                # every operation is checked before the commit is written so an invalid one cancels all of them
+                stages: list[tuple[str, Callable[[list[str]], bool] | None, list]] = self.__transaction_stages(
+                    transaction.operations)
+                file_stat = os.stat(self.instance_file_path)
+                # the commit has the signature of the csv to know if it was already applied
+                commit: dict = {"op": "commit", "size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns}
+                if all(kind == "save" for kind, _, _ in stages):
+                    # the entries are appended without a rewrite, with the size of the csv after appending them
+                    # a replay knows if the program stopped while they were written
+                    buffer: io.StringIO = io.StringIO()
+                    csv.writer(buffer, delimiter=self.delimiter).writerows(self.__appended_rows(stages)[0])
+                    commit["appended"] = file_stat.st_size + len(buffer.getvalue().encode("utf-8"))
+                transaction._commit(commit)
+                transaction.results = self.__apply_transaction(stages)
+        finally:
+            self._transaction = None
+            transaction._discard()
+
+    def actualizar_datos(self, update_query, map_values = None, dry_run = False) -> Generator[dict | str, None, str]:
         """ método publico actualizar_datos
 
         Argumentos:
@@ -818,6 +3060,10 @@ class SingleCsvManager(BaseCsvManager):
         que ocupar la función %MAP-VALUE la cual no acepta ningún argumento,  si se intenta ocupar %MAP-VALUE y map_values no es
         dict entonces se pasara un error al valor de retorno
 
+        - dry_run un bool si es True solo se envían los resultados de la actualización sin modificar el archivo csv, no se
+        crea el archivo temporal y solo se leen las filas seleccionadas si la búsqueda lo permite (indices o texto), sirve
+        para revisar una actualización grande antes de hacerla
+
         Valor de retorno:
 
         - un generador que retorna ya sea una str con mensaje de errores de sintaxis o que no se encontraron entradas para actualizar, o
@@ -826,7 +3072,10 @@ class SingleCsvManager(BaseCsvManager):
         con los nombres de las filas a actualizar y cada nombre tiene como valor una lista la cual esta vacía si no hubo errores
         a la hora de actualizar el valor de la fila de esa columna y que contendrá un mensaje con el error si hubo problemas,
         finalmente la llave old contiene un diccionario igual al de errors en donde cada valor es una lista de los valores anteriores
-        que tenia la columna en esa fila si este fue actualizada (no hubo errores)
+        que tenia la columna en esa fila si este fue actualizada (no hubo errores). Las filas se actualizan con el
+        bloqueo exclusivo del csv al pedir el primer valor del generador y luego se entregan sin el bloqueo, por lo
+        que cerrar el generador antes de terminar no cancela la actualización (con dry_run el bloqueo compartido
+        solo se mantiene mientras se abre el csv)
 
         ejemplos:
 
@@ -850,281 +3099,537 @@ class SingleCsvManager(BaseCsvManager):
 
         - ValueError si los tipos de los argumentos no son los apropiados
         """
+        # with dry_run the csv is opened before the first row is sent (see locked_start)
+        return (yield from self.__locked_start(self.__update_data(update_query, map_values, dry_run),
+                                               exclusive=dry_run is not True, started=1 if dry_run is True else None))
+
+    def __update_data(self, update_query: str, map_values: dict | None,
+                      dry_run: bool) -> Generator[dict | str, None, str]:
+        """ método privado update_data actualiza las entradas para actualizar_datos con el bloqueo exclusivo
+        (con dry_run el compartido solo mientras se abre el csv)"""
         if not self.current_rows:
             raise ValueError("no es posible actualizar si no hay valore disponibles")
         if not isinstance(update_query, str):
             raise ValueError(
                 f"debe ingresar un str como instrucción para actualizar valores, pero se introdujo {type(update_query).__name__}")
+        if not isinstance(dry_run, bool):
+            raise ValueError(f"el argumento dry_run debe ser un bool pero fue {type(dry_run).__name__}")
         # only considere map_values if is a dict otherwise pass an error if the user
         # try to use the %MAP-VALUE function
         if map_values is not None:
             if isinstance(map_values, dict):
                 map_values = {str(key): str(value) for key, value in map_values.items()}
 
-        # this works but use .strip() on the values to update
-        # current re implementation only captures a group as needed
-        # that why this is as verbose as it gets
-        pattern = (r'^UPDATE:~"([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?)(?: "([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?))?'
-                   r'(?: "([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?))?(?: "([^,\s><=\|&!:"+*-\.\'#/\?]+"=.+?))? ON (.+?)$')
-        regex_update = re.search(pattern, update_query)
+        regex_update = _UPDATE_QUERY_REGEX.search(update_query)
         if regex_update is not None:
             value_tokens = list(filter(None, regex_update.groups()))
             where_update = value_tokens.pop()
-            search_result: Generator[list[str] | str, None, str] = self.leer_datos_csv(search=where_update, query_functions=False)
-            head_update: list[str] = next(search_result)
-            # stores the column index to be updated and also the value or updating
-            # function the value of that col index is going to be updated to
-            col_index: list = []
-            row_index: list = []
-            update_functions_with_args: str = r'^%(?:(REPLACE|RANDOM-INT):~(.+?)#(.+))|%(?:(ADD|SUB|MUL|DIV|NUM-FORMAT):~(.+))$'
-            for update_col in value_tokens:
-                col, col_val  = update_col.split(sep="=", maxsplit=1)
-                # this is mostly to keep the query syntax more consistent
-                # remember that headers are on uppercase
-                col: str = col.replace('"', '').upper()
-                if col not in head_update:
-                    yield "error de sintaxis la columna a actualizar debe estar dentro de la consulta de búsqueda"
-                    return "sintaxis no valida operación cancelada"
-                # can't be head_update because if is shorter than the unfiltered header of the csv
-                # it is going to end up updating the wrong value
-                val_index: int = self.new_head.index(col)
-                if not val_index:
-                    yield "error de sintaxis no se puede actualizar el valor del indice"
-                    return "sintaxis no valida operación cancelada"
-                if (val_function := re.search(update_functions_with_args, col_val)) is not None:
-                    branch_groups = list(filter(None, val_function.groups()))
-                    col_index.append((val_index, [f"%{branch_groups[0]}", *branch_groups[1:]]))
+            self.__sync_meta()
+            # the rows are selected while the csv is copied so it is read only once
+            index_to_update: set[str] | None = None
+            # with dry_run the rows of leer_datos_csv are updated directly when they are the full selected rows
+            preview: Iterator[list[str]] | None = None
+            if isinstance(self.return_pattern(where_update), tuple):
+                # the selected rows are read using the offsets of the .meta so this does not read the whole file
+                update_on: Generator[list[str] | str, None, str] = self.leer_datos_csv(search=where_update)
+                head_update: list[str] = next(update_on)
+                if dry_run:
+                    preview = update_on
+                    is_selected: Callable[[list[str]], bool] = lambda entry: True
                 else:
-                    col_index.append((val_index, col_val))
-            # it is safe to pass an exhausted generator to a for loop
-            # the exception is managed automatically
-            for item in search_result:
-                if isinstance(item, str):
-                    yield item
+                    index_to_update = {entry[0] for entry in update_on}
+                    is_selected = lambda entry: entry[0] in index_to_update
+            elif (compiled := self.__compiled_query(where_update)) is not None:
+                if compiled.error is not None:
+                    yield compiled.error
                     return "sintaxis no valida operación cancelada"
-                row_index.append(item[0])
-            if not row_index:
+                head_update = [column for position, column in enumerate(self.new_head)
+                               if position not in compiled.except_col]
+                stats: QueryStats = compiled.new_stats()
+                is_selected = lambda entry: compiled.matches(entry, stats)
+            else:
+                # the same text search of leer_datos_csv
+                needle: str = where_update.casefold()
+                head_update = list(self.new_head)
+                is_selected = lambda entry: needle in "".join(entry[1:]).casefold()
+                if dry_run:
+                    # the text index or the prefilter of the lines skip the rows without the search
+                    preview = self.leer_datos_csv(search=where_update)
+                    next(preview)
+            # stores the column index to be updated and also the value or updating
+            # function the value of that col index is going to be updated to
+            col_index: list[UpdateOperation] | str = self.__update_operations(value_tokens, head_update, map_values)
+            if isinstance(col_index, str):
+                yield col_index
+                return "sintaxis no valida operación cancelada"
+            if index_to_update is not None and not index_to_update:
                 yield "no se encontraron entradas para actualizar"
                 return "sintaxis valida pero sin entradas seleccionadas para la operación"
+            if dry_run:
+                selected_rows: int = yield from self.__update_preview(preview, is_selected, col_index)
+                if not selected_rows:
+                    yield "no se encontraron entradas para actualizar"
+                    return "sintaxis valida pero sin entradas seleccionadas para la operación"
+                return "vista previa completa, el archivo no fue modificado"
             # for the case that any value was not updated due to impossible update function
             # use due to incorrect expected types for arguments
             was_updated: int = 0
-            with tempfile.TemporaryFile(mode="w+t", encoding="utf-8", newline="", suffix=".csv") as write_update:
-                updater = csv.writer(write_update, delimiter=self.delimiter)
-                reader: Generator[list[str] | str, None, str] = self.leer_datos_csv()
-                updater.writerow(next(reader))
-                for count, entry in enumerate(reader, start=1):
-                    if f"[{count}]" in row_index:
-                        # make this the return value, if str is yield create a new key with
-                        # the col name and set its value to list, you should use a list in case
-                        # one col has multiple errors, by convention col names always in uppercase
-                        # IF error is present you delete the last old if no old is found then that row do not suffered
-                        # any changes
-
-                        # fix this because if there is a str message then the entry is going to be
-                        # pass to the user even if no changed was made (all cols yielded a str) or
-                        # if only some cols where updated
-                        # if all entries update have errors then we do not have old values since
-                        # they are still the same and in result we let know that no update was done
-                        update_status: dict[str, list | dict[str, list]] = self.__parsed_update_query_operation_resolver(entry, col_index, count, map_values)
-                        if sum(len(old_column) for old_column in update_status["old"].values()):
-                            update_status["result"] = entry
-                            was_updated += 1
-                        else:
-                            update_status["result"] = [entry[0], "ningún valor de la fila fue actualizado, todas la operaciones fueron invalidas"]
-                        yield update_status
-                    updater.writerow(entry)
-                if was_updated:
-                    self.__rewrite_data(write_update)
+            selected: int = 0
+            # the types of the columns only have to include the new values
+            updated_types: list[str | None] | None = (list(self._meta["types"]) if self._meta.get("types") is not None
+                                                      else None)
+            signature: tuple[int, int, int] = self.__index_signature()
+            # the csv is rewritten without the rows of the .tomb so the positions of the sorted indexes change
+            same_positions: bool = not self._tombstones
+            # previous and new values of the updated rows for the hash index of enforce_unique
+            old_rows: list[list[str]] = []
+            new_rows: list[list[str]] = []
+            offsets: list[int] = []
+            rows: int = 0
+            # the temporary file replaces the csv (see __delete_rows)
+            write_update = tempfile.NamedTemporaryFile("w", newline="", encoding="utf-8", suffix=".tmp",
+                                                       dir=self.instance_file_path.parent, delete=False)
+            try:
+                with write_update, open(self.instance_file_path, "r", newline="", encoding="utf-8") as csv_reader:
+                    updater = csv.writer(write_update, delimiter=self.delimiter)
+                    read = _csv_rows(csv_reader, self.delimiter)
+                    if self._tombstones:
+                        # skip the rows of the .tomb, the INDICE of the others is their position without them
+                        read = self.__live_rows(read)
+                    header: list[str] = next(read)
+                    for entry in chain((header,), read):
+                        if rows and is_selected(entry):
+                            selected += 1
+                            # make this the return value, if str is yield create a new key with
+                            # the col name and set its value to list, you should use a list in case
+                            # one col has multiple errors, by convention col names always in uppercase
+                            # IF error is present you delete the last old if no old is found then that row do not suffered
+                            # any changes
+
+                            # fix this because if there is a str message then the entry is going to be
+                            # pass to the user even if no changed was made (all cols yielded a str) or
+                            # if only some cols where updated
+                            # if all entries update have errors then we do not have old values since
+                            # they are still the same and in result we let know that no update was done
+                            old_row: list[str] = list(entry)
+                            update_status: dict[str, list | dict[str, list]] = self.__parsed_update_query_operation_resolver(entry, col_index, rows)
+                            if sum(len(old_column) for old_column in update_status["old"].values()):
+                                update_status["result"] = entry
+                                was_updated += 1
+                                if updated_types is not None:
+                                    _merge_row_types(updated_types, entry)
+                                old_rows.append(old_row)
+                                new_rows.append(entry)
+                            else:
+                                update_status["result"] = [entry[0], "ningún valor de la fila fue actualizado, todas la operaciones fueron invalidas"]
+                            yield update_status
+                        if not rows % self._offset_step:
+                            # the file is opened in write only mode so tell is the position in bytes
+                            offsets.append(write_update.tell())
+                        updater.writerow(entry)
+                        rows += 1
+                if not was_updated:
+                    os.unlink(write_update.name)
+                else:
+                    shutil.copymode(self.instance_file_path, write_update.name)
+                    os.replace(write_update.name, self.instance_file_path)
+            except BaseException:
+                # if the copy is interrupted the csv is left as it was
+                write_update.close()
+                Path(write_update.name).unlink(missing_ok=True)
+                raise
+            if not selected:
+                yield "no se encontraron entradas para actualizar"
+                return "sintaxis valida pero sin entradas seleccionadas para la operación"
+            if was_updated:
+                self.__replace_meta(header, rows, offsets, updated_types)
+                self.__update_unique_index(signature, removed=old_rows, added=new_rows)
+                self.__update_aggregates(signature, removed=old_rows, added=new_rows)
+                if same_positions and self._sorted_indexes:
+                    # the INDICE of the rows is also their position in the csv
+                    self.__update_sorted_indexes(signature,
+                                                 removed=[(int(row[0].strip("[]")), row) for row in old_rows],
+                                                 added=[(int(row[0].strip("[]")), row) for row in new_rows])
+                    if self._sorted_signature is not None:
+                        self.__write_sorted_indexes()
+                else:
+                    self._sorted_signature = None
+                if same_positions and self._text_index is not None:
+                    self.__update_text_index(signature,
+                                             removed=[(int(row[0].strip("[]")), row) for row in old_rows],
+                                             added=[(int(row[0].strip("[]")), row) for row in new_rows])
+                    if self._text_signature is not None:
+                        self.__write_text_index()
+                else:
+                    self._text_signature = None
         else:
             yield "error de sintaxis"
 
-    def __query_parser(self, string_pattern) -> list:
-        """ método privado __query_parser
-        permite aplicar operaciones lógicas (>=, <=, <, >, =, != [=, ]=, [], ][, <>, ><, <<, >>, {}, }{) a las búsquedas
-        del usuario dando más posibilidades al momento de filtrar datos
+    def __row_selector(self, where: str) -> tuple[Callable[[list[str]], bool], list[str]] | str:
+        """ método privado row_selector obtiene una función que recibe una fila y retorna si es seleccionada
+        por la búsqueda where (uno de los patrones de return_pattern, una query o un texto) comparando solo
+        los valores de la fila, es ocupado por las transacciones en las que el INDICE de cada fila depende de
+        las operaciones anteriores
 
-        Argumento:
+        Valor de retorno:
 
-        - string_pattern str introducida por el usuario la cual sera ocupada
-        para hacer las comparaciones requeridas a la hora de buscar datos el formato
-        general debe ser '"<nombre_columna>" <operador_lógico> <valor>'
+        - una tuple con la función y el encabezado de la búsqueda o un str con el error de sintaxis de la query
+        """
+        if isinstance(to_search := self.return_pattern(where), tuple):
+            if to_search[0] == ":":
+                low_lim: int = to_search[-1][0]
+                up_lim: int | float = to_search[-1][1] if len(to_search[-1]) > 1 else float("inf")
+                return lambda entry: low_lim <= int(entry[0].strip("[]")) <= up_lim, list(self.new_head)
+            selected_index: set[str] = {f"[{num}]" for num in to_search[-1]}
+            return lambda entry: entry[0] in selected_index, list(self.new_head)
+        if (compiled := self.__compiled_query(where)) is not None:
+            if compiled.error is not None:
+                return compiled.error
+            stats: QueryStats = compiled.new_stats()
+            return (lambda entry: compiled.matches(entry, stats),
+                    [column for position, column in enumerate(self.new_head) if position not in compiled.except_col])
+        # the same text search of leer_datos_csv
+        needle: str = where.casefold()
+        return lambda entry: needle in "".join(entry[1:]).casefold(), list(self.new_head)
+
+    def __transaction_stages(self, operations: list[dict]) -> list[tuple[str, Callable[[list[str]], bool] | None, list]]:
+        """ método privado transaction_stages compila las operaciones de una transacción (tal como se guardan
+        en el archivo .wal) antes de aplicarlas
 
         Valor de retorno:
 
-        - una lista con los tokens a utilizar para filtrar resultados si se encontró un
-        patron de otra forma un lista vacía
+        - una lista con una tuple por operación con su tipo ('delete', 'update' o 'save'), la función que
+        selecciona sus filas (None para 'save') y las UpdateOperation de 'update' o las entradas de 'save'
 
         Excepciones:
 
-        - ValueError si el tipo del argumento requerido no es el indicado
+        - ValueError si alguna de las queries tiene un error de sintaxis
         """
-        if not isinstance(string_pattern, str):
-            raise ValueError(
-                f"el tipo del argumento string_pattern debe ser str pero fue {type(string_pattern).__name__}")
-        query_regex: str = (r'^(?:!?\[([^\[,\s><=\|&!:"+*-\.\'/\?\]]+)*\] )?"([^\s,><=\|&!":+*-\.\'#/\?\[\]]+)" '
-                            r'(>=|>|<=|<|=|!=|\[=|\]=|\[\]|\]\[|<>|><|<<|>>|\{\}|\}\{) (.+?)')
-        query_regex += r"(?: (\||&) "
-        query_regex += r"(?: (\||&) ".join([r'"([^,\s><=\|&!:"+*-\.\'#/\?\[\]]+)" (>=|>|<=|<|=|!=|\[=|\]=|\[\]|\]\[|<>|><|<<|>>|\{\}\}\{) (.+?))?'
-                                            for _ in range(0, 3)])
-        query_regex += r'(?:~((?:AVG|MAX|MIN|SUM|COUNT|LIMIT|ASC|DESC|UNIQUE):(?:[^:,\s><=!\|&"+*\'#/\?\[\]]+)*))?$'
-        new_pattern = re.search(query_regex, string_pattern)
-        if new_pattern is not None:
-            valid_tokens = list(filter(None, new_pattern.groups()))
-            function_group = []
-            if any([val in valid_tokens[-1] for val in
-                    ("AVG:", "MAX:", "MIN:", "COUNT:", "SUM:", "LIMIT:", "ASC:", "DESC:", "UNIQUE:")]):
-                function_group.append(valid_tokens.pop())
-            exclude_group = []
-            for exclude in valid_tokens:
-                if exclude in ("<=", ">=", ">", "<", "=", "!=", "[=", "]=", "[]", "][", "<>", "><", "<<", ">>", "{}", "}{"):
-                    exclude_group.pop()
-                    break
-                else:
-                    exclude_group.append(exclude)
-            if exclude_group:
-                valid_tokens.pop(0)
-            contents: list = []
-            sub_queries: list = []
-            for count, token in enumerate(valid_tokens, 1):
-                if count % 4 == 0:
-                    new_query: list = [] + sub_queries
-                    contents.append(new_query)
-                    contents.append(token)
-                    sub_queries.clear()
-                else:
-                    sub_queries.append(token)
-            contents.append([] + sub_queries)
-            sub_queries.clear()
-            next_token: bool = True
-            for query in contents:
-                if isinstance(query, list) and query:
-                    if str(query[0]).upper() in self.new_head:
-                        try:
-                            sub_queries.append([str(query[0]).upper(), query[1], query[2]])
-                        # query has syntax error that produce
-                        # operations like a > 2 to end like a >
-                        except IndexError:
-                            return []
-                        if not next_token:
-                            next_token = True
-                    else:
-                        next_token = False
-                        try:
-                            if isinstance(sub_queries[-1], str):
-                                sub_queries.pop()
-                        except IndexError:
-                            pass
-                else:
-                    if next_token:
-                        sub_queries.append(query)
-            if exclude_group:
-                exclude_group[0] = tuple(
-                    (self.new_head.index(str(item).upper()) for item in exclude_group[0].split("#") if
-                     str(item).upper() in self.new_head))
-                if exclude_group[0]:
-                    if string_pattern[0] != "!":
-                        exclude_group[0] = tuple(
-                            (val for val in range(1, len(self.new_head)) if val not in exclude_group[0]))
-                    sub_queries.insert(0, exclude_group[0])
-            if function_group:
-                sub_queries.append(function_group[0])
-            return sub_queries
-        return []
-
-    def __parsed_query_operation_resolver(self, current_row: list, parsed_query: list) -> list | str:
-        """ método privado parsed_query_operation_resolver implementa el código
-        que permite tomar la parte de una query que aplica las comparaciones lógicas
-        y retornar una lista con el resultado de cada comparación en un query ya sea True o False
-
-        Argumentos:
-
-        - current_row una lista con los valores de la fila que esta siendo actualmente leída
-
-        - parsed_query una lista que contiene datos extraídos de la query como operación a realizar y
-        valor con el cual comparar
+        stages: list[tuple[str, Callable[[list[str]], bool] | None, list]] = []
+        for operation in operations:
+            if operation["op"] == "save":
+                stages.append(("save", None, operation["rows"]))
+                continue
+            if operation["op"] == "delete":
+                where: str = (operation["query"] if isinstance(self.return_pattern(operation["query"]), tuple)
+                              else re.search(r'^DELETE ON (.+?)$', operation["query"]).group(1))
+                value_tokens: list[str] = []
+            else:
+                value_tokens = list(filter(None, _UPDATE_QUERY_REGEX.search(operation["query"]).groups()))
+                where = value_tokens.pop()
+            if isinstance(selection := self.__row_selector(where), str):
+                raise ValueError(selection)
+            if operation["op"] == "delete":
+                stages.append(("delete", selection[0], []))
+                continue
+            if isinstance(col_index := self.__update_operations(value_tokens, selection[1], operation["map_values"]), str):
+                raise ValueError(col_index)
+            stages.append(("update", selection[0], col_index))
+        return stages
+
+    def __apply_transaction(self, stages: list[tuple[str, Callable[[list[str]], bool] | None, list]]) -> list[list]:
+        """ método privado apply_transaction aplica las operaciones de una transacción (ver transaction_stages)
+        en una sola lectura del csv, cada fila pasa por las operaciones en orden y su INDICE en cada operación es
+        su posición entre las filas que no fueron borradas por las anteriores, las entradas guardadas pasan por
+        las operaciones que siguen a la que las guardo, las filas que quedan se copian a un archivo temporal que
+        remplaza el csv (igual que en delete_rows), si solo se guardan entradas estas se agregan al final del csv
 
         Valor de retorno:
 
-        - un str si se detecto un error de sintaxis en los valores entregados por parsed_query, de lo
-        contrario una lista que contiene el resultado de las comparaciones lógicas pasadas en la query
-        """
-        bool_values: list = []
-        # add function to get the last or first letter and write test
-        # [= is the str star with operator and ]= is the str end with operator
-        # for a = "hola" a[5] gives index error but a[5:] or a[5:10] gives ""
-        operation_hash_table: dict[str, Callable] = {
-        ">=": lambda x, y: x >= y, "<=": lambda x, y: x <= y,
-        "<": lambda x, y: x < y, ">": lambda x, y: x > y,
-        "=": lambda x, y: x == y, "!=": lambda x, y: x != y,
-        "[=": lambda x, y: str(y).lower() in str(x)[0:len(str(y))].lower(),
-        "]=": lambda x, y: str(y).lower() in str(x)[-len(str(y)):].lower(),
-        "[]": lambda x, y: str(y).lower() in str(x).lower(),
-        "][": lambda x, y: str(y).lower() not in str(x).lower(),
-        "<>": lambda x, y: len(x) == y, "><": lambda x, y: len(x) != y,
-        ">>": lambda x, y: len(x) > y, "<<": lambda x, y: len(x) < y,
-        "{}": lambda x, y: x in y, "}{": lambda x, y: x not in y,
-        }
-        for element in parsed_query:
-            if isinstance(element, list):
-                try:
-                    head_index = self.new_head.index(element[0])
-                except IndexError:
-                    # error if col that logical operator is applied to
-                    # is not a valid col name (does not exist)
-                    return "error de sintaxis"
-                # so you can search from index to
-                if head_index > 0:
-                    val = current_row[head_index]
-                else:
-                    # for suing [= ]= with index you don't have to consider []
-                    val = re.sub(r"[\[\]]", "", current_row[head_index])
-                # should always be present on dict no need for get
-                parse_function: Callable = operation_hash_table[element[1]]
-                if element[1] in ("]=", "[=", "[]", "]["):
-                    # this operator only accept values as str no matter if both can
-                    # be numbers of dates otherwise when parsing to float the comparison
-                    # may be False when is True
-                    # since both are string for this case
-                    # no error should be expected to be raised
-                    bool_values.append(parse_function(val, element[-1]))
-                elif element[1] in ("{}", "}{"):
-                    if (match_group := re.match(r"^%RANGE:(.)\[(.+)\]$", element[-1])) is not None:
-                        range_values: list = filter(None, match_group.group(2).split(match_group.group(1)))
-                        bool_values.append(parse_function(val, range_values))
-                    else:
-                        return f"error de sintaxis al ocupar el operador {element[1]}"
-                elif element[1] in ("<>", "><", "<<", ">>",):
-                    try:
-                        bool_values.append(parse_function(str(val), int(element[-1])))
-                    except ValueError:
-                        bool_values.append(False)
+        - una lista por operación con las filas borradas (str), los dict de las filas seleccionadas por una
+        actualización (igual que en actualizar_datos) o las entradas guardadas (igual que en guardar_datos_csv_many)
+        """
+        self.__sync_meta()
+        if all(kind == "save" for kind, _, _ in stages):
+            new_rows, saved = self.__appended_rows(stages)
+            if new_rows:
+                self.__append_rows(new_rows)
+                self.current_rows = self._meta["rows"] - len(self._tombstones)
+            return saved
+        results: list[list] = [[] for _ in stages]
+        head_str: str = f"{self.delimiter}".join(self.new_head)
+        updated_types: list[str | None] | None = (list(self._meta["types"]) if self._meta.get("types") is not None
+                                                  else None)
+        signature: tuple[int, int, int] = self.__index_signature()
+        # previous values of the rows deleted or changed and the new values of the rows changed or saved
+        # are only kept if the hash index of enforce_unique or the aggregates have to be updated
+        keep_rows: bool = bool(self._unique_index or self._aggregates)
+        removed: list[list[str]] = []
+        added: list[list[str]] = []
+        # the sorted indexes and the full text index are created again with the new positions
+        indexed: tuple[str, ...] = tuple(self.__sorted_indexes() or self._sorted_indexes)
+        if indexed:
+            add_index_row, finish_indexes = self.__sorted_index_builder(indexed)
+        text_index: dict[str, list[int]] | None = None if self.__text_index() is None else {}
+        # number of rows that reached each operation
+        counts: list[int] = [0] * len(stages)
+        offsets: list[int] = []
+        rows: int = 0
+        # number of rows deleted, changed or saved, without them the csv is not replaced
+        changes: int = 0
+
+        def write_row(entry: list[str], first_stage: int, saved: bool) -> None:
+            nonlocal rows, changes
+            original: list[str] | None = list(entry) if keep_rows and not saved else None
+            changed: bool = saved
+            for number in range(first_stage, len(stages)):
+                kind, is_selected, col_index = stages[number]
+                counts[number] += 1
+                if kind == "save":
+                    continue
+                entry[0] = f"[{counts[number]}]"
+                if not is_selected(entry):
+                    continue
+                if kind == "delete":
+                    results[number].append(f"{self.delimiter}".join(entry))
+                    changes += 1
+                    if original is not None:
+                        removed.append(original)
+                    return
+                update_status: dict[str, list | dict[str, list]] = self.__parsed_update_query_operation_resolver(
+                    entry, col_index, counts[number])
+                if sum(len(old_column) for old_column in update_status["old"].values()):
+                    update_status["result"] = list(entry)
+                    changed = True
                 else:
-                    try:
-                        row_val, expected_val = float(val), float(element[-1])
-                    except ValueError:
-                        pass
-                    else:
-                        bool_values.append(parse_function(row_val, expected_val))
+                    update_status["result"] = [entry[0], "ningún valor de la fila fue actualizado, todas la operaciones fueron invalidas"]
+                results[number].append(update_status)
+            entry[0] = f"[{rows}]"
+            if changed:
+                changes += 1
+                if keep_rows:
+                    if original is not None:
+                        removed.append(original)
+                    added.append(entry)
+                if updated_types is not None:
+                    _merge_row_types(updated_types, entry)
+            if indexed:
+                add_index_row(rows, entry)
+            if text_index is not None:
+                for token in _text_tokens(entry):
+                    text_index.setdefault(token, []).append(rows)
+            if not rows % self._offset_step:
+                # the file is opened in write only mode so tell is the position in bytes
+                offsets.append(write_transaction.tell())
+            writer.writerow(entry)
+            rows += 1
+
+        # the temporary file replaces the csv (see __delete_rows)
+        write_transaction = tempfile.NamedTemporaryFile("w", newline="", encoding="utf-8", suffix=".tmp",
+                                                        dir=self.instance_file_path.parent, delete=False)
+        try:
+            with write_transaction, open(self.instance_file_path, "r", newline="", encoding="utf-8") as csv_reader:
+                writer = csv.writer(write_transaction, delimiter=self.delimiter)
+                read = _csv_rows(csv_reader, self.delimiter)
+                if self._tombstones:
+                    # skip the rows of the .tomb, they are not copied
+                    read = self.__live_rows(read)
+                header: list[str] = next(read)
+                offsets.append(write_transaction.tell())
+                writer.writerow(header)
+                rows += 1
+                for entry in read:
+                    write_row(entry, 0, False)
+                # the saved entries go after the rows that reached their operation
+                for number, (kind, _, entries) in enumerate(stages):
+                    if kind != "save":
                         continue
+                    for values in entries:
+                        if counts[number] >= BaseCsvManager.max_row_limit or not BaseCsvManager.max_row_limit:
+                            results[number].append(self.__save_warning("rows"))
+                            continue
+                        counts[number] += 1
+                        results[number].append(f"\n{head_str}\n[{counts[number]}]{self.delimiter}{f'{self.delimiter}'.join(values)}")
+                        write_row([f"[{counts[number]}]", *values], number + 1, True)
+            if not changes:
+                os.unlink(write_transaction.name)
+                return results
+            shutil.copymode(self.instance_file_path, write_transaction.name)
+            os.replace(write_transaction.name, self.instance_file_path)
+        except BaseException:
+            # also if an operation fails midway, the csv is left as it was
+            write_transaction.close()
+            Path(write_transaction.name).unlink(missing_ok=True)
+            raise
+        self.__replace_meta(header, rows, offsets, updated_types)
+        self.__update_unique_index(signature, removed=removed, added=added)
+        self.__update_aggregates(signature, removed=removed, added=added)
+        if indexed:
+            self._sorted_indexes, self._sorted_signature = finish_indexes(), self.__index_signature()
+            self.__write_sorted_indexes()
+        if text_index is not None:
+            self._text_index, self._text_signature, self._text_vocabulary = text_index, self.__index_signature(), None
+            self.__write_text_index()
+        return results
+
+    def __appended_rows(self, stages: list[tuple[str, Callable[[list[str]], bool] | None, list]]
+                        ) -> tuple[list[list[str]], list[list]]:
+        """ método privado appended_rows retorna las filas que agrega al final del csv una transacción que solo
+        guarda entradas y los resultados de cada operación (las entradas guardadas o la advertencia del
+        máximo de filas), el INDICE de cada fila es su posición en el archivo (las filas del .tomb siguen en él)
+        """
+        results: list[list] = [[] for _ in stages]
+        head_str: str = f"{self.delimiter}".join(self.new_head)
+        new_rows: list[list[str]] = []
+        current_rows: int = self.current_rows
+        for number, (_, _, entries) in enumerate(stages):
+            for values in entries:
+                if current_rows - 1 >= BaseCsvManager.max_row_limit or not BaseCsvManager.max_row_limit:
+                    results[number].append(self.__save_warning("rows"))
+                    continue
+                new_rows.append([f"[{self._meta['rows'] + len(new_rows)}]", *values])
+                current_rows += 1
+                results[number].append(f"\n{head_str}\n[{current_rows - 1}]{self.delimiter}{f'{self.delimiter}'.join(values)}")
+        return new_rows, results
+
+    def __replay_wal(self) -> None:
+        """ método privado replay_wal revisa los archivos .wal de las transacciones del csv (ver _wal_paths), los
+        que siguen bloqueados pertenecen a una transacción abierta (de este u otro proceso) y no se modifican,
+        de los demás se aplica la transacción si fue confirmada y el csv no cambio desde entonces (el programa se
+        detuvo antes de aplicarla) y luego se eliminan, una transacción que no fue confirmada o que ya fue
+        aplicada solo se elimina, sin fcntl (windows) no se puede saber si una transacción sin confirmar sigue
+        abierta por lo que su .wal no se elimina, es ocupado con el bloqueo exclusivo del csv
+        """
+        for wal_path in self._wal_paths(self.instance_file_path):
+            try:
+                wal_reader: TextIO = open(wal_path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                # the transaction ended after the directory was read
+                continue
+            with wal_reader:
+                if fcntl is not None:
                     try:
-                        # the only standard I will support
-                        row_time = date.fromisoformat(val)
-                        expected_time = date.fromisoformat(element[-1])
-                    except ValueError:
-                        pass
-                    else:
-                        bool_values.append(parse_function(row_time, expected_time))
+                        fcntl.flock(wal_reader.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # the transaction is still open
                         continue
+                operations: list[dict] = []
+                for line in wal_reader:
                     try:
-                        bool_values.append(parse_function(val, element[-1]))
-                    except TypeError:
-                        bool_values.append(False)
+                        operations.append(json.loads(line))
+                    except ValueError:
+                        # the last line was not completely written
+                        break
+                if operations and operations[-1].get("op") == "commit":
+                    self.__replay_commit(operations)
+                elif fcntl is None:
+                    continue
+                # removed while it is locked so a transaction that just ended can't find it
+                wal_path.unlink(missing_ok=True)
+
+    def __replay_commit(self, operations: list[dict]) -> None:
+        """ método privado replay_commit aplica las operaciones de una transacción confirmada (la ultima de
+        operations es el commit) si el csv no cambio desde el commit, si el programa se detuvo mientras se
+        agregaban las entradas de una transacción que solo guarda entradas el csv se corta al tamaño que tenia
+        al confirmarla antes de volver a aplicarla
+        """
+        file_stat = os.stat(self.instance_file_path)
+        commit: dict = operations[-1]
+        if commit["size"] < file_stat.st_size < commit.get("appended", 0):
+            # only part of the entries were appended, the csv is copied without them instead of truncated
+            # because other processes may still be reading it mapped in memory (see SharedMapping)
+            write_kept = tempfile.NamedTemporaryFile("wb", suffix=".tmp", dir=self.instance_file_path.parent,
+                                                     delete=False)
+            try:
+                with write_kept, open(self.instance_file_path, "rb") as raw_reader:
+                    remaining: int = commit["size"]
+                    while remaining and (chunk := raw_reader.read(min(remaining, _SCAN_CHUNK))):
+                        write_kept.write(chunk)
+                        remaining -= len(chunk)
+                shutil.copymode(self.instance_file_path, write_kept.name)
+                os.replace(write_kept.name, self.instance_file_path)
+            except BaseException:
+                Path(write_kept.name).unlink(missing_ok=True)
+                raise
+            self.__sync_meta()
+        elif (commit["size"], commit["mtime_ns"]) != (file_stat.st_size, file_stat.st_mtime_ns):
+            # the csv changed since the commit so the transaction was already applied
+            return
+        if self.current_rows:
+            self.__apply_transaction(self.__transaction_stages(operations[:-1]))
+
+    def __update_operations(self, value_tokens: list[str], head_update: list[str],
+                            map_values: dict[str, str] | None) -> list[UpdateOperation] | str:
+        """ método privado update_operations compila una sola vez las actualizaciones de una query UPDATE
+        ('"<nombre_columna>"=<valor o función>') para todas las filas
+
+        Argumentos:
+
+        - value_tokens lista con las actualizaciones de la query
+
+        - head_update el encabezado de la búsqueda de las filas a actualizar, solo se pueden actualizar sus columnas
+
+        - map_values el dict de %MAP-VALUE o None
+
+        Valor de retorno:
+
+        - una lista con una UpdateOperation por actualización o un str con el error de sintaxis
+        """
+        col_index: list[UpdateOperation] = []
+        update_functions_with_args: str = r'^%(?:(REPLACE|RANDOM-INT):~(.+?)#(.+))|%(?:(ADD|SUB|MUL|DIV|NUM-FORMAT):~(.+))$'
+        for update_col in value_tokens:
+            col, col_val  = update_col.split(sep="=", maxsplit=1)
+            # this is mostly to keep the query syntax more consistent
+            # remember that headers are on uppercase
+            col: str = col.replace('"', '').upper()
+            if col not in head_update:
+                return "error de sintaxis la columna a actualizar debe estar dentro de la consulta de búsqueda"
+            # can't be head_update because if is shorter than the unfiltered header of the csv
+            # it is going to end up updating the wrong value
+            val_index: int = self.new_head.index(col)
+            if not val_index:
+                return "error de sintaxis no se puede actualizar el valor del indice"
+            if (val_function := re.search(update_functions_with_args, col_val)) is not None:
+                branch_groups = list(filter(None, val_function.groups()))
+                new_val: str | list[str] = [f"%{branch_groups[0]}", *branch_groups[1:]]
             else:
-                bool_values.append(element)
-        return bool_values
+                new_val = col_val
+            # the value or function is compiled once for all the rows
+            col_index.append(UpdateOperation(col, val_index, new_val if isinstance(new_val, str) else tuple(new_val),
+                                             _update_operation(val_index, new_val, self.new_head, map_values)))
+        return col_index
+
+    def __update_preview(self, preview: Iterator[list[str]] | None, is_selected: Callable[[list[str]], bool],
+                         col_index: list[UpdateOperation]) -> Generator[dict[str, list | dict[str, list]], None, int]:
+        """ método privado update_preview envía el resultado de actualizar cada fila seleccionada igual que
+        actualizar_datos pero sin escribir nada en el disco (dry_run)
+
+        Argumentos:
+
+        - preview un iterador con las filas ya seleccionadas o None para leer todas las filas del csv
+
+        - is_selected función que recibe una fila y retorna si se debe actualizar
+
+        - col_index lista con las UpdateOperation de la query
+
+        Valor de retorno:
+
+        - un generador que envía un dict por cada fila seleccionada y retorna el número de filas seleccionadas
+        """
+        selected: int = 0
+        with (open(self.instance_file_path, "r", newline="", encoding="utf-8") if preview is None
+              else nullcontext()) as csv_reader:
+            if preview is None:
+                # the rows appended by other processes once the lock is released are not read
+                preview = islice(_csv_rows(csv_reader, self.delimiter), self._meta["rows"])
+                if self._tombstones:
+                    preview = self.__live_rows(preview)
+                next(preview)
+            for entry in preview:
+                if not is_selected(entry):
+                    continue
+                selected += 1
+                update_status: dict[str, list | dict[str, list]] = self.__parsed_update_query_operation_resolver(
+                    entry, col_index, int(entry[0].strip("[]")))
+                if sum(len(old_column) for old_column in update_status["old"].values()):
+                    update_status["result"] = entry
+                else:
+                    update_status["result"] = [entry[0], "ningún valor de la fila fue actualizado, todas la operaciones fueron invalidas"]
+                yield update_status
+        return selected
 
-    def __query_function_state_updater(self, current_row: list, query_headers: tuple, status_container: list) -> str:
+    def __query_function_state_updater(self, current_row: list, query_headers: tuple, status_container: list,
+                                       value_casts: tuple[Callable, ...] = _CASCADE_CASTS) -> str:
         """ método privado query_function_state_updater gestiona la actualización del estado actual
         del objeto en este caso una lista encargado de almacenar el valor acumulado para la función pasada
         en la query
@@ -1137,6 +3642,9 @@ class SingleCsvManager(BaseCsvManager):
 
         - status_container una lista que almacena distintas variables dependiendo de la función usada en el query
 
+        - value_casts tuple con las conversiones que se prueban en orden sobre el valor de la columna, si se
+        conoce el tipo de la columna solo se ocupa la conversión de ese tipo
+
         Valor de retorno:
 
         - un str que retorna el identificador de la función usada actualmente o el estado actual de esa
@@ -1167,19 +3675,14 @@ class SingleCsvManager(BaseCsvManager):
             else:
                 status_container[2][-1][current_value] += 1
         elif status_container[0] in ("ASC", "DESC"):
-            last_len = len(status_container[-1])
             current_row = [current_row[0],] + [current_row[item] for item in
                                         range(1, len(current_row)) if
                                         item not in query_headers] if query_headers else current_row
-            status_container[-1].add(current_row[status_container[2]])
-            if last_len != len(status_container[-1]):
-                if query_headers:
-                    status_container[1].append(current_row)
-                else:
-                    status_container[1].append(current_row)
+            # the rows with a repeated value are left out when the rows are sorted
+            status_container[1].add(current_row)
         else:
             function_val = current_row[status_container[-1]]
-            for is_type in (float, date.fromisoformat, str):
+            for is_type in value_casts:
                 try:
                     val_type = is_type(function_val)
                 except ValueError:
@@ -1240,7 +3743,7 @@ class SingleCsvManager(BaseCsvManager):
                     break
         return status_container[0]
 
-    def __parsed_update_query_operation_resolver(self, update_row: list, update_value: list, current_row: int, map_values: None | dict = None) -> dict[str, list | dict[str, list]]:
+    def __parsed_update_query_operation_resolver(self, update_row: list, update_value: list[UpdateOperation], current_row: int) -> dict[str, list | dict[str, list]]:
         """ método privado parsed_query_operation_resolver implementa la lógica que actualiza los datos
         en una fila cuando se usa una query de actualización de valores
 
@@ -1248,179 +3751,31 @@ class SingleCsvManager(BaseCsvManager):
 
         - update_row una lista con los valores de la fila que va a ser actualizada
 
-        - update_value una lista que contiene el valor con o sin funciones de actualización extraídos
-        desde la query
+        - update_value una lista con la actualización ya compilada de cada columna de la query (UpdateOperation)
+        en el orden de la query
 
         - current_row un número, el valor del indice de la fila actual
 
-        - map_values None o un dict que contiene pares de llaves y valores que se usaran para
-        actualizar los campos si se usa la función %MAP-VALUES
-
         Valor de retorno:
 
         - un diccionario que contiene información sobre el estado de la fila después de ser actualizada,
         que valores fueron cambiados (con el valor anterior) y que errores si hubo durante la actualización
         """
-        update_functions: dict[str, Callable] = {
-                "%UPPER": lambda x: str(x).upper(), "%LOWER": lambda x: str(x).lower(),
-                "%TITLE": lambda x: str(x).title(), "%CAPITALIZE": lambda x: str(x).capitalize(),
-                "%MAP-VALUE": lambda x, y: x if not isinstance(y, dict) else y.get(x, x),
-                "%REPLACE": lambda x, old, new: str(x).replace(old, new) if new != "%VOID" else str(x).replace(old, ""),
-                "%ADD": lambda x, y: str(x + y), "%SUB": lambda x, y: str(x - y),
-                "%MUL": lambda x, y: str(x * y), "%DIV": lambda x, y: str(x) if not y else str(x/y),
-                "%RANDOM-INT": lambda x, y: str(randint(x, y)) if x < y else str(randint(y, x)),
-                "%CEIL": lambda x: str(ceil(x)), "%FLOOR": lambda x: str(floor(x)),
-                "%NUM-FORMAT": lambda x, y: f"{x:.{y}f}",}
-
         operations_status: dict[str, list | dict[str, list]] = {"result": [], "errors": {}, "old": {}}
-        for position, new_val in update_value:
+        old_values, errors = operations_status["old"], operations_status["errors"]
+        for operation in update_value:
             # start appending the old value and remove it if an error is appended
-            if operations_status["old"].get(self.new_head[position], None) is None:
-                operations_status["old"][self.new_head[position]] = [update_row[position],]
+            column_old: list[str] = old_values.setdefault(operation.column, [])
+            column_errors: list[str] = errors.setdefault(operation.column, [])
+            column_old.append(update_row[operation.position])
+            if isinstance(new_value := operation.apply(update_row, current_row), str):
+                update_row[operation.position] = new_value
             else:
-                operations_status["old"][self.new_head[position]].append(update_row[position])
-            if operations_status["errors"].get(self.new_head[position], None) is None:
-                operations_status["errors"][self.new_head[position]] = []
-            if new_val in ("%UPPER", "%LOWER", "%TITLE", "%CAPITALIZE"):
-                update_row[position] = update_functions[new_val](update_row[position])
-            elif new_val == "%MAP-VALUE":
-                if isinstance(map_values, dict):
-                    update_row[position] = update_functions[new_val](update_row[position], map_values)
-                else:
-                    operations_status["old"][self.new_head[position]].pop()
-                    operations_status["errors"][self.new_head[position]].append(f"para poder aplicar la función {new_val} map_values debe ser un dict con los valores a ocupar pero fue {type(map_values).__name__}")
-            # NAN AND INF DO NOT PASS THIS TRY THEY RAISE VALUE ERROR
-            elif new_val in ("%CEIL", "%FLOOR"):
-                try:
-                    update_row[position] = update_functions[new_val](float(update_row[position]))
-                except ValueError:
-                    operations_status["old"][self.new_head[position]].pop()
-                    operations_status["errors"][self.new_head[position]].append(f"solo es posible aplicar la función {new_val} a números y su valor fue {update_row[position]}")
-            elif isinstance(new_val, list):
-                if new_val[0] in ("%REPLACE",):
-                    update_row[position] = update_functions[new_val[0]](update_row[position], *new_val[1:])
-                elif new_val[0] == "%RANDOM-INT":
-                    try:
-                        limit_1 = int(new_val[1])
-                        limit_2 = int(new_val[-1])
-                    except ValueError:
-                        operations_status["old"][self.new_head[position]].pop()
-                        operations_status["errors"][self.new_head[position]].append(("para usar la función %RANDOM-INT debe pasar dos números enteros como limites inferior "
-                                                                                    f"y superior pero introdujo {new_val[1]} y {new_val[-1]} entrada [{current_row}] no actualizada"))
-                    else:
-                        update_row[position] = update_functions["%RANDOM-INT"](limit_1, limit_2)
-                elif new_val[0] == "%NUM-FORMAT":
-                    parse_values: list = []
-                    for count, callable_item, argument_item in ((0, float, update_row[position]), (1, int, new_val[-1])):
-                        descriptor: str = "ocupar una columna que contenga valores decimales o enteros" if not count else "pasar como argumento un número entero"
-                        try:
-                            parsed_val: float | int = callable_item(argument_item)
-                        except ValueError:
-                            operations_status["old"][self.new_head[position]].pop()
-                            operations_status["errors"][self.new_head[position]].append((f"para usar la función %NUM-FORMAT debe {descriptor} "
-                                                                                            f"pero el valor fue de tipo {type(argument_item).__name__}"))
-                        else:
-                            parse_values.append(parsed_val)
-                    if len(parse_values) == 2:
-                        # consider for future release a config file to
-                        # allow easier manipulation of global variables like 25
-                        # (formatting limit for float)
-                        # PASSING 0 TO %INT-FORMAT IS LIKE USING %CEIL range is 1 to 25
-                        # since we already have a floor function
-                        if not (25 >= parse_values[-1] > 0):
-                            operations_status["old"][self.new_head[position]].pop()
-                            operations_status["errors"][self.new_head[position]].append(("el segundo argumento para la función %NUM-FORMAT "
-                                                                                        f"debe ser un número entre 1 y 25 pero fue {parse_values[-1]}"))
-                        else:
-                            update_row[position] = update_functions[new_val[0]](*parse_values)
-                else:
-                    # CHECK IF IS FLOAT OR STR TO DO THE REQUIRED OPERATIONS
-                    # TEST ON REPLACE IN FLOAT AND THEN IN THAT FLOAT TEST ONE OF THE OTHER FUNCTIONS
-                    # CHECK IF NO ENTRIES WHERE UPDATED DUE TO NOT MEETING THE CONDITIONS FOR THE
-                    # FUNCTIONS
-                    # you can do operations between dates but is better to do operations
-                    # between dates and umbers since you can't sum dates but you can sum and
-                    # subtract numbers from dates
-                    # test for float when is nan and float if div is passed a 0
-                    # test if it fails for a column but it does not for another
-
-                    # this code is for allowing to do arithmetics with another value of the same row
-                    value_for_col: str = new_val[-1]
-                    if (use_another := re.search(r"^USE:~(.+)$", new_val[-1])) is not None:
-                        # to not consider the index
-                        if (other_col_val := use_another.group(1).upper()) in self.new_head[1:]:
-                            value_for_col: str = update_row[self.new_head.index(other_col_val)]
-                        else:
-                            operations_status["old"][self.new_head[position]].pop()
-                            operations_status["errors"][self.new_head[position]].append(("el selector USE:~ solo se puede usar para pasar como argumento el valor de otra columna en la fila a la función "
-                                                                                f"seleccionada por lo que el valor debe ser el nombre de una columna ({self.new_head[1:]}) pero fue {other_col_val}"))
-                            continue
-                    for possibly_type in ([float, float], [date.fromisoformat, int], [str, str]):
-                        try:
-                            cast_current_value: float | date | str = possibly_type[0](update_row[position])
-                            cast_function_value: float | int | str = possibly_type[1](value_for_col)
-                        except ValueError:
-                            pass
-                        else:
-                            if isinstance(cast_current_value, float):
-                                # nan and inf operations are defined internally for float
-                                update_row[position] = update_functions[new_val[0]](cast_current_value, cast_function_value)
-                            elif isinstance(cast_current_value, date):
-                                if new_val[0] in ("%ADD", "%SUB"):
-                                    if 0 < cast_function_value <= 1_000:
-                                        update_row[position] = update_functions[new_val[0]](cast_current_value, timedelta(days=cast_function_value))
-                                    else:
-                                        operations_status["old"][self.new_head[position]].pop()
-                                        operations_status["errors"][self.new_head[position]].append(("superado el número de días que se puede añadir o restar a una fecha "
-                                                                                                        f"(entre 1 y 1000) ya que su valor fue {cast_function_value} entrada [{current_row}] no actualizada"))
-                                else:
-                                    operations_status["old"][self.new_head[position]].pop()
-                                    operations_status["errors"][self.new_head[position]].append(("solo es posible aplicar una función %ADD o %SUB sobre una fecha "
-                                                                                                    f"y su elección fue {new_val[0]} entrada [{current_row}] no actualizada"))
-                            elif isinstance(cast_current_value, str):
-                                if new_val[0] == "%ADD":
-                                    update_row[position] = update_functions[new_val[0]](cast_current_value, cast_function_value)
-                                else:
-                                    operations_status["old"][self.new_head[position]].pop()
-                                    operations_status["errors"][self.new_head[position]].append(("no se puede aplicar una función que no sea %ADD sobre un str "
-                                                                                                f"y su elección fue {new_val[0]} entrada [{current_row}] no actualizada"))
-                            break
-            # using regex is better for case insensitive col name reference handling
-            elif (copy_value := re.search(r"^%COPY:~(.+)$", new_val)) is not None:
-                if (target_copy := copy_value.group(1).upper()) in self.new_head:
-                    if target_copy == "INDICE":
-                        update_row[position] = re.sub(r"[\[\]]", "", update_row[self.new_head.index(target_copy)])
-                    else:
-                        update_row[position] = update_row[self.new_head.index(target_copy)]
-                else:
-                    operations_status["old"][self.new_head[position]].pop()
-                    operations_status["errors"][self.new_head[position]].append(("la función %COPY solo se puede usar para copiar el valor de una columna a otra para lo cual "
-                                                                                f"debe seleccionar el nombre de una columna, su valor fue {target_copy} pero las opciones son {self.new_head[1:]} "
-                                                                                f"entrada [{current_row}] no actualizada"))
-            else:
-                update_row[position] = new_val
+                for error in new_value:
+                    column_old.pop()
+                    column_errors.append(error)
         return operations_status
 
-    def __rewrite_data(self, file_helper: TextIO) -> None:
-        """ método privado rewrite_data permite reescribir los datos al
-        archivo correspondiente desde un archivo temporal
-
-        Argumentos:
-
-        - file_helper un objeto TextIO el cual permite leer o escribir datos a un archivo en forma de texto
-
-        Valor de retorno:
-
-        - None
-        """
-        # set cursor back to the top of file
-        file_helper.seek(0)
-        with open(str(self.instance_file_path), "w", newline="", encoding="utf-8") as write_back:
-            back_data = csv.writer(write_back, delimiter=self.delimiter)
-            reader_filter = csv.reader(file_helper, delimiter=self.delimiter)
-            for entry in reader_filter:
-                back_data.writerow(entry)
-
     # you can't pass an unpacked dict to
     # a function with *args because when using args
     # the arguments become only positional and not referable by
@@ -1459,7 +3814,8 @@ class SingleCsvManager(BaseCsvManager):
 
 
     @classmethod
-    def index(cls, file_path, delimiter, id_present=True, new_name = None, extra_columns = None, exclude = None) -> Type:
+    def index(cls, file_path, delimiter, id_present=True, new_name = None, extra_columns = None, exclude = None,
+              text_index = False) -> Type:
         """ método de clase index
         permite agregar indices con el formato de este programa y
         crear un objeto para que pueda usarse de intermediario para
@@ -1488,6 +3844,8 @@ class SingleCsvManager(BaseCsvManager):
 
         - exclude: list con el nombre de las columnas a excluir del archivo o None
 
+        - text_index: bool si es True se crea el indice de texto del nuevo archivo (ver create_text_index)
+
         Valor de retorno:
 
         - un objeto creado de tipo CsvObjectWriter el cual puede ser usado para
@@ -1505,6 +3863,9 @@ class SingleCsvManager(BaseCsvManager):
         if not isinstance(id_present, bool):
             raise ValueError(
                 f"el tipo esperado para el argumento id_present es bool pero fue {type(id_present).__name__}")
+        if not isinstance(text_index, bool):
+            raise ValueError(
+                f"el tipo esperado para el argumento text_index es bool pero fue {type(text_index).__name__}")
         if new_name is not None:
             if not isinstance(new_name, str):
                 raise ValueError(f"el valor a asignar para el argumento new_name debe ser str pero fue {type(new_name).__name__}")
@@ -1591,12 +3952,1245 @@ class SingleCsvManager(BaseCsvManager):
                         # and the entries per row if you use id_present = False
                         line = [f"[{count}]",] + line
                         new_back_up.writerow([value for value in line if line.index(value) not in excluded_values] + default_vals)
+            # so the instances created for this file don't have to read it again
+            new_meta: dict = cls._build_meta(new_class.instance_file_path, new_class.delimiter)
+            new_meta["types"] = cls._infer_types(new_class.instance_file_path, new_class.delimiter)
+            cls._write_meta(new_class.instance_file_path, new_meta)
+            # the deleted rows of a previous file with the same name are not part of the new one
+            new_class.instance_file_path.with_suffix(".tomb").unlink(missing_ok=True)
+            if new_class.instance_file_path.with_suffix(".idx").is_file():
+                # the sorted indexes of a previous file with the same name are created again for the new one
+                cls(file_name, None, new_class.delimiter).__sorted_indexes()
+            if text_index or new_class.instance_file_path.with_suffix(".fts").is_file():
+                # also when a previous file with the same name had a full text index
+                cls(file_name, None, new_class.delimiter).create_text_index()
             return cls.create_writer(*head_file[1:])
 
+    @staticmethod
+    def _raw_records(raw_reader) -> Generator[tuple[int, bytes], None, None]:
+        """ método estático privado _raw_records permite recorrer las filas de un archivo csv
+        sin decodificarlas ni separarlas en columnas
+
+        Argumento:
+
+        - raw_reader un archivo abierto en modo binario, se empieza a leer desde su posición actual
+        la cual debe ser el inicio de una fila
+
+        Valor de retorno:
+
+        - un generador que envía tuples con la posición en bytes donde empieza cada fila y los bytes
+        de la fila (incluido el salto de linea), una fila puede ocupar más de una linea si tiene
+        valores entre comillas con saltos de linea por lo que se lleva la cuenta de las comillas, las
+        lineas en blanco no son filas y se omiten
+        """
+        offset: int = raw_reader.tell()
+        record: bytes = b""
+        for line in raw_reader:
+            record = record + line if record else line
+            # an odd number of quotes means a quoted value is still open
+            if record.count(b'"') % 2:
+                continue
+            # blank lines are not rows (see _csv_rows)
+            if record.strip(b"\r\n"):
+                yield offset, record
+            offset += len(record)
+            record = b""
+        if record.strip(b"\r\n"):
+            yield offset, record
+
+    def _parse_record(self, record: bytes) -> list[str]:
+        """ método privado _parse_record separa en columnas los bytes de una fila obtenida con _raw_records,
+        una linea en blanco da como resultado una lista vacía al igual que con csv.reader
+        """
+        return next(csv.reader(io.StringIO(record.decode("utf-8"), newline=""), delimiter=self.delimiter), [])
+
+    @contextmanager
+    def __shared_mapping(self) -> Iterator[SharedMapping]:
+        """ método privado shared_mapping permite ocupar el csv mapeado en memoria (SharedMapping) con with, el
+        mapeo se comparte con los demás generadores de la instancia que lo estén ocupando si el csv no cambio
+        desde que se creo y se cierra cuando ninguno lo ocupa
+        """
+        mapping: SharedMapping | None = self._mapping
+        if mapping is None or mapping.signature != (self._meta["size"], self._meta["mtime_ns"]):
+            # the generators using the previous mapping keep it until they finish
+            mapping = self._mapping = SharedMapping(self.instance_file_path, self._meta)
+        mapping.users += 1
+        try:
+            yield mapping
+        finally:
+            mapping.users -= 1
+            if not mapping.users:
+                mapping.close()
+                if self._mapping is mapping:
+                    self._mapping = None
+
+    def __row_offset(self, mapping: SharedMapping, row_number: int) -> int | None:
+        """ método privado row_offset retorna la posición en bytes de la fila row_number (0 es el encabezado)
+        saltando a la posición más cercana guardada en el .meta del archivo mapeado, por lo que a lo más se
+        recorren _offset_step filas sin necesidad de decodificarlas
+
+        Argumentos:
+
+        - mapping el csv mapeado en memoria
+
+        - row_number el número de la fila a buscar
+
+        Valor de retorno:
+
+        - la posición en bytes de la fila o None si el archivo no tiene esa fila
+        """
+        if not 0 <= row_number < mapping.rows:
+            return None
+        checkpoint, skip = divmod(row_number, mapping.step)
+        for offset, _ in mapping.records(mapping.offsets[checkpoint]):
+            if not skip:
+                return offset
+            skip -= 1
+        return None
+
+    def __rows_at(self, row_numbers: list[int]) -> Generator[list[str], None, None]:
+        """ método privado rows_at envía las filas pedidas en row_numbers (ordenados de menor a mayor)
+        leyendo solo esas filas del archivo csv, los números son el INDICE sin contar las filas del .tomb
+        """
+        with self.__shared_mapping() as mapping:
+            renumber: bool = bool(self._tombstones)
+            for row_number, position in zip(row_numbers, self.__physical_rows(row_numbers)):
+                if (offset := self.__row_offset(mapping, position)) is None:
+                    break
+                for _, record in mapping.records(offset):
+                    row: list[str] = self._parse_record(record)
+                    if renumber:
+                        row[0] = f"[{row_number}]"
+                    yield row
+                    break
+
+    def __rows_in_range(self, low_lim: int, up_lim: int) -> Generator[list[str], None, None]:
+        """ método privado rows_in_range envía las filas entre low_lim y up_lim (ambos incluidos)
+        empezando a leer el archivo csv desde la posición de la fila low_lim, los limites son el
+        INDICE sin contar las filas del .tomb
+        """
+        with self.__shared_mapping() as mapping:
+            position: int = next(self.__physical_rows((low_lim,)))
+            if low_lim > up_lim or (offset := self.__row_offset(mapping, position)) is None:
+                return
+            # every record is a whole row so the reader takes one record for each row
+            read = csv.reader((record.decode("utf-8") for _, record in mapping.records(offset)),
+                              delimiter=self.delimiter)
+            if not self._tombstones:
+                for _, row in zip(range(low_lim, up_lim + 1), read):
+                    yield row
+                return
+            tombstones: set[int] = set(self._tombstones)
+            row_number: int = low_lim
+            for row in read:
+                if row_number > up_lim:
+                    break
+                if position not in tombstones:
+                    row[0] = f"[{row_number}]"
+                    yield row
+                    row_number += 1
+                position += 1
+
+    def __rows_at_positions(self, positions: list[int]) -> Generator[list[str], None, None]:
+        """ método privado rows_at_positions envía las filas que están en las posiciones positions del csv
+        (ordenadas de menor a mayor y sin contar las filas del .tomb), las filas cercanas se leen de corrido
+        y para las demás se salta a la posición más cercana guardada en el .meta, el INDICE de cada fila es
+        su posición sin contar las filas del .tomb
+        """
+        with self.__shared_mapping() as mapping:
+            tombstones: list[int] = list(self._tombstones)
+            records: Iterator[tuple[int, bytes]] = iter(())
+            # position of the last row read
+            current: int | None = None
+            for position in positions:
+                if current is None or position - current > mapping.step:
+                    if (offset := self.__row_offset(mapping, position)) is None:
+                        return
+                    records, current = mapping.records(offset), position - 1
+                for _, record in records:
+                    current += 1
+                    if current == position:
+                        row: list[str] = self._parse_record(record)
+                        if tombstones:
+                            row[0] = f"[{position - bisect_left(tombstones, position)}]"
+                        yield row
+                        break
+                else:
+                    return
+
+    def __prefiltered_rows(self, needle: str) -> Generator[list[str], None, None]:
+        """ método privado prefiltered_rows envía el encabezado y las filas del csv que pueden contener needle
+        (en minúsculas con casefold) al unir sus valores, las filas del .tomb se omiten y el INDICE es la posición
+        sin contarlas, las filas que solo tienen caracteres ASCII y no tienen comillas se comparan como bytes sin
+        decodificarlas ni separarlas en columnas (sin el separador y con lower, que en ASCII es igual a casefold)
+        por lo que las filas que se envían se deben comprobar con needle, sin filas en el .tomb las filas que
+        se comparan se buscan en el csv mapeado en memoria sin recorrer las demás
+
+        Argumento:
+
+        - needle el texto a buscar ya convertido con casefold
+        """
+        # a needle that is not ASCII can't be part of a row with only ASCII characters
+        needle_bytes: bytes | None = needle.encode("utf-8") if needle.isascii() else None
+        delimiter: bytes = self.delimiter.encode("utf-8")
+        tombstones: set[int] = set(self._tombstones)
+        # INDICE of the last row sent to the csv reader
+        live: list[int] = [0]
+
+        def is_candidate(record: bytes) -> bool:
+            # with quotes a value might have the separator in it
+            return not record.isascii() or b'"' in record or (
+                    needle_bytes is not None and needle_bytes in record.replace(delimiter, b"").lower())
+
+        def candidates(records: Iterator[tuple[int, bytes]]) -> Generator[str, None, None]:
+            position: int = 0
+            for _, record in records:
+                position += 1
+                if position in tombstones:
+                    continue
+                live[0] += 1
+                if is_candidate(record):
+                    yield record.decode("utf-8")
+
+        def found_candidates(mapping: SharedMapping, offset: int) -> Generator[str, None, None]:
+            # the rows are not counted so the search jumps to the next line with the needle (that can have the
+            # separator between any of its characters) or with quotes and characters that are not ASCII, the csv
+            # is lowered (lower is the same as casefold in ASCII and keeps the position of every byte) by parts of
+            # about _SCAN_CHUNK bytes that end with a line so the whole file is never copied, a match can't be
+            # split between two parts because only a quoted value can have a line break
+            data: mmap.mmap | bytes = mapping.data
+            patterns: list[re.Pattern] = []
+            if needle_bytes:
+                separators: bytes = b"(?:" + re.escape(delimiter) + b")*"
+                patterns.append(re.compile(separators.join(re.escape(bytes((char,))) for char in needle_bytes)))
+            if not mapping.isascii():
+                patterns.append(re.compile(b'[\x80-\xff"]'))
+            elif data.find(b'"') != -1:
+                patterns.append(re.compile(b'"'))
+            window_start: int = offset
+            while patterns and window_start < len(data):
+                window_end: int = data.find(b"\n", window_start + _SCAN_CHUNK) + 1 or len(data)
+                text: bytes = data[window_start:window_end].lower()
+                # each pattern with the position in text of its next match (len(text) if there are no more)
+                matches: list[list] = [[pattern, -1] for pattern in patterns]
+                while offset < window_end:
+                    for match in matches:
+                        if match[1] < offset - window_start:
+                            found: re.Match | None = match[0].search(text, offset - window_start)
+                            match[1] = len(text) if found is None else found.start()
+                    if (start := min(match[1] for match in matches)) == len(text):
+                        break
+                    # the lines before the match can't be part of a row with quotes so its line is the start of a row
+                    line_start: int = text.rfind(b"\n", offset - window_start, start) + 1 + window_start
+                    for offset, record in mapping.records(line_start if line_start > window_start else offset):
+                        break
+                    else:
+                        return
+                    offset += len(record)
+                    if is_candidate(record):
+                        yield record.decode("utf-8")
+                # a row with quotes can end after the part
+                offset = window_start = max(window_end, offset)
+        with self.__shared_mapping() as mapping:
+            records: Generator[tuple[int, bytes], None, None] = mapping.records()
+            for offset, record in records:
+                yield self._parse_record(record)
+                break
+            else:
+                return
+            # every record is a whole row so the reader takes one record for each row
+            if tombstones:
+                read = csv.reader(candidates(records), delimiter=self.delimiter)
+            else:
+                read = csv.reader(found_candidates(mapping, offset + len(record)), delimiter=self.delimiter)
+            for row in read:
+                if tombstones:
+                    row[0] = f"[{live[0]}]"
+                yield row
+
+    @classmethod
+    def _build_meta(cls, file_path: Path, delimiter: str) -> dict:
+        """ método de clase privado _build_meta lee el archivo csv completo (sin separar sus columnas)
+        para crear los datos que se guardan en el archivo .meta
+
+        Argumentos:
+
+        - file_path la ruta del archivo csv
+
+        - delimiter el delimitador del archivo csv
+
+        Valor de retorno:
+
+        - un dict con el tamaño y fecha de modificación del archivo, su delimitador, el número de filas
+        (incluido el encabezado), el encabezado y la posición en bytes de una de cada _offset_step filas
+        """
+        offsets: list[int] = []
+        rows: int = 0
+        header: list[str] = []
+        with open(file_path, "rb") as raw_reader:
+            for offset, record in cls._raw_records(raw_reader):
+                if not rows % cls._offset_step:
+                    offsets.append(offset)
+                if not rows:
+                    header = next(csv.reader(io.StringIO(record.decode("utf-8"), newline=""), delimiter=delimiter), [])
+                rows += 1
+        file_stat = os.stat(file_path)
+        return {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns, "delimiter": delimiter,
+                "rows": rows, "header": header, "step": cls._offset_step, "offsets": offsets}
+
+    @staticmethod
+    def _write_meta(file_path: Path, meta: dict) -> None:
+        """ método estático privado _write_meta guarda los datos de meta en el archivo .meta
+        que acompaña al archivo csv de file_path
+        """
+        with open(file_path.with_suffix(".meta"), "w", encoding="utf-8") as meta_writer:
+            json.dump(meta, meta_writer)
+
+    @contextmanager
+    def __file_lock(self, exclusive: bool) -> Iterator[None]:
+        """ método privado file_lock obtiene el bloqueo compartido (exclusive=False) o exclusivo del archivo csv
+        entre procesos (ver FileLock) mientras dure el bloque with, al obtenerlo se vuelven a cargar el .meta, el
+        encabezado y el número de filas si otro proceso modifico el csv (también al pasar del compartido al
+        exclusivo ya que el compartido se libera antes)
+        """
+        lock_path: str = str(self.instance_file_path.with_suffix(".lock"))
+        if (lock := _FILE_LOCKS.get(lock_path)) is None:
+            lock = _FILE_LOCKS[lock_path] = FileLock(Path(lock_path))
+        if lock.acquire(exclusive) and self.instance_file_path.is_file():
+            self.__sync_meta()
+        try:
+            yield
+        finally:
+            lock.release(exclusive)
+
+    def __locked_start(self, generator: Generator, exclusive: bool, started: int | None) -> Generator:
+        """ método privado locked_start entrega los valores de generator (una lectura o escritura de la instancia)
+        obteniendo el bloqueo del csv (ver file_lock) solo mientras se calculan sus primeros started valores
+        (todos si es None), los valores se guardan y se entregan después de liberarlo por lo que un generador que
+        no se termina de leer no hace esperar a los demás procesos, generator debe abrir el csv (o el mapeo en
+        memoria) y obtener los datos del .meta y del .tomb antes de entregar el valor started para que el resto
+        de sus valores correspondan al mismo archivo aunque otro proceso lo modifique
+
+        Argumentos:
+
+        - generator el generador que lee o escribe el csv
+
+        - exclusive si es True se obtiene el bloqueo exclusivo, de lo contrario el compartido
+
+        - started el número de valores que se calculan con el bloqueo o None para todos
+
+        Valor de retorno:
+
+        - un generador con los mismos valores y valor de retorno que generator
+        """
+        values: list = []
+        result = None
+        finished: bool = False
+        with self.__file_lock(exclusive):
+            try:
+                while started is None or len(values) < started:
+                    values.append(next(generator))
+            except StopIteration as stop:
+                finished, result = True, stop.value
+        try:
+            yield from values
+            if not finished:
+                result = yield from generator
+            return result
+        finally:
+            generator.close()
+
+    def __sync_meta(self) -> None:
+        """ método privado sync_meta comprueba que los datos del archivo .meta correspondan al
+        archivo csv actual comparando su tamaño y fecha de modificación, si no es asi se intenta
+        cargar el .meta desde el disco y si este tampoco es valido se reconstruye leyendo el csv,
+        también se vuelven a cargar las filas borradas del .tomb si este cambio
+
+        Valor de retorno:
+
+        - None
+        """
+        file_stat = os.stat(self.instance_file_path)
+        signature = {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns,
+                     "delimiter": self.delimiter, "step": self._offset_step}
+        if not self._meta or not all(self._meta.get(key) == value for key, value in signature.items()):
+            try:
+                with open(self.instance_file_path.with_suffix(".meta"), "r", encoding="utf-8") as meta_reader:
+                    meta: dict = json.load(meta_reader)
+            except (OSError, ValueError):
+                meta = {}
+            if not isinstance(meta, dict) or not all(meta.get(key) == value for key, value in signature.items()):
+                # the csv was changed behind our back or the sidecar is missing
+                meta = self._build_meta(self.instance_file_path, self.delimiter)
+                self._write_meta(self.instance_file_path, meta)
+            self._meta = meta
+            if meta["rows"]:
+                self.new_head = tuple((val.upper() for val in meta["header"]))
+        self.__sync_tombstones()
+        self.current_rows = self._meta["rows"] - len(self._tombstones)
+
+    def __sync_tombstones(self) -> None:
+        """ método privado sync_tombstones vuelve a leer el archivo .tomb (las filas borradas con
+        lazy_delete que siguen en el csv) si cambio su tamaño o fecha de modificación, los números que
+        no corresponden a una fila del csv actual se ignoran
+
+        Valor de retorno:
+
+        - None
+        """
+        tomb_path: Path = self.instance_file_path.with_suffix(".tomb")
+        try:
+            tomb_stat = os.stat(tomb_path)
+        except FileNotFoundError:
+            self._tombstones, self._tomb_signature = [], None
+            return
+        if (tomb_stat.st_size, tomb_stat.st_mtime_ns) == self._tomb_signature:
+            return
+        with open(tomb_path, "r", encoding="utf-8") as tomb_reader:
+            self._tombstones = sorted({num for line in tomb_reader if line.strip().isdigit()
+                                       and 0 < (num := int(line)) < self._meta["rows"]})
+        self._tomb_signature = (tomb_stat.st_size, tomb_stat.st_mtime_ns)
+
+    def __index_signature(self) -> tuple[int, int, int]:
+        """ método privado index_signature retorna el tamaño y fecha de modificación del csv y el número
+        de filas del .tomb, con los que se sabe si el indice hash de enforce_unique sigue vigente
+        """
+        return self._meta["size"], self._meta["mtime_ns"], len(self._tombstones)
+
+    def __unique_index(self, columns: tuple[str, ...]) -> dict[str, Counter]:
+        """ método privado unique_index retorna el indice hash de enforce_unique (por cada columna un Counter
+        con el número de filas que tiene cada valor) con al menos las columnas de columns, si el csv cambio
+        el indice se carga del archivo .uniq si corresponde al csv actual o se crea de nuevo, las columnas
+        que faltan se agregan leyendo el csv una sola vez
+
+        Excepciones:
+
+        - ValueError si alguna de las columnas no es parte del encabezado del csv
+        """
+        self.__sync_meta()
+        if self._unique_signature != self.__index_signature():
+            self._unique_index = {}
+            try:
+                with open(self.instance_file_path.with_suffix(".uniq"), "r", encoding="utf-8") as uniq_reader:
+                    saved_index: dict = json.load(uniq_reader)
+            except (OSError, ValueError):
+                saved_index = {}
+            if isinstance(saved_index, dict) and saved_index.get("signature") == list(self.__index_signature()):
+                self._unique_index = {column: Counter(values) for column, values in saved_index["columns"].items()}
+            self._unique_signature = self.__index_signature()
+        if missing := [column for column in columns if column not in self._unique_index]:
+            for column in missing:
+                if column not in self.new_head[1:]:
+                    raise ValueError(f"los atributos de enforce_unique deben ser columnas del csv ({', '.join(self.new_head[1:])}) "
+                                     f"pero uno de ellos fue {column.lower()}")
+            positions: list[int] = [self.new_head.index(column) for column in missing]
+            counters: list[Counter] = [Counter() for _ in missing]
+            if self.current_rows > 1:
+                rows = self.leer_datos_csv()
+                next(rows)
+                for row in rows:
+                    for position, counter in zip(positions, counters):
+                        counter[row[position]] += 1
+            self._unique_index.update(zip(missing, counters))
+        return self._unique_index
+
+    def __update_unique_index(self, signature: tuple[int, int, int], removed: list[list[str]] | tuple = (),
+                              added: list[list[str]] | tuple = ()) -> None:
+        """ método privado update_unique_index actualiza el indice hash de enforce_unique después de que esta
+        instancia modificara el csv sin tener que volver a leerlo
+
+        Argumentos:
+
+        - signature el valor de index_signature antes de modificar el csv, si el indice no correspondía
+        a ese csv se descarta (se creara de nuevo la próxima vez que se ocupe)
+
+        - removed las filas que se borraron del csv o los valores anteriores de las filas actualizadas
+
+        - added las filas nuevas o los valores nuevos de las filas actualizadas
+        """
+        if not self._unique_index:
+            return
+        if signature != self._unique_signature:
+            self._unique_index, self._unique_signature = {}, None
+            return
+        for column, counter in self._unique_index.items():
+            position: int = self.new_head.index(column)
+            for row in removed:
+                counter[row[position]] -= 1
+                if counter[row[position]] <= 0:
+                    del counter[row[position]]
+            for row in added:
+                counter[row[position]] += 1
+        self._unique_signature = self.__index_signature()
+
+    def save_unique_index(self) -> None:
+        """ método publico save_unique_index
+        guarda el indice hash que ocupa enforce_unique en el archivo .uniq junto al csv para que otras
+        instancias (o el programa al volver a iniciarse) no tengan que leer el csv para crearlo, el indice
+        guardado solo se ocupa mientras el csv no sea modificado
+
+        Valor de retorno:
+
+        - None
+        """
+        with self.__file_lock(exclusive=True):
+            unique_index: dict[str, Counter] = self.__unique_index(tuple(self._unique_index))
+            with open(self.instance_file_path.with_suffix(".uniq"), "w", encoding="utf-8") as uniq_writer:
+                json.dump({"signature": list(self.__index_signature()), "columns": unique_index}, uniq_writer)
+
+    def register_aggregate(self, query) -> None:
+        """ método publico register_aggregate
+        registra una query con las funciones COUNT, SUM, AVG o UNIQUE separadas por comas (por ejemplo
+        '"city" = Houston~SUM:age,COUNT:' o '~UNIQUE:city' para todas las filas) cuyo resultado se mantiene al
+        día al guardar, borrar y actualizar entradas con los valores que estas operaciones ya conocen, por lo que
+        el método aggregate lo entrega sin leer el csv, el estado de cada query se guarda en el archivo .aggr
+        junto al csv y si el csv es modificado por fuera de la clase se vuelve a calcular la próxima vez que
+        se ocupe
+
+        Argumento:
+
+        - query str con las condiciones de la búsqueda (sin INDICE ya que cambia al borrar entradas y sin
+        columnas excluidas) seguidas de las funciones, las condiciones son opcionales
+
+        Valor de retorno:
+
+        - None
+
+        Excepciones:
+
+        - ValueError si query no es str, si el csv no tiene datos o si query no es valida
+        """
+        if not isinstance(query, str):
+            raise ValueError(f"el argumento query debe ser un str pero fue {type(query).__name__}")
+        with self.__file_lock(exclusive=True):
+            self.__sync_meta()
+            if not self.current_rows:
+                raise ValueError("no es posible registrar una query si no hay datos disponibles")
+            self.__aggregate_plan(query)
+            aggregates: dict[str, list[dict]] = self.__materialized_aggregates()
+            if query not in aggregates:
+                self._aggregates = {**aggregates, **self.__build_aggregates((query,))}
+                self._aggregates_signature = self.__index_signature()
+                self.__write_aggregates()
+
+    def unregister_aggregate(self, query) -> None:
+        """ método publico unregister_aggregate
+        deja de mantener al día el resultado de una query registrada con register_aggregate
+
+        Argumento:
+
+        - query str igual a la que se registro
+
+        Valor de retorno:
+
+        - None
+        """
+        with self.__file_lock(exclusive=True):
+            aggregates: dict[str, list[dict]] = self.__materialized_aggregates()
+            if query in aggregates:
+                del aggregates[query]
+                self.__write_aggregates()
+
+    def aggregate(self, query) -> list[list]:
+        """ método publico aggregate
+        retorna el resultado de una query registrada con register_aggregate sin leer el csv (solo se lee si
+        fue modificado por fuera de la clase)
+
+        Argumento:
+
+        - query str igual a la que se registro
+
+        Valor de retorno:
+
+        - una lista con el resultado de cada función en el orden de la query, cada resultado tiene la misma
+        forma que el ultimo item que entrega leer_datos_csv al ocupar esa función (el resultado de SUM y AVG
+        se calcula sin errores de redondeo por lo que puede diferir del de leer_datos_csv en el ultimo decimal),
+        igual que en leer_datos_csv con valores que no son números SUM y AVG son 0, con inf o -inf son inf o -inf
+        y con nan (o inf junto a -inf) SUM es 0 y AVG es nan, la única diferencia es que si la columna tiene nan
+        y valores que no son números el resultado es 0 (en leer_datos_csv depende del orden de las filas)
+
+        Excepciones:
+
+        - ValueError si query no fue registrada
+        """
+        with self.__file_lock(exclusive=False):
+            aggregates: dict[str, list[dict]] = self.__materialized_aggregates()
+            if query not in aggregates:
+                raise ValueError(f"la query {query} no fue registrada, ocupe el método register_aggregate")
+            results: list[list] = []
+            for (operand, head_index), state in zip(self.__aggregate_plan(query)[1], aggregates[query]):
+                if operand == "COUNT":
+                    results.append(["COUNT", state["count"]])
+                elif operand == "UNIQUE":
+                    results.append(["UNIQUE", self.new_head[head_index], dict(state["values"]), len(state["values"])])
+                else:
+                    # like in leer_datos_csv a value that is not a number gives 0
+                    if state["invalid"] or not (state["numbers"] or state["inf"] or state["-inf"] or state["nan"]):
+                        total: float = 0
+                    elif state["nan"] or (state["inf"] and state["-inf"]):
+                        total = float("nan")
+                    elif state["inf"] or state["-inf"]:
+                        total = float("inf") if state["inf"] else float("-inf")
+                    else:
+                        total = float(state["sum"])
+                        if operand == "AVG" and total:
+                            total /= state["numbers"]
+                    results.append([operand, self.new_head[head_index],
+                                    0 if operand == "SUM" and isnan(total) else total])
+            return results
+
+    def __aggregate_plan(self, query: str) -> tuple[CompiledQuery | None, tuple[tuple[str, int], ...]]:
+        """ método privado aggregate_plan retorna las condiciones compiladas de una query de register_aggregate
+        (o None si no tiene condiciones) y cada una de sus funciones con la posición de su columna (0 para COUNT)
+
+        Excepciones:
+
+        - ValueError si query no es valida
+        """
+        conditions, _, functions = query.rpartition("~")
+        compiled: CompiledQuery | None = None
+        if conditions:
+            # without the types the comparisons don't change when the type of a column does
+            compiled = _compile_query(conditions, tuple(self.new_head))
+            if compiled is None or compiled.error is not None or compiled.function is not None or compiled.except_col:
+                raise ValueError(f"{conditions} no es una query valida para las columnas {', '.join(self.new_head[1:])}")
+            if any(not condition.head_index for condition in compiled.conditions):
+                raise ValueError("las condiciones de una query registrada no pueden ocupar el INDICE ya que cambia al "
+                                 "borrar entradas")
+        plan: list[tuple[str, int]] = []
+        for function in functions.split(","):
+            operand, _, column = function.partition(":")
+            if operand == "COUNT" and not column:
+                plan.append((operand, 0))
+            elif operand in ("SUM", "AVG", "UNIQUE") and column.upper() in self.new_head[1:]:
+                plan.append((operand, self.new_head.index(column.upper())))
+            else:
+                raise ValueError(f"{function} no es una función valida, las funciones deben ser COUNT:, SUM:<columna>, "
+                                 f"AVG:<columna> o UNIQUE:<columna> con las columnas {', '.join(self.new_head[1:])}")
+        return compiled, tuple(plan)
+
+    def __add_aggregate_rows(self, aggregates: dict[str, list[dict]], rows: Iterable[list[str]], sign: int) -> None:
+        """ método privado add_aggregate_rows agrega (sign 1) o quita (sign -1) las filas rows del estado de
+        las queries de aggregates que las seleccionan"""
+        rows = list(rows)
+        for query, states in aggregates.items():
+            compiled, plan = self.__aggregate_plan(query)
+            for row in rows if compiled is None else filter(compiled.matches, rows):
+                for (operand, head_index), state in zip(plan, states):
+                    if operand == "COUNT":
+                        state["count"] += sign
+                        continue
+                    value: str = row[head_index]
+                    if operand == "UNIQUE":
+                        state["values"][value] += sign
+                        if state["values"][value] <= 0:
+                            del state["values"][value]
+                        continue
+                    try:
+                        number: float = float(value)
+                    except ValueError:
+                        state["invalid"] += sign
+                        continue
+                    if not isfinite(number):
+                        # inf, -inf and nan are counted apart so they can be removed
+                        state[str(number)] += sign
+                    else:
+                        state["sum"] += sign * Fraction(number)
+                        state["numbers"] += sign
+
+    def __build_aggregates(self, queries: Iterable[str]) -> dict[str, list[dict]]:
+        """ método privado build_aggregates lee el csv una vez y retorna el estado de cada una de las queries
+        de queries que sea valida para el encabezado actual"""
+        aggregates: dict[str, list[dict]] = {}
+        for query in queries:
+            try:
+                plan: tuple[tuple[str, int], ...] = self.__aggregate_plan(query)[1]
+            except ValueError:
+                continue
+            aggregates[query] = [{"count": 0} if operand == "COUNT" else {"values": Counter()} if operand == "UNIQUE"
+                                 else {"sum": Fraction(0), "numbers": 0, "invalid": 0, "inf": 0, "-inf": 0, "nan": 0}
+                                 for operand, _ in plan]
+        if aggregates and self.current_rows > 1:
+            rows = self.leer_datos_csv()
+            next(rows)
+            # the rows are added in batches so the whole csv is not kept in memory
+            while batch := list(islice(rows, 10_000)):
+                self.__add_aggregate_rows(aggregates, batch, 1)
+        return aggregates
+
+    def __load_aggregates(self) -> bool:
+        """ método privado load_aggregates carga el estado de las queries del archivo .aggr, retorna True si este
+        corresponde al csv actual y False si no existe o el csv cambio (solo se cargan las queries)"""
+        try:
+            with open(self.instance_file_path.with_suffix(".aggr"), "r", encoding="utf-8") as aggr_reader:
+                saved: dict = json.load(aggr_reader)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(saved, dict) or not isinstance(saved.get("queries"), dict):
+            return False
+        if not self.current_rows or saved.get("signature") != list(self.__index_signature()):
+            self._aggregates, self._aggregates_signature = {query: [] for query in saved["queries"]}, None
+            return False
+        self._aggregates = {
+            query: [{"inf": 0, "-inf": 0, "nan": 0, **state, "sum": Fraction(state["sum"])} if "sum" in state else
+                    {"values": Counter(state["values"])} if "values" in state else dict(state) for state in states]
+            for query, states in saved["queries"].items()}
+        self._aggregates_signature = self.__index_signature()
+        return True
+
+    def __materialized_aggregates(self) -> dict[str, list[dict]]:
+        """ método privado materialized_aggregates retorna el estado de las queries registradas, si el csv cambio
+        se carga del archivo .aggr si corresponde al csv actual o se calcula de nuevo leyendo el csv una vez"""
+        self.__sync_meta()
+        if self._aggregates_signature == self.__index_signature() and self.current_rows:
+            return self._aggregates
+        if not self.__load_aggregates():
+            self._aggregates = self.__build_aggregates(tuple(self._aggregates))
+            self._aggregates_signature = self.__index_signature() if self.current_rows else None
+            if self._aggregates:
+                self.__write_aggregates()
+        return self._aggregates
+
+    def __write_aggregates(self) -> None:
+        """ método privado write_aggregates guarda el estado de las queries registradas en el archivo .aggr
+        junto con el csv al que corresponde"""
+        queries: dict[str, list[dict]] = {
+            query: [{**state, "sum": str(state["sum"])} if "sum" in state else state for state in states]
+            for query, states in self._aggregates.items()}
+        with open(self.instance_file_path.with_suffix(".aggr"), "w", encoding="utf-8") as aggr_writer:
+            json.dump({"signature": list(self.__index_signature()), "queries": queries}, aggr_writer)
+
+    def __update_aggregates(self, signature: tuple[int, int, int], removed: list[list[str]] | tuple = (),
+                            added: list[list[str]] | tuple = ()) -> None:
+        """ método privado update_aggregates actualiza el estado de las queries registradas después de que esta
+        instancia modificara el csv sin tener que volver a leerlo y lo guarda en el .aggr
+
+        Argumentos:
+
+        - signature el valor de index_signature antes de modificar el csv, si el estado no correspondía
+        a ese csv se calcula de nuevo la próxima vez que se ocupe
+
+        - removed las filas que se borraron del csv o los valores anteriores de las filas actualizadas
+
+        - added las filas nuevas o los valores nuevos de las filas actualizadas
+        """
+        if not self._aggregates:
+            return
+        if signature != self._aggregates_signature:
+            self._aggregates_signature = None
+            return
+        self.__add_aggregate_rows(self._aggregates, removed, -1)
+        self.__add_aggregate_rows(self._aggregates, added, 1)
+        self._aggregates_signature = self.__index_signature()
+        self.__write_aggregates()
+
+    def create_index(self, column) -> None:
+        """ método publico create_index
+        crea un indice ordenado con los valores de la columna (según su tipo int, float, date o str) y la
+        posición de la fila de cada valor, el indice se guarda en el archivo .idx junto al csv y se mantiene
+        al día al guardar, borrar y actualizar entradas, si el csv es modificado por fuera de la clase se
+        vuelve a crear la próxima vez que se ocupe, las columnas con valores de distintos tipos (mixed) no
+        se pueden ordenar por lo que su indice no se ocupa hasta que vuelvan a tener un solo tipo
+
+        Argumento:
+
+        - column el nombre de la columna
+
+        Valor de retorno:
+
+        - None
+
+        Excepciones:
+
+        - ValueError si column no es str, si el csv no tiene datos o si column no es una columna del csv
+        (el INDICE no se puede ocupar)
+        """
+        if not isinstance(column, str):
+            raise ValueError(f"el argumento column debe ser str pero fue {type(column).__name__}")
+        with self.__file_lock(exclusive=True):
+            self.__sync_meta()
+            if not self.current_rows:
+                raise ValueError("no es posible crear un indice si no hay datos disponibles")
+            if (column := column.upper()) not in self.new_head[1:]:
+                raise ValueError(f"solo se puede crear un indice de una columna del csv ({', '.join(self.new_head[1:])}) "
+                                 f"pero su valor fue {column}")
+            indexes: dict[str, dict] = self.__sorted_indexes() or self._sorted_indexes
+            self._sorted_indexes = {**indexes, **self.__build_sorted_indexes((column,))}
+            # without entries the index is created when the first ones are saved
+            self._sorted_signature = self.__index_signature() if self.current_rows > 1 else None
+            self.__write_sorted_indexes()
+
+    def __sorted_indexes(self) -> dict[str, dict]:
+        """ método privado sorted_indexes retorna los indices ordenados de la instancia, si el csv cambio
+        se cargan del archivo .idx si corresponde al csv actual o se crean de nuevo leyendo el csv una vez
+        (las columnas de los indices se obtienen del .idx o de los indices que tenia la instancia)
+        """
+        self.__sync_meta()
+        if self._sorted_signature == self.__index_signature() or self.current_rows <= 1:
+            # there is nothing to index in a csv without entries
+            return self._sorted_indexes if self.current_rows > 1 else {}
+        try:
+            with open(self.instance_file_path.with_suffix(".idx"), "r", encoding="utf-8") as idx_reader:
+                saved_indexes: dict = json.load(idx_reader)
+        except (OSError, ValueError):
+            saved_indexes = {}
+        if not isinstance(saved_indexes, dict):
+            saved_indexes = {}
+        if saved_indexes.get("signature") == list(self.__index_signature()):
+            self._sorted_indexes = saved_indexes["columns"]
+        elif columns := tuple(saved_indexes.get("columns", self._sorted_indexes)):
+            self._sorted_indexes = self.__build_sorted_indexes(columns)
+            self._sorted_signature = self.__index_signature()
+            self.__write_sorted_indexes()
+        self._sorted_signature = self.__index_signature()
+        return self._sorted_indexes
+
+    def __build_sorted_indexes(self, columns: tuple[str, ...]) -> dict[str, dict]:
+        """ método privado build_sorted_indexes lee el csv una vez y retorna el indice ordenado de cada una de
+        las columnas de columns que sea parte del encabezado (las filas del .tomb no se incluyen)
+        """
+        add_row, finish = self.__sorted_index_builder(columns)
+        tombstones: set[int] = set(self._tombstones)
+        with open(self.instance_file_path, "r", newline="", encoding="utf-8") as csv_reader:
+            read = _csv_rows(csv_reader, self.delimiter)
+            next(read, None)
+            position: int = 0
+            for row in read:
+                position += 1
+                if position not in tombstones:
+                    add_row(position, row)
+        return finish()
+
+    def __sorted_index_builder(self, columns: tuple[str, ...]) -> tuple[Callable[[int, list[str]], None],
+                                                                         Callable[[], dict[str, dict]]]:
+        """ método privado sorted_index_builder permite crear los indices ordenados de columns mientras
+        se lee el csv una vez (al crear los indices o al borrar filas)
+
+        Argumento:
+
+        - columns el nombre de las columnas a indexar, las que no son parte del encabezado se omiten
+
+        Valor de retorno:
+
+        - una función que recibe la posición de una fila en el csv y la fila para agregarla a los indices
+        y una función que retorna los indices, cada indice es un dict con el tipo de sus llaves (kind, None
+        si la columna no se puede ordenar), las llaves ordenadas (keys) y la posición de la fila de cada llave (rows)
+        """
+        types: tuple[str | None, ...] = self.__column_types()
+        # column name, position in the header, kind of key and the pairs (key, row) of the index
+        columns_info: list[list] = [
+            [column, head_index, _INDEX_KINDS.get(types[head_index]) if head_index < len(types) else None, []]
+            for column in columns if column in self.new_head[1:] and (head_index := self.new_head.index(column))]
+
+        def add_row(position: int, row: list[str]) -> None:
+            for info in columns_info:
+                if info[2] is None:
+                    continue
+                try:
+                    info[3].append((_index_key(info[2], row[info[1]]), position))
+                except (ValueError, IndexError):
+                    # the values of the column can't be sorted
+                    info[2:] = [None, []]
+
+        def finish() -> dict[str, dict]:
+            indexes: dict[str, dict] = {}
+            for column, _, kind, pairs in columns_info:
+                pairs.sort()
+                indexes[column] = {"kind": kind, "keys": [key for key, _ in pairs], "rows": [row for _, row in pairs]}
+            return indexes
+        return add_row, finish
+
+    def __write_sorted_indexes(self) -> None:
+        """ método privado write_sorted_indexes guarda los indices ordenados en el archivo .idx junto con
+        el csv al que corresponden
+        """
+        with open(self.instance_file_path.with_suffix(".idx"), "w", encoding="utf-8") as idx_writer:
+            json.dump({"signature": list(self.__index_signature()), "columns": self._sorted_indexes}, idx_writer)
+
+    def __update_sorted_indexes(self, signature: tuple[int, int, int], removed: list[tuple[int, list[str]]] | tuple = (),
+                                added: list[tuple[int, list[str]]] | tuple = ()) -> None:
+        """ método privado update_sorted_indexes actualiza los indices ordenados después de que esta instancia
+        modificara el csv sin cambiar la posición de sus filas (guardar o actualizar entradas)
+
+        Argumentos:
+
+        - signature el valor de index_signature antes de modificar el csv, si los indices no correspondían
+        a ese csv se vuelven a crear la próxima vez que se ocupen
+
+        - removed tuples con la posición y los valores anteriores de las filas actualizadas
+
+        - added tuples con la posición y los valores de las filas nuevas o de las filas actualizadas
+        """
+        if not self._sorted_indexes:
+            return
+        if signature != self._sorted_signature:
+            self._sorted_signature = None
+            return
+        for column, index in self._sorted_indexes.items():
+            if (kind := index["kind"]) is None:
+                continue
+            head_index: int = self.new_head.index(column)
+            keys, rows = index["keys"], index["rows"]
+            try:
+                # the rows with the same key are sorted by their position
+                for row_number, row in removed:
+                    key = _index_key(kind, row[head_index])
+                    slot: int = bisect_left(rows, row_number, bisect_left(keys, key), bisect_right(keys, key))
+                    if slot == len(rows) or rows[slot] != row_number:
+                        raise ValueError(f"la fila {row_number} no esta en el indice")
+                    del keys[slot], rows[slot]
+                for row_number, row in added:
+                    key = _index_key(kind, row[head_index])
+                    slot = bisect_left(rows, row_number, bisect_left(keys, key), bisect_right(keys, key))
+                    keys.insert(slot, key)
+                    rows.insert(slot, row_number)
+            except (ValueError, IndexError):
+                # the column has values of different types (mixed) now
+                index.update({"kind": None, "keys": [], "rows": []})
+        self._sorted_signature = self.__index_signature()
+
+    def __index_positions(self, compiled: CompiledQuery) -> list[int] | None:
+        """ método privado index_positions retorna la posición en el csv (ordenadas de menor a mayor y sin
+        las filas del .tomb) de las filas que pueden cumplir con compiled según el indice ordenado que
+        selecciona menos filas o None si ningún indice se puede ocupar o selecciona demasiadas filas
+        (más de _index_ratio del total), las filas se deben comprobar con compiled.matches
+        """
+        if "|" in compiled.connectors or not (indexes := self.__sorted_indexes()):
+            return None
+        types: tuple[str | None, ...] = self.__column_types()
+        best: tuple[int, int, dict] | None = None
+        # the conditions after the last connector are not part of the query (matches)
+        for condition in compiled.conditions[:len(compiled.connectors) + 1]:
+            if (condition.operator not in _INDEX_OPERATORS or (index := indexes.get(condition.column)) is None
+                    or index["kind"] is None or index["kind"] != _INDEX_KINDS.get(types[condition.head_index])):
+                continue
+            try:
+                key = _index_key(index["kind"], condition.operand)
+            except ValueError:
+                # the value is compared as str with the values of the column
+                continue
+            keys: list = index["keys"]
+            low_lim, up_lim = {"=": (bisect_left(keys, key), bisect_right(keys, key)),
+                               ">": (bisect_right(keys, key), len(keys)), ">=": (bisect_left(keys, key), len(keys)),
+                               "<": (0, bisect_left(keys, key)), "<=": (0, bisect_right(keys, key))}[condition.operator]
+            if best is None or up_lim - low_lim < best[1] - best[0]:
+                best = (low_lim, up_lim, index)
+        if best is None or best[1] - best[0] > self._index_ratio * (self.current_rows - 1):
+            return None
+        positions: list[int] = sorted(best[2]["rows"][best[0]:best[1]])
+        if self._tombstones:
+            tombstones: set[int] = set(self._tombstones)
+            return [position for position in positions if position not in tombstones]
+        return positions
+
+    def create_text_index(self) -> None:
+        """ método publico create_text_index
+        crea un indice de texto con las palabras (letras, números y _ seguidos) de cada fila y la posición de las
+        filas que tienen cada palabra, el indice se guarda en el archivo .fts junto al csv y se mantiene al día al
+        guardar, borrar y actualizar entradas, si el csv es modificado por fuera de la clase se vuelve a crear la
+        próxima vez que se ocupe. Con el indice las búsquedas de texto de leer_datos_csv (con escaped=False) solo
+        leen las filas que tienen las palabras del texto buscado, si el texto no tiene palabras o sus palabras
+        están en demasiadas filas (más de _index_ratio del total) se lee el csv completo
+
+        Valor de retorno:
+
+        - None
+
+        Excepciones:
+
+        - ValueError si el csv no tiene datos
+        """
+        with self.__file_lock(exclusive=True):
+            self.__sync_meta()
+            if not self.current_rows:
+                raise ValueError("no es posible crear un indice si no hay datos disponibles")
+            self._text_index, self._text_signature = self.__build_text_index(), self.__index_signature()
+            self._text_vocabulary = None
+            self.__write_text_index()
+
+    def __text_index(self) -> dict[str, list[int]] | None:
+        """ método privado text_index retorna el indice de texto de la instancia o None si el csv no tiene uno,
+        si el csv cambio el indice se carga del archivo .fts si corresponde al csv actual o se crea de nuevo
+        leyendo el csv una vez
+        """
+        self.__sync_meta()
+        if self._text_signature == self.__index_signature():
+            return self._text_index
+        try:
+            with open(self.instance_file_path.with_suffix(".fts"), "r", encoding="utf-8") as fts_reader:
+                saved_index: dict | None = json.load(fts_reader)
+        except OSError:
+            saved_index = None
+        except ValueError:
+            # the index is created again
+            saved_index = {}
+        if saved_index is None and self._text_index is None:
+            return None
+        if isinstance(saved_index, dict) and saved_index.get("signature") == list(self.__index_signature()):
+            self._text_index = saved_index["tokens"]
+        else:
+            self._text_index = self.__build_text_index()
+            self.__write_text_index()
+        self._text_signature, self._text_vocabulary = self.__index_signature(), None
+        return self._text_index
+
+    def __build_text_index(self) -> dict[str, list[int]]:
+        """ método privado build_text_index lee el csv una vez y retorna el indice de texto con la posición
+        de las filas (ordenadas de menor a mayor) que tienen cada palabra, las filas del .tomb no se incluyen
+        """
+        text_index: dict[str, list[int]] = {}
+        if self.current_rows <= 1:
+            return text_index
+        tombstones: set[int] = set(self._tombstones)
+        with open(self.instance_file_path, "r", newline="", encoding="utf-8") as csv_reader:
+            read = _csv_rows(csv_reader, self.delimiter)
+            next(read, None)
+            position: int = 0
+            for row in read:
+                position += 1
+                if position not in tombstones:
+                    for token in _text_tokens(row):
+                        text_index.setdefault(token, []).append(position)
+        return text_index
+
+    def __write_text_index(self) -> None:
+        """ método privado write_text_index guarda el indice de texto en el archivo .fts junto con
+        el csv al que corresponde
+        """
+        with open(self.instance_file_path.with_suffix(".fts"), "w", encoding="utf-8") as fts_writer:
+            json.dump({"signature": list(self.__index_signature()), "tokens": self._text_index}, fts_writer)
+
+    def __update_text_index(self, signature: tuple[int, int, int], removed: list[tuple[int, list[str]]] | tuple = (),
+                            added: list[tuple[int, list[str]]] | tuple = ()) -> None:
+        """ método privado update_text_index actualiza el indice de texto después de que esta instancia
+        modificara el csv sin cambiar la posición de sus filas (guardar o actualizar entradas)
+
+        Argumentos:
+
+        - signature el valor de index_signature antes de modificar el csv, si el indice no correspondía
+        a ese csv se vuelve a crear la próxima vez que se ocupe
+
+        - removed tuples con la posición y los valores anteriores de las filas actualizadas
+
+        - added tuples con la posición y los valores de las filas nuevas o de las filas actualizadas
+        """
+        if self._text_index is None:
+            return
+        if signature != self._text_signature:
+            self._text_signature = None
+            return
+        for position, row in removed:
+            for token in _text_tokens(row):
+                postings: list[int] = self._text_index.get(token, [])
+                slot: int = bisect_left(postings, position)
+                if slot < len(postings) and postings[slot] == position:
+                    del postings[slot]
+                    if not postings:
+                        del self._text_index[token]
+        for position, row in added:
+            for token in _text_tokens(row):
+                insort(self._text_index.setdefault(token, []), position)
+        self._text_signature, self._text_vocabulary = self.__index_signature(), None
+
+    def __text_positions(self, needle: str) -> list[int] | None:
+        """ método privado text_positions retorna la posición en el csv (ordenadas de menor a mayor y sin las
+        filas del .tomb) de las filas que pueden contener needle según el indice de texto o None si el csv no
+        tiene indice, si needle no tiene palabras o si se seleccionan demasiadas filas (más de _index_ratio
+        del total), las filas se deben comprobar con needle
+
+        Argumento:
+
+        - needle el texto a buscar ya convertido con casefold
+        """
+        if not (words := list(_TEXT_TOKEN_REGEX.finditer(needle))) or (text_index := self.__text_index()) is None:
+            return None
+        if self._text_vocabulary is None:
+            # the words joined by new lines so the ones with part of a word of needle are found at once
+            tokens: list[str] = sorted(text_index)
+            self._text_vocabulary = (tokens, "\n".join(tokens),
+                                     list(accumulate((len(token) + 1 for token in tokens), initial=0)))
+        tokens, vocabulary, starts = self._text_vocabulary
+        selected: set[int] | None = None
+        for word in words:
+            # the first and last words of needle might be only part of a word of the row, the others
+            # (and the sides next to a character that is not part of a word) are complete
+            fragment, whole_start, whole_end = word.group(), word.start() > 0, word.end() < len(needle)
+            if whole_start and whole_end:
+                matched: Iterable[str] = (fragment,) if fragment in text_index else ()
+            elif whole_start:
+                # the sorted words that start with fragment (a word can't have the last code point)
+                matched = tokens[bisect_left(tokens, fragment):bisect_left(tokens, fragment + "\U0010ffff")]
+            else:
+                pattern: re.Pattern = re.compile(re.escape(fragment) + ("$" if whole_end else ""), re.MULTILINE)
+                matched = {tokens[bisect_right(starts, found.start()) - 1] for found in pattern.finditer(vocabulary)}
+            rows: set[int] = set(chain.from_iterable(text_index[token] for token in matched))
+            selected = rows if selected is None else selected & rows
+            if not selected:
+                break
+        if self._tombstones:
+            selected.difference_update(self._tombstones)
+        if len(selected) > self._index_ratio * (self.current_rows - 1):
+            return None
+        return sorted(selected)
+
+    def __clear_tombstones(self) -> None:
+        """ método privado clear_tombstones elimina el archivo .tomb después de que el csv se reescribiera
+        sin las filas borradas
+        """
+        self.instance_file_path.with_suffix(".tomb").unlink(missing_ok=True)
+        self._tombstones, self._tomb_signature = [], None
+
+    def __physical_rows(self, row_numbers: Iterable[int]) -> Iterator[int]:
+        """ método privado physical_rows retorna un iterador con la posición en el csv de las filas que
+        tienen el INDICE de row_numbers al omitir las filas borradas del .tomb
+        """
+        # the tombstone i has tombstone - i - 1 rows that are not deleted before it
+        shifted: list[int] = [tombstone - count for count, tombstone in enumerate(self._tombstones)]
+        return (row_number + bisect_right(shifted, row_number) for row_number in row_numbers)
+
+    def __live_rows(self, read: Iterator[list[str]]) -> Generator[list[str], None, None]:
+        """ método privado live_rows envía el encabezado y las filas de read que no están en el .tomb
+        cambiando su INDICE por su posición entre las filas restantes, las lineas en blanco se omiten
+
+        Argumento:
+
+        - read un iterador con las filas del csv desde el encabezado (por ejemplo un csv.reader)
+        """
+        yield next(read)
+        tombstones: set[int] = set(self._tombstones)
+        position: int = 0
+        live: int = 0
+        for row in read:
+            position += 1
+            if position in tombstones:
+                continue
+            live += 1
+            row[0] = f"[{live}]"
+            yield row
+
+    def __replace_meta(self, header: list[str], rows: int, offsets: list[int], types: list[str | None] | None) -> None:
+        """ método privado replace_meta crea el archivo .meta con los datos obtenidos mientras esta instancia
+        copiaba el csv a un archivo temporal que lo remplazo (sin las filas del .tomb) por lo que no es necesario
+        volver a leerlo y actualiza el número de filas actual
+
+        Argumentos:
+
+        - header el encabezado del csv
+
+        - rows el número de filas del csv (incluido el encabezado)
+
+        - offsets la posición en bytes de una de cada _offset_step filas
+
+        - types el tipo de cada columna o None si se obtendrá en la siguiente búsqueda
+        """
+        file_stat = os.stat(self.instance_file_path)
+        self._snapshot = None
+        self._meta = {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns, "delimiter": self.delimiter,
+                      "rows": rows, "header": header, "step": self._offset_step, "offsets": offsets}
+        if types is not None:
+            self._meta["types"] = types
+        self._write_meta(self.instance_file_path, self._meta)
+        self.__clear_tombstones()
+        self.current_rows = rows
+
+    def __refresh_meta(self, types: list[str | None] | None = None) -> None:
+        """ método privado refresh_meta reconstruye el archivo .meta después de que esta instancia
+        reescribiera el archivo csv (sin las filas del .tomb) y actualiza el número de filas actual, si
+        se pasa types (el tipo de cada columna) este se guarda en el .meta, de lo contrario se obtendrá
+        en la siguiente búsqueda
+        """
+        self._snapshot = None
+        self.__clear_tombstones()
+        self._meta = self._build_meta(self.instance_file_path, self.delimiter)
+        if types is not None and self._meta["rows"]:
+            self._meta["types"] = types
+        self._write_meta(self.instance_file_path, self._meta)
+        self.current_rows = self._meta["rows"]
+
+    @staticmethod
+    def _infer_types(file_path: Path, delimiter: str) -> list[str | None]:
+        """ método estático privado _infer_types lee el archivo csv completo y retorna el tipo de cada
+        columna del encabezado ('int', 'float', 'date', 'str', 'mixed' o None si la columna no tiene valores)
+        """
+        with open(file_path, "r", newline="", encoding="utf-8") as csv_reader:
+            read = _csv_rows(csv_reader, delimiter)
+            types: list[str | None] = [None] * len(next(read, []))
+            for row in read:
+                _merge_row_types(types, row)
+        return types
+
+    def __column_types(self) -> tuple[str | None, ...]:
+        """ método privado column_types retorna el tipo de cada columna guardado en el .meta,
+        si el .meta no los tiene (fue reconstruido) se obtienen leyendo el csv una vez
+        """
+        self.__sync_meta()
+        if self._meta.get("types") is None:
+            self._meta["types"] = self._infer_types(self.instance_file_path, self.delimiter) if self._meta["rows"] else []
+            self._write_meta(self.instance_file_path, self._meta)
+        return tuple(self._meta["types"])
+
+    def __append_rows(self, rows: list[list[str]]) -> None:
+        """ método privado append_rows escribe las filas al final del archivo csv y actualiza
+        el archivo .meta sin tener que volver a leer el csv
+
+        Argumento:
+
+        - rows una lista con las filas a escribir (el encabezado también cuenta como fila)
+
+        Valor de retorno:
+
+        - None
+        """
+        self.__sync_meta()
+        self._snapshot = None
+        signature: tuple[int, int, int] = self.__index_signature()
+        # the header is not part of the hash index of enforce_unique
+        new_entries: list[list[str]] = rows if self._meta["rows"] else rows[1:]
+        # position in the csv of the first new entry
+        first_position: int = self._meta["rows"] or 1
+        with open(self.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            write = csv.writer(csv_writer, delimiter=self.delimiter)
+            for row in rows:
+                if not self._meta["rows"] % self._offset_step:
+                    # the file is opened in write only mode so tell is the position in bytes
+                    self._meta["offsets"].append(csv_writer.tell())
+                if not self._meta["rows"]:
+                    self._meta["header"] = list(row)
+                    self._meta["types"] = [None] * len(row)
+                elif self._meta.get("types") is not None:
+                    _merge_row_types(self._meta["types"], row)
+                write.writerow(row)
+                self._meta["rows"] += 1
+        file_stat = os.stat(self.instance_file_path)
+        self._meta["size"], self._meta["mtime_ns"] = file_stat.st_size, file_stat.st_mtime_ns
+        self._write_meta(self.instance_file_path, self._meta)
+        self.__update_unique_index(signature, added=new_entries)
+        self.__update_aggregates(signature, added=new_entries)
+        self.__update_sorted_indexes(signature, added=list(enumerate(new_entries, start=first_position)))
+        self.__update_text_index(signature, added=list(enumerate(new_entries, start=first_position)))
+
+    def __columnar_snapshot(self, keep: bool = True) -> ColumnarSnapshot | None:
+        """ método privado columnar_snapshot retorna la copia en memoria del csv creándola de nuevo si el
+        archivo cambio desde que se creo, si el archivo tiene filas con un número de valores distinto al del
+        encabezado no se puede guardar por columnas y se retorna None (se lee el archivo como siempre)
+
+        Argumento:
+
+        - keep si es False la nueva copia no se guarda en la instancia (solo se ocupa en una búsqueda)
+        """
+        types: tuple[str | None, ...] = self.__column_types()
+        # the .tomb only grows until the csv is rewritten so its length is enough to know if it changed
+        signature: tuple[int, int, int] = (self._meta["size"], self._meta["mtime_ns"], len(self._tombstones))
+        snapshot: ColumnarSnapshot | None = self._snapshot
+        if snapshot is None or snapshot.signature != signature:
+            snapshot = ColumnarSnapshot(self.instance_file_path, self.delimiter, signature, types, self._tombstones)
+            if keep:
+                self._snapshot = snapshot
+        return snapshot if snapshot.valid else None
+
     def __len__(self) -> int:
-        with open(str(self.instance_file_path), "r", newline="", encoding="utf-8") as csv_reader:
-            read = csv.reader(csv_reader, delimiter=self.delimiter)
-            # clever method to get the len and avoid putting
-            # all the contents of the file in memory
-            # this 1 for _ in read is an iterator
-            return sum(1 for _ in read)
+        # the count comes from the .meta sidecar, the csv is only
+        # read again if it was modified outside of this class
+        with self.__file_lock(exclusive=False):
+            self.__sync_meta()
+            return self.current_rows
@@ -1,10 +1,17 @@
-from saveclass import BaseCsvManager, SingleCsvManager
+from saveclass import BaseCsvManager, SingleCsvManager, ExternalSort, TopRows
+import saveclass
 from pathlib import Path
 from time import sleep
+from datetime import date
 import shutil
 import csv
+import re
+import json
 import dataclasses
+import multiprocessing
+import os
 from random import choice
+from collections import Counter
 
 try:
     # use pytest <file_to_test>.py to run
@@ -118,3 +125,1580 @@ class TestAttribute:
         for invalid in ["file_test.csv", "#ARCHIVO", "csv respaldo", "nombre_valido_pero_muy_largo"]:
             with pytest.raises(ValueError, match=r"letras mayúsculas y minúsculas \(a-z pero no ñ\)"):
                 BaseCsvManager(file_name=invalid)
+
+
+def remove_backup_files(manager: SingleCsvManager) -> None:
+    """elimina el archivo csv de una instancia junto con sus archivos auxiliares"""
+    manager.instance_file_path.unlink(missing_ok=True)
+    for suffix in BaseCsvManager._sidecar_suffixes:
+        manager.instance_file_path.with_suffix(suffix).unlink(missing_ok=True)
+    for wal_path in BaseCsvManager._wal_paths(manager.instance_file_path):
+        wal_path.unlink(missing_ok=True)
+
+
+@dataclasses.dataclass
+class Employee:
+    name: str
+    city: str
+    age: int
+    date: str
+
+
+def fill_employees(manager: SingleCsvManager, total: int) -> None:
+    """guarda total entradas de la clase Employee en el archivo de la instancia"""
+    cities = ("Houston", "Chicago", "Los Angeles", "Phoenix")
+    for num in range(1, total + 1):
+        manager.set_data(f"Name {num}", cities[num % 4], 20 + num % 45, f"2024-{num % 12 + 1:02d}-{num % 28 + 1:02d}")
+        manager.guardar_datos_csv()
+
+
+class TestMetadataSidecar:
+    """contiene los test del archivo auxiliar .meta el cual guarda el número de filas,
+    el encabezado y la posición en bytes de algunas filas de cada csv del backup"""
+
+    def test_meta_tracks_writes(self):
+        """ chequea que el .meta se mantenga al día al guardar entradas y que sus
+        posiciones en bytes apunten al inicio de las filas correctas"""
+        manager = SingleCsvManager("meta_write", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("meta_write", Employee)
+        fill_employees(manager, 130)
+        meta_path = manager.instance_file_path.with_suffix(".meta")
+        with open(meta_path, "r", encoding="utf-8") as meta_reader:
+            meta = json.load(meta_reader)
+        assert meta["rows"] == 131 == len(manager)
+        assert meta["header"] == ["INDICE", "NAME", "CITY", "AGE", "DATE"]
+        assert len(meta["offsets"]) == 3
+        with open(manager.instance_file_path, "rb") as raw_reader:
+            for count, offset in enumerate(meta["offsets"]):
+                raw_reader.seek(offset)
+                assert raw_reader.readline().startswith(b"INDICE" if not count else f"[{count * meta['step']}]".encode())
+        remove_backup_files(manager)
+
+    def test_meta_skips_scan(self):
+        """ chequea que una nueva instancia ocupe el .meta en vez de leer todo el archivo"""
+        manager = SingleCsvManager("meta_skip", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("meta_skip", Employee)
+        fill_employees(manager, 10)
+        original = SingleCsvManager._build_meta
+        # if the sidecar is valid the file should not be read again
+        SingleCsvManager._build_meta = classmethod(lambda cls, *args: (_ for _ in ()).throw(AssertionError("csv leído")))
+        try:
+            reopened = SingleCsvManager("meta_skip", Employee)
+        finally:
+            SingleCsvManager._build_meta = original
+        assert reopened.current_rows == 11
+        assert reopened.new_head == ("INDICE", "NAME", "CITY", "AGE", "DATE")
+        remove_backup_files(manager)
+
+    def test_meta_rebuilt_on_external_change(self):
+        """ chequea que el .meta se reconstruya si el csv fue modificado por fuera de la clase
+        y que se mantenga al borrar entradas"""
+        manager = SingleCsvManager("meta_external", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("meta_external", Employee)
+        fill_employees(manager, 5)
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[6]", "Name 6", "Houston", "30", "2024-01-01"])
+        reopened = SingleCsvManager("meta_external", Employee)
+        assert reopened.current_rows == 7
+        assert len(manager) == 7
+        for _ in reopened.borrar_datos("[2]"):
+            pass
+        assert reopened.current_rows == 6 == len(SingleCsvManager("meta_external", Employee))
+        remove_backup_files(manager)
+
+
+class TestIndexLookup:
+    """contiene los test de la búsqueda por indice ([n], [n:m], [a-b-c]) la cual ocupa las
+    posiciones en bytes del .meta para leer solo las filas pedidas"""
+
+    def test_seek_single_and_multiple(self):
+        """ chequea que se obtengan las filas correctas alrededor de las posiciones guardadas en el .meta"""
+        manager = SingleCsvManager("seek_rows", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("seek_rows", Employee)
+        fill_employees(manager, 140)
+        for num in (1, 63, 64, 65, 127, 128, 129, 140):
+            result = list(manager.leer_datos_csv(f"[{num}]"))
+            assert result[0] == ["INDICE", "NAME", "CITY", "AGE", "DATE"]
+            assert result[1][:2] == [f"[{num}]", f"Name {num}"]
+        assert list(manager.leer_datos_csv("[141]")) == [["INDICE", "NAME", "CITY", "AGE", "DATE"]]
+        assert [row[0] for row in manager.leer_datos_csv("[130-2-64-2-200]")][1:] == ["[2]", "[64]", "[130]"]
+        remove_backup_files(manager)
+
+    def test_seek_range(self):
+        """ chequea que los rangos con y sin limite superior empiecen y terminen en las filas correctas"""
+        manager = SingleCsvManager("seek_range", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("seek_range", Employee)
+        fill_employees(manager, 140)
+        assert [row[0] for row in manager.leer_datos_csv("[60:66]")][1:] == [f"[{num}]" for num in range(60, 67)]
+        assert [row[0] for row in manager.leer_datos_csv("[130:]")][1:] == [f"[{num}]" for num in range(130, 141)]
+        assert [row[0] for row in manager.leer_datos_csv("[0:2]")][1:] == ["[1]", "[2]"]
+        # rows that are added by another program are also found
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[141]", "Name 141", "Houston", "30", "2024-01-01"])
+        assert [row[0] for row in manager.leer_datos_csv("[139:]")][1:] == ["[139]", "[140]", "[141]"]
+        remove_backup_files(manager)
+
+
+class TestCompiledQuery:
+    """contiene los test de compile_query y de los CompiledQuery que se pueden pasar a
+    leer_datos_csv y borrar_datos en vez de la query en str"""
+
+    def test_compiled_matches_str_query(self):
+        """ chequea que un CompiledQuery entregue los mismos resultados que la query en str"""
+        manager = SingleCsvManager("compiled_read", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("compiled_read", Employee)
+        fill_employees(manager, 60)
+        for query in ('"age" > 40 & "city" = Houston', '"city" [= chi | "date" < 2024-03-01',
+                      '[name#age] "name" >> 7~ASC:age', '"city" {} %RANGE:,[Phoenix,Chicago]~COUNT:',
+                      '"age" = unknown', '"city" {} Houston'):
+            compiled = manager.compile_query(query)
+            assert manager.compile_query(query) is compiled
+            assert list(manager.leer_datos_csv(compiled)) == list(manager.leer_datos_csv(query))
+        compiled = manager.compile_query('"age" >= 30 & "date" > 2024-06-01')
+        assert [(item.column, item.operator) for item in compiled.conditions] == [("AGE", ">="), ("DATE", ">")]
+        assert compiled.connectors == ("&",) and compiled.error is None
+        remove_backup_files(manager)
+
+    def test_plan_shared_between_files(self):
+        """ chequea que un mismo CompiledQuery se pueda ocupar con otro csv del mismo encabezado sin que el plan
+        cambie al leerlo"""
+        manager = SingleCsvManager("compiled_shared", Employee)
+        other = SingleCsvManager("compiled_shared_other", Employee)
+        remove_backup_files(manager)
+        remove_backup_files(other)
+        manager = SingleCsvManager("compiled_shared", Employee)
+        other = SingleCsvManager("compiled_shared_other", Employee)
+        fill_employees(manager, 30)
+        fill_employees(other, 12)
+        compiled = manager.compile_query('"age" > 21 | "city" = Chicago')
+        plan = (hash(compiled), compiled.conditions, compiled.sequence)
+        assert other.compile_query('"age" > 21 | "city" = Chicago') is compiled
+        assert list(other.leer_datos_csv(compiled)) == list(other.leer_datos_csv('"age" > 21 | "city" = Chicago'))
+        assert len(list(manager.leer_datos_csv(compiled))) == 31
+        assert (hash(compiled), compiled.conditions, compiled.sequence) == plan
+        remove_backup_files(manager)
+        remove_backup_files(other)
+
+    def test_short_circuit_and_order(self):
+        """ chequea que matches entregue el mismo resultado que evaluar todas las condiciones, que cuente las
+        comparaciones evitadas y que con un solo tipo de conector evalúe primero la condición que decide más filas"""
+        manager = SingleCsvManager("compiled_stats", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("compiled_stats", Employee)
+        fill_employees(manager, 10)
+        cities = ("Houston", "Chicago", "Los Angeles", "Phoenix")
+        rows = [[f"[{num}]", f"Name {num}", cities[num % 4], str(20 + num % 45), "2024-01-01"] for num in range(1, 3001)]
+        for query, evaluate, order in (
+                ('"city" = Houston & "age" > 62', lambda row: row[2] == "Houston" and int(row[3]) > 62, [1, 0]),
+                ('"city" = Houston | "age" << 2 | "name" ]= 7',
+                 lambda row: row[2] == "Houston" or len(row[3]) < 2 or row[1].endswith("7"), [0, 2, 1]),
+                ('"age" > 60 | "city" = Houston & "name" ]= 5',
+                 lambda row: (int(row[3]) > 60 or row[2] == "Houston") and row[1].endswith("5"), [0, 1, 2])):
+            compiled = manager.compile_query(query)
+            stats = compiled.new_stats()
+            assert [compiled.matches(row, stats) for row in rows] == [evaluate(row) for row in rows]
+            assert [compiled.matches(row) for row in rows] == [evaluate(row) for row in rows]
+            assert stats.rows == len(rows) and stats.evaluations + stats.skipped == len(rows) * len(compiled.conditions)
+            assert stats.skipped > 0 and stats.order == order
+        remove_backup_files(manager)
+
+    def test_searches_keep_their_own_stats(self):
+        """ chequea que dos búsquedas con el mismo CompiledQuery leídas intercaladas cuenten sus comparaciones
+        por separado y que el plan compilado no cambie"""
+        manager = SingleCsvManager("compiled_own_stats", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("compiled_own_stats", Employee)
+        fill_employees(manager, 40)
+        compiled = manager.compile_query('"city" = Houston & "age" > 30')
+        first = manager.leer_datos_csv(compiled)
+        next(first)
+        first_rows = [next(first)]
+        first_stats = manager.query_stats
+        second_rows = list(manager.leer_datos_csv(compiled))
+        assert manager.query_stats is not first_stats and manager.query_stats.rows == 40
+        assert first_rows + list(first) == second_rows[1:] and first_stats.rows == 40
+        assert manager.compile_query('"city" = Houston & "age" > 30') is compiled
+        with pytest.raises(AttributeError):
+            compiled.chain = "|"
+        remove_backup_files(manager)
+
+    def test_compiled_delete_and_errors(self):
+        """ chequea que se pueda borrar con un CompiledQuery y que se rechacen las query no validas
+        o compiladas para otro encabezado"""
+        manager = SingleCsvManager("compiled_delete", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("compiled_delete", Employee)
+        fill_employees(manager, 20)
+        with pytest.raises(ValueError, match="no es una query valida"):
+            manager.compile_query("Houston")
+        with pytest.raises(ValueError, match="debe ser un str"):
+            manager.compile_query(12)
+        deleted = list(manager.borrar_datos(manager.compile_query('"city" = Houston')))
+        assert len(deleted) == 6 and all("Houston" in row for row in deleted[1:])
+        assert len(manager) == 16
+        other = SingleCsvManager("compiled_other", Employee, exclude=("date",))
+        remove_backup_files(other)
+        other = SingleCsvManager("compiled_other", Employee, exclude=("date",))
+        fill_employees(other, 2)
+        with pytest.raises(ValueError, match="fue compilado para un csv"):
+            list(other.leer_datos_csv(manager.compile_query('"age" > 1')))
+        remove_backup_files(manager)
+        remove_backup_files(other)
+
+
+def read_meta(manager: SingleCsvManager) -> dict:
+    """retorna el contenido del archivo .meta de una instancia"""
+    with open(manager.instance_file_path.with_suffix(".meta"), "r", encoding="utf-8") as meta_reader:
+        return json.load(meta_reader)
+
+
+class TestColumnTypes:
+    """contiene los test del tipo de cada columna (int, float, date, str o mixed) guardado en el .meta
+    y ocupado por las búsquedas para comparar y acumular valores sin probar cada conversión"""
+
+    def test_types_follow_changes(self):
+        """ chequea que los tipos se actualicen al guardar, actualizar y borrar entradas"""
+        manager = SingleCsvManager("types_changes", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("types_changes", Employee)
+        fill_employees(manager, 30)
+        assert read_meta(manager)["types"] == ["int", "str", "str", "int", "date"]
+        manager.set_data("Name 31", "Houston", "unknown", "2024-01-01")
+        manager.guardar_datos_csv()
+        assert read_meta(manager)["types"][3] == "mixed"
+        # values that are not numbers are compared as str ("unknown" > "45")
+        assert [row[0] for row in manager.leer_datos_csv('"age" > 45')][1:] == [f"[{num}]" for num in range(26, 32)]
+        assert list(manager.leer_datos_csv('"age" > 0~SUM:age'))[-1] == ["SUM", "AGE", 0]
+        for _ in manager.actualizar_datos('UPDATE:~"date"=soon ON "indice" = 1'):
+            pass
+        assert read_meta(manager)["types"][4] == "mixed"
+        for _ in manager.borrar_datos('DELETE ON "age" = unknown'):
+            pass
+        # deleting keeps the previous types since they still describe all values
+        assert read_meta(manager)["types"] == ["int", "str", "str", "mixed", "mixed"]
+        assert list(manager.leer_datos_csv('"age" > 0~SUM:age'))[-1] == ["SUM", "AGE", sum(20 + num % 45 for num in range(1, 31))]
+        dates = [f"2024-{num % 12 + 1:02d}-{num % 28 + 1:02d}" for num in range(2, 31)]
+        # the mixed column still gives a date when the selected rows only have dates
+        assert list(manager.leer_datos_csv('"indice" > 1~MAX:date'))[-1] == ["MAX", "DATE", date.fromisoformat(max(dates))]
+        # "soon" >= "2024-12-01" as str
+        assert list(manager.leer_datos_csv('"date" >= 2024-12-01~COUNT:'))[-1] == ["COUNT", 1 + sum(
+            1 for item in dates if item >= "2024-12-01")]
+        remove_backup_files(manager)
+
+    def test_types_inferred_after_external_change(self):
+        """ chequea que si el csv fue modificado por fuera de la clase los tipos se obtengan de nuevo
+        en la siguiente búsqueda"""
+        manager = SingleCsvManager("types_external", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("types_external", Employee)
+        fill_employees(manager, 10)
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[11]", "Name 11", "12", "30.5", "2024-02-30"])
+        reopened = SingleCsvManager("types_external", Employee)
+        assert "types" not in read_meta(reopened)
+        assert [row[0] for row in reopened.leer_datos_csv('"city" < 20')][1:] == ["[11]"]
+        assert read_meta(reopened)["types"] == ["int", "str", "mixed", "float", "mixed"]
+        assert list(reopened.leer_datos_csv('"age" > 30~AVG:age'))[-1] == ["AVG", "AGE", 30.5]
+        # a value that is not a date makes MAX compare the column as str
+        assert list(reopened.leer_datos_csv('"indice" > 0~MAX:date'))[-1] == ["MAX", "DATE", "2024-11-11"]
+        remove_backup_files(manager)
+
+
+class TestColumnarCache:
+    """contiene los test de cache='columnar' en el cual las lecturas y búsquedas se responden desde
+    una copia del csv guardada en memoria por columnas"""
+    queries = ("", "Houston", "[5:9]", '"age" > 40 & "city" != Houston', '"date" < 2024-03-10 | "name" ]= 7',
+               '"age" >= 2024-01-01', '"indice" [= 1~COUNT:', '"age" << 3~AVG:age', '"city" {} %RANGE:,[Chicago,Phoenix]~MAX:date',
+               '[name#age] "age" > 30~DESC:age', '"age" > unknown', '"city" {} Houston', '"age" = 40.0~LIMIT:2')
+
+    def test_columnar_matches_file(self):
+        """ chequea que los resultados de la copia en memoria sean los mismos que al leer el archivo,
+        incluso con columnas que tienen valores de distintos tipos"""
+        manager = SingleCsvManager("columnar_read", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("columnar_read", Employee)
+        fill_employees(manager, 80)
+        cached = SingleCsvManager("columnar_read", Employee, cache="columnar")
+        for _ in range(2):
+            for query in self.queries:
+                assert list(cached.leer_datos_csv(query)) == list(manager.leer_datos_csv(query)), query
+            manager.set_data("Name 81", "Houston", "unknown", "2024-02-30")
+            manager.guardar_datos_csv()
+        with pytest.raises(ValueError, match="debe ser None o 'columnar'"):
+            SingleCsvManager("columnar_read", Employee, cache="rows")
+        remove_backup_files(manager)
+
+    def test_columnar_refresh(self):
+        """ chequea que la copia en memoria se vuelva a crear cuando la instancia escribe en el archivo
+        o cuando este es modificado por fuera de la clase"""
+        manager = SingleCsvManager("columnar_refresh", Employee, cache="columnar")
+        remove_backup_files(manager)
+        manager = SingleCsvManager("columnar_refresh", Employee, cache="columnar")
+        fill_employees(manager, 10)
+        query = '"city" = Houston~COUNT:'
+        assert list(manager.leer_datos_csv(query))[-1] == ["COUNT", 2]
+        manager.set_data("Name 11", "Houston", 30, "2024-01-01")
+        manager.guardar_datos_csv()
+        assert list(manager.leer_datos_csv(query))[-1] == ["COUNT", 3]
+        for _ in manager.borrar_datos("[4]"):
+            pass
+        assert list(manager.leer_datos_csv(query))[-1] == ["COUNT", 2]
+        # a row with fewer values can't be stored by columns so the file is read instead
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[11]", "Name 12", "Houston"])
+        assert [row[0] for row in manager.leer_datos_csv("houston")][1:] == ["[7]", "[10]", "[11]"]
+        remove_backup_files(manager)
+
+
+def source_queries(header: list[str], rows: list[list[str]]) -> list[str]:
+    """crea queries de búsqueda para cada columna de un csv ocupando los valores de sus primeras filas"""
+    queries: list[str] = []
+    for col, value, other in zip(header, rows[0], rows[1]):
+        queries += [f'"{col}" > {value}', f'"{col}" <= {other}', f'"{col}" = {value}', f'"{col}" != {other}',
+                    f'"{col}" [= {value[:2]}', f'"{col}" ]= {value[-2:]}', f'"{col}" [] {value[1:3]}', f'"{col}" ][ a',
+                    f'"{col}" << 8', f'"{col}" >< 10', f'"{col}" {{}} %RANGE:|[{value}|{other}]',
+                    f'"{col}" }}{{ %RANGE:|[{value}|{other}]', f'"{col}" > 2024-05-01', f'"{col}" >= 40',
+                    f'"{col}" > {value} | "{header[0]}" [] a & "{header[-1]}" < 2024-06-01',
+                    f'"indice" > 0~AVG:{col}', f'"indice" > 0~SUM:{col}', f'"indice" > 10~MIN:{col}',
+                    f'"indice" < 100~MAX:{col}', f'"{col}" > {value}~COUNT:', f'"{col}" < {value}~LIMIT:3',
+                    f'"{col}" []  a~ASC:{col}', f'"{col}" [] e~UNIQUE:{col}']
+    return queries
+
+
+class TestNumpyEngine:
+    """contiene los test que comprueban que leer_datos_csv(engine='numpy') entregue los mismos
+    resultados que engine='python' sobre los csv del directorio data"""
+
+    def test_numpy_matches_python(self, tmp_path):
+        """ chequea que ambos motores (con y sin cache='columnar') entreguen los mismos resultados"""
+        pytest.importorskip("numpy")
+        sources = sorted(Path(__file__).parent.joinpath("data").glob("*.csv"))
+        assert sources, "no se encontraron archivos csv en el directorio data"
+        # index needs the backup directory to exist
+        backup = BaseCsvManager.backup
+        BaseCsvManager.backup = tmp_path
+        try:
+            for source in sources:
+                with open(source, "r", newline="", encoding="utf-8") as csv_reader:
+                    header, *rows = list(csv.reader(csv_reader))
+                SingleCsvManager.index(str(source), ",", id_present=False, new_name="engine_source")
+                manager = SingleCsvManager("engine_source", delimiter=",")
+                cached = SingleCsvManager("engine_source", delimiter=",", cache="columnar")
+                for query in source_queries(header, rows):
+                    expected = list(manager.leer_datos_csv(query))
+                    assert list(manager.leer_datos_csv(query, engine="numpy")) == expected, query
+                    assert list(cached.leer_datos_csv(query, engine="numpy")) == expected, query
+                    assert list(cached.leer_datos_csv(query)) == expected, query
+                remove_backup_files(manager)
+        finally:
+            # the setter only accepts directories that exist
+            BaseCsvManager._backup = backup
+
+    def test_invalid_engine(self):
+        """ chequea que solo se acepten los motores python y numpy"""
+        manager = SingleCsvManager("engine_invalid", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("engine_invalid", Employee)
+        fill_employees(manager, 3)
+        with pytest.raises(ValueError, match="debe ser 'python' o 'numpy'"):
+            list(manager.leer_datos_csv('"age" > 3', engine="pandas"))
+        remove_backup_files(manager)
+
+
+def drain(generator) -> tuple[list, object]:
+    """consume un generador y retorna sus valores junto con su valor de retorno"""
+    values = []
+    while True:
+        try:
+            values.append(next(generator))
+        except StopIteration as stop:
+            return values, stop.value
+
+
+class TestSinglePassDelete:
+    """contiene los test de borrar_datos el cual copia las filas que no se borran a un archivo temporal
+    en una sola lectura y luego remplaza el csv con este"""
+
+    def test_delete_updates_meta_without_reading_again(self):
+        """ chequea que el borrado retorne el nuevo número de filas, renumere el INDICE y deje un .meta
+        valido sin tener que volver a leer el csv"""
+        manager = SingleCsvManager("delete_single", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("delete_single", Employee)
+        fill_employees(manager, 150)
+        original = SingleCsvManager._build_meta
+        SingleCsvManager._build_meta = classmethod(lambda cls, *args: (_ for _ in ()).throw(AssertionError("csv leído")))
+        try:
+            deleted, new_rows = drain(manager.borrar_datos("[3:4]"))
+            assert deleted == ["INDICE|NAME|CITY|AGE|DATE", "[3]|Name 3|Phoenix|23|2024-04-04",
+                               "[4]|Name 4|Houston|24|2024-05-05"]
+            assert new_rows == 149
+            deleted, new_rows = drain(manager.borrar_datos('DELETE ON "age" > 60'))
+            assert len(deleted) == 1 + sum(1 for num in range(5, 151) if 20 + num % 45 > 60)
+            assert new_rows == 149 - (len(deleted) - 1) == len(manager)
+        finally:
+            SingleCsvManager._build_meta = original
+        assert read_meta(manager) == original(manager.instance_file_path, "|") | {"types": ["int", "str", "str", "int", "date"]}
+        assert [row[0] for row in manager.leer_datos_csv()][1:] == [f"[{num}]" for num in range(1, new_rows)]
+        assert list(manager.leer_datos_csv("[100]"))[-1] == list(manager.leer_datos_csv())[100]
+        assert not list(manager.instance_file_path.parent.glob("*.tmp"))
+        remove_backup_files(manager)
+
+    def test_csv_unchanged_without_deletes(self):
+        """ chequea que el csv no se modifique si ninguna entrada cumple la query o si el
+        generador se cierra antes de pedir el primer valor"""
+        manager = SingleCsvManager("delete_unchanged", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("delete_unchanged", Employee)
+        fill_employees(manager, 20)
+        file_stat = manager.instance_file_path.stat()
+        assert drain(manager.borrar_datos('DELETE ON "age" > 100')) == (
+            ["no se encontraron entradas para eliminar"], "sintaxis valida pero sin entradas seleccionadas para la operación")
+        delete_on = manager.borrar_datos('DELETE ON "city" = Houston')
+        delete_on.close()
+        assert manager.instance_file_path.stat().st_mtime_ns == file_stat.st_mtime_ns
+        assert len(manager) == 21
+        assert not list(manager.instance_file_path.parent.glob("*.tmp"))
+        remove_backup_files(manager)
+
+
+class TestLazyDelete:
+    """contiene los test de lazy_delete=True en el cual borrar_datos guarda las filas borradas en el
+    archivo .tomb en vez de reescribir el csv"""
+
+    def test_lazy_delete_matches_rewrite(self):
+        """ chequea que las lecturas con filas en el .tomb sean iguales a las de un csv reescrito y que
+        compact deje el mismo archivo"""
+        managers = []
+        for name, lazy_delete in (("lazy_rewrite", False), ("lazy_tomb", True)):
+            manager = SingleCsvManager(name, Employee)
+            remove_backup_files(manager)
+            manager = SingleCsvManager(name, Employee, lazy_delete=lazy_delete)
+            fill_employees(manager, 200)
+            managers.append(manager)
+        rewrite, lazy = managers
+        file_stat = lazy.instance_file_path.stat()
+        # a high ratio so the csv is not compacted
+        SingleCsvManager._compact_ratio = 2
+        try:
+            for delete_index in ("[3]", "[10:14]", "[1-2-140]", 'DELETE ON "age" > 60', '"city" = Houston', "[100:]"):
+                deleted = drain(rewrite.borrar_datos(rewrite.compile_query(delete_index) if delete_index[0] == '"'
+                                                     else delete_index))
+                assert drain(lazy.borrar_datos(lazy.compile_query(delete_index) if delete_index[0] == '"'
+                                               else delete_index)) == deleted
+        finally:
+            SingleCsvManager._compact_ratio = 0.25
+        assert lazy.instance_file_path.stat().st_mtime_ns == file_stat.st_mtime_ns
+        assert len(lazy) == len(rewrite) == len(SingleCsvManager("lazy_tomb", Employee))
+        for query in ("", "[5]", "[20:30]", "[1-7-60-100]", "Chicago", '"indice" > 50 & "age" < 40',
+                      '"age" > 30~AVG:age', '"indice" [] 5~DESC:date', "[100:]"):
+            assert list(lazy.leer_datos_csv(query)) == list(rewrite.leer_datos_csv(query)), query
+        columnar = SingleCsvManager("lazy_tomb", Employee, cache="columnar")
+        assert list(columnar.leer_datos_csv('"indice" > 50 & "age" < 40')) == list(rewrite.leer_datos_csv('"indice" > 50 & "age" < 40'))
+        assert lazy.compact() == 200 - (len(rewrite) - 1)
+        with open(lazy.instance_file_path, "r", encoding="utf-8") as lazy_reader, \
+                open(rewrite.instance_file_path, "r", encoding="utf-8") as rewrite_reader:
+            assert lazy_reader.read() == rewrite_reader.read()
+        assert not lazy.instance_file_path.with_suffix(".tomb").exists()
+        for manager in managers:
+            remove_backup_files(manager)
+
+    def test_tombstones_with_writes(self):
+        """ chequea el INDICE de las entradas guardadas después de borrar, que actualizar reescriba
+        el csv sin las filas borradas y que se reescriba al superar _compact_ratio"""
+        manager = SingleCsvManager("lazy_writes", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("lazy_writes", Employee, lazy_delete=True)
+        fill_employees(manager, 20)
+        assert drain(manager.borrar_datos("[2-4]"))[-1] == 19
+        manager.set_data("Name 21", "Houston", 50, "2024-01-01")
+        assert manager.guardar_datos_csv().endswith("[19]|Name 21|Houston|50|2024-01-01")
+        assert list(manager.leer_datos_csv("[19]"))[-1] == ["[19]", "Name 21", "Houston", "50", "2024-01-01"]
+        for _ in manager.actualizar_datos('UPDATE:~"city"=Austin ON "name" = Name 21'):
+            pass
+        assert not manager.instance_file_path.with_suffix(".tomb").exists()
+        assert list(manager.leer_datos_csv())[-1] == ["[19]", "Name 21", "Austin", "50", "2024-01-01"]
+        # 5 of the 19 entries in the csv is more than a quarter of them
+        assert drain(manager.borrar_datos("[1:4]"))[-1] == 16
+        assert manager.instance_file_path.with_suffix(".tomb").exists()
+        assert drain(manager.borrar_datos("[1]"))[-1] == 15
+        assert not manager.instance_file_path.with_suffix(".tomb").exists()
+        assert read_meta(manager)["rows"] == 15 == len(manager)
+        remove_backup_files(manager)
+
+    def test_blank_lines_are_not_rows(self):
+        """ chequea que las lineas en blanco agregadas por fuera de la clase no cuenten como filas en el .meta,
+        el .tomb ni los indices, y que las lecturas por INDICE, búsquedas y borrados entreguen las mismas filas
+        que sin ellas"""
+        manager = SingleCsvManager("lazy_blank", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("lazy_blank", Employee)
+        fill_employees(manager, 20)
+        expected = list(manager.leer_datos_csv())
+        lines = manager.instance_file_path.read_bytes().split(b"\r\n")
+        manager.instance_file_path.write_bytes(b"\r\n".join(line + b"\r\n" if num % 3 else line
+                                                             for num, line in enumerate(lines)))
+        manager = SingleCsvManager("lazy_blank", Employee, lazy_delete=True)
+        manager.create_index("age")
+        manager.create_text_index()
+        assert len(manager) == 21 and read_meta(manager)["rows"] == 21
+        assert list(manager.leer_datos_csv()) == expected
+        assert drain(manager.borrar_datos("[2-5]"))[-1] == 19
+        del expected[5], expected[2]
+        expected = [expected[0]] + [[f"[{num}]", *row[1:]] for num, row in enumerate(expected[1:], start=1)]
+        assert list(manager.leer_datos_csv("[3:8]"))[1:] == expected[3:9]
+        assert list(manager.leer_datos_csv('"age" = 30'))[1:] == [row for row in expected[1:] if row[3] == "30"]
+        assert list(manager.leer_datos_csv("chicago"))[1:] == [row for row in expected[1:] if row[2] == "Chicago"]
+        manager.compact()
+        assert list(manager.leer_datos_csv()) == expected
+        remove_backup_files(manager)
+
+
+class TestSaveMany:
+    """contiene los test de guardar_datos_csv_many el cual guarda varias entradas abriendo el archivo una vez"""
+
+    def test_many_matches_single_saves(self):
+        """ chequea que guardar varias entradas de una vez de el mismo resultado y archivo que
+        guardarlas una por una con guardar_datos_csv"""
+        employees = [Employee(f"Name {num % 15}", "Houston", 20 + num, "2024-01-01") for num in range(40)]
+        single = SingleCsvManager("many_single", Employee)
+        remove_backup_files(single)
+        single = SingleCsvManager("many_single", Employee)
+        many = SingleCsvManager("many_batch", Employee)
+        remove_backup_files(many)
+        many = SingleCsvManager("many_batch", Employee)
+        expected = []
+        for employee in employees:
+            single.writer_instance = employee
+            expected.append(single.guardar_datos_csv(enforce_unique=("name",)))
+        assert many.guardar_datos_csv_many(iter(employees), enforce_unique=("name",)) == expected
+        assert expected.count("presente") == 25
+        with open(single.instance_file_path, "r", encoding="utf-8") as single_reader, \
+                open(many.instance_file_path, "r", encoding="utf-8") as many_reader:
+            assert single_reader.read() == many_reader.read()
+        assert {key: value for key, value in read_meta(many).items() if key != "mtime_ns"} == {
+            key: value for key, value in read_meta(single).items() if key != "mtime_ns"}
+        assert len(many) == 16
+        remove_backup_files(single)
+        remove_backup_files(many)
+
+    def test_many_validation(self):
+        """ chequea que no se guarde ninguna entrada si alguna no tiene las columnas del csv y que el
+        valor de enforce_unique también se compare con las entradas de la misma llamada"""
+        manager = SingleCsvManager("many_validation", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("many_validation", Employee)
+        fill_employees(manager, 5)
+        with pytest.raises(ValueError, match="mismo número de atributos"):
+            manager.guardar_datos_csv_many([Employee("Name 6", "Houston", 30, "2024-01-01"), BaseCsvManager("other")])
+        with pytest.raises(ValueError, match="deben ser columnas del csv"):
+            manager.guardar_datos_csv_many([Employee("Name 6", "Houston", 30, "2024-01-01")], enforce_unique=("nope",))
+        assert len(manager) == 6
+        assert manager.guardar_datos_csv_many([Employee("Name 5", "Austin", 30, "2024-01-01"),
+                                               Employee("Name 6", "Austin", 30, "2024-01-01"),
+                                               Employee("Name 6", "Dallas", 31, "2024-01-01")],
+                                              enforce_unique=("name",)) == [
+            "presente", "\nINDICE|NAME|CITY|AGE|DATE\n[6]|Name 6|Austin|30|2024-01-01", "presente"]
+        assert manager.guardar_datos_csv_many([]) == []
+        remove_backup_files(manager)
+
+
+class TestUniqueIndex:
+    """contiene los test del indice hash que ocupa enforce_unique para saber si un valor ya esta en su columna"""
+
+    def test_index_follows_changes(self):
+        """ chequea que el indice se mantenga al día al guardar, borrar (también con lazy_delete) y actualizar
+        entradas sin tener que volver a leer el csv"""
+        manager = SingleCsvManager("unique_changes", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("unique_changes", Employee)
+        fill_employees(manager, 30)
+        manager.set_data("Name 5", "Austin", 30, "2024-01-01")
+        assert manager.guardar_datos_csv(enforce_unique=("name", "city")) == "presente"
+        for _ in manager.borrar_datos("[5]"):
+            pass
+        manager.lazy_delete = True
+        for _ in manager.borrar_datos('DELETE ON "name" = Name 6'):
+            pass
+        for _ in manager.actualizar_datos('UPDATE:~"name"=Renamed ON "name" = Name 7'):
+            pass
+        manager.set_data("Name 5", "Austin", 30, "2024-01-01")
+        assert manager.guardar_datos_csv(enforce_unique=("name", "city")).endswith("[29]|Name 5|Austin|30|2024-01-01")
+        for name, result in (("Name 6", "[30]|Name 6"), ("Name 7", "[31]|Name 7"), ("Renamed", "presente")):
+            manager.set_data(name, "Dallas", 30, "2024-01-01")
+            assert manager.guardar_datos_csv(enforce_unique=("name",)).split("\n")[-1].startswith(result)
+        for _ in manager.borrar_datos("[1]"):
+            pass
+        rows = list(manager.leer_datos_csv())[1:]
+        assert manager._unique_index == {"NAME": Counter(row[1] for row in rows), "CITY": Counter(row[2] for row in rows)}
+        remove_backup_files(manager)
+
+    def test_saved_index_skips_scan(self):
+        """ chequea que una nueva instancia ocupe el indice guardado en el .uniq en vez de leer el csv
+        y que este no se ocupe si el csv cambio"""
+        manager = SingleCsvManager("unique_saved", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("unique_saved", Employee)
+        fill_employees(manager, 10)
+        manager.set_data("Name 1", "Austin", 30, "2024-01-01")
+        assert manager.guardar_datos_csv(enforce_unique=("name",)) == "presente"
+        manager.save_unique_index()
+        original = SingleCsvManager.leer_datos_csv
+        SingleCsvManager.leer_datos_csv = lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("csv leído"))
+        try:
+            reopened = SingleCsvManager("unique_saved", Employee)
+            reopened.set_data("Name 2", "Austin", 30, "2024-01-01")
+            assert reopened.guardar_datos_csv(enforce_unique=("name",)) == "presente"
+        finally:
+            SingleCsvManager.leer_datos_csv = original
+        # the .uniq is not valid once the csv changed
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[11]", "Name 11", "Houston", "30", "2024-01-01"])
+        reopened = SingleCsvManager("unique_saved", Employee)
+        reopened.set_data("Name 11", "Austin", 30, "2024-01-01")
+        assert reopened.guardar_datos_csv(enforce_unique=("name",)) == "presente"
+        with pytest.raises(ValueError, match="deben ser columnas del csv"):
+            reopened.guardar_datos_csv(enforce_unique=("salary",))
+        remove_backup_files(manager)
+
+
+def index_results(manager: SingleCsvManager, queries: tuple[str, ...], ratio: float) -> list[list]:
+    """retorna el resultado de cada query ocupando los indices ordenados (ratio 1) o leyendo todo el csv (ratio 0)"""
+    manager._index_ratio = ratio
+    results = [list(manager.leer_datos_csv(query)) for query in queries]
+    del manager._index_ratio
+    return results
+
+
+class TestSortedIndex:
+    """contiene los test de los indices ordenados creados con create_index"""
+
+    queries = ('"age" = 30', '"age" >= 62', '"date" < 2024-01-10', '"city" = Phoenix & "age" < 24',
+               '"name" >= Name 95 & "name" < Name 96', '"age" > 60 | "age" < 21', '"age" = 40~COUNT:')
+
+    def test_index_follows_changes(self):
+        """ chequea que las búsquedas que ocupan el indice retornen lo mismo que al leer todo el csv y que el
+        indice se mantenga al día al guardar, borrar (también con lazy_delete) y actualizar entradas"""
+        manager = SingleCsvManager("sorted_changes", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("sorted_changes", Employee)
+        fill_employees(manager, 200)
+        for column in ("age", "date", "name"):
+            manager.create_index(column)
+        assert index_results(manager, self.queries, 1) == index_results(manager, self.queries, 0)
+        for _ in manager.borrar_datos('DELETE ON "age" = 30'):
+            pass
+        fill_employees(manager, 5)
+        for _ in manager.actualizar_datos('UPDATE:~"age"=%ADD:~3 ON "age" = 40'):
+            pass
+        assert index_results(manager, self.queries, 1) == index_results(manager, self.queries, 0)
+        maintained = json.loads(json.dumps(manager._sorted_indexes))
+        rebuilt = SingleCsvManager("sorted_changes", Employee)
+        rebuilt.instance_file_path.with_suffix(".idx").unlink()
+        for column in ("age", "date", "name"):
+            rebuilt.create_index(column)
+        assert maintained == rebuilt._sorted_indexes
+        manager.lazy_delete = True
+        for _ in manager.borrar_datos('DELETE ON "age" = 31'):
+            pass
+        for _ in manager.borrar_datos("[1-2-3]"):
+            pass
+        assert index_results(manager, self.queries, 1) == index_results(manager, self.queries, 0)
+        # a str in a numeric column stops the use of the index (the values are compared as str)
+        manager.set_data("Name 0", "Houston", "unknown", "2024-01-01")
+        manager.guardar_datos_csv()
+        assert manager._sorted_indexes["AGE"]["kind"] is None
+        assert index_results(manager, self.queries, 1) == index_results(manager, self.queries, 0)
+        remove_backup_files(manager)
+
+    def test_saved_index_skips_scan(self):
+        """ chequea que una nueva instancia ocupe el indice guardado en el .idx en vez de crearlo de nuevo
+        y que este se vuelva a crear si el csv cambio"""
+        manager = SingleCsvManager("sorted_saved", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("sorted_saved", Employee)
+        with pytest.raises(ValueError, match="no hay datos"):
+            manager.create_index("age")
+        fill_employees(manager, 100)
+        with pytest.raises(ValueError, match="solo se puede crear un indice"):
+            manager.create_index("indice")
+        manager.create_index("age")
+        original = SingleCsvManager._SingleCsvManager__build_sorted_indexes
+        SingleCsvManager._SingleCsvManager__build_sorted_indexes = lambda *args: (_ for _ in ()).throw(
+            AssertionError("indice creado"))
+        try:
+            reopened = SingleCsvManager("sorted_saved", Employee)
+            assert index_results(reopened, ('"age" = 30',), 1) == index_results(reopened, ('"age" = 30',), 0)
+        finally:
+            SingleCsvManager._SingleCsvManager__build_sorted_indexes = original
+        # the .idx is not valid once the csv changed
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[101]", "Name 101", "Houston", "30", "2024-01-01"])
+        reopened = SingleCsvManager("sorted_saved", Employee)
+        assert list(reopened.leer_datos_csv('"age" = 30'))[-1] == ["[101]", "Name 101", "Houston", "30", "2024-01-01"]
+        assert sorted(reopened._sorted_indexes["AGE"]["rows"]) == list(range(1, 102))
+        remove_backup_files(manager)
+
+
+class TestExternalSort:
+    """contiene los test del orden de ~ASC y ~DESC con runs en archivos temporales (ExternalSort)"""
+
+    def test_runs_match_memory_sort(self):
+        """ chequea que ordenar en archivos temporales retorne lo mismo que ordenar en memoria"""
+        manager = SingleCsvManager("external_sort", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("external_sort", Employee)
+        fill_employees(manager, 120)
+        queries = ('"age" > 25~ASC:age', '"age" > 25~DESC:date', '[city] "age" < 50~DESC:name', '"age" > 0~ASC:city')
+        expected = [list(manager.leer_datos_csv(query)) for query in queries]
+        manager._sort_memory = 60
+        assert [list(manager.leer_datos_csv(query)) for query in queries] == expected
+        remove_backup_files(manager)
+
+    def test_key_type_changes(self):
+        """ chequea que los runs ordenados como números se vuelvan a ordenar como str si aparece un valor que
+        no es número y que si ninguna de las conversiones de la columna sirve las filas se ordenen como str"""
+        values = ["10", "9", "10", "100", "abc", "9", "2"]
+        external = ExternalSort(1, False, (float, date.fromisoformat, str), memory=2)
+        for count, value in enumerate(values):
+            external.add([f"[{count}]", value])
+        assert [row[1] for row in external.sorted_rows()] == sorted(set(values))
+        external = ExternalSort(1, True, (float,), memory=2)
+        for count, value in enumerate(values):
+            external.add([f"[{count}]", value])
+        assert [row[1] for row in external.sorted_rows()] == sorted(set(values), reverse=True)
+
+
+class TestTopRows:
+    """contiene los test de ~ASC y ~DESC seguidas de ~LIMIT"""
+
+    def test_limit_matches_full_sort(self):
+        """ chequea que con ~LIMIT se entreguen las primeras filas del resultado ordenado completo, también
+        en columnas con valores de distintos tipos y cuando la columna no se muestra"""
+        manager = SingleCsvManager("top_rows", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("top_rows", Employee)
+        fill_employees(manager, 150)
+        manager.set_data("Name 0", "Houston", "unknown", "2024-01-01")
+        manager.guardar_datos_csv()
+        for query in ('"age" > 30~DESC:age', '"age" < 40~ASC:date', '"city" = Houston~DESC:name', '"age" > 0~ASC:age',
+                      '[city] "age" > 30~DESC:age'):
+            full = list(manager.leer_datos_csv(query))
+            for limit in (1, 7, 500):
+                assert list(manager.leer_datos_csv(f"{query}~LIMIT:{limit}")) == full[:limit + 1]
+        assert manager.compile_query('"age" > 30~DESC:age~LIMIT:0').limit is None
+        remove_backup_files(manager)
+
+    def test_keeps_only_limit_rows(self):
+        """ chequea que solo se guarden limit filas y que con el mismo valor se mantenga la primera fila agregada"""
+        top = TopRows(1, True, float, 3)
+        for count, value in enumerate(["5", "7", "7.0", "1", "9", "7", "8"]):
+            top.add([f"[{count}]", value])
+            assert len(top._TopRows__heap) <= 3 and len(top._TopRows__str_heap) <= 3
+        assert list(top.sorted_rows()) == [["[4]", "9"], ["[6]", "8"], ["[1]", "7"]]
+
+    def test_invalid_value_sorts_as_str(self):
+        """ chequea que si un valor no se puede convertir las filas se ordenen como str igual que ExternalSort"""
+        values = ["10", "9", "100", "25", "abc", "9", "3", "1000", "4"]
+        for reverse in (False, True):
+            top = TopRows(1, reverse, float, 4)
+            external = ExternalSort(1, reverse, (float,), memory=1_000)
+            for count, value in enumerate(values):
+                top.add([f"[{count}]", value])
+                external.add([f"[{count}]", value])
+            assert top.cast is str and list(top.sorted_rows()) == list(external.sorted_rows())[:4]
+
+
+class TestMultipleAggregates:
+    """contiene los test de queries con varias funciones (por ejemplo ~SUM:age,AVG:age,COUNT:)"""
+
+    def test_matches_single_functions(self):
+        """ chequea que cada resultado sea igual al de ocupar cada función por separado, en el orden de la query,
+        y que las funciones sobre columnas que no existen o no se muestran se ignoren"""
+        manager = SingleCsvManager("multiple_aggregates", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("multiple_aggregates", Employee)
+        fill_employees(manager, 60)
+        functions = ("SUM:age", "AVG:age", "COUNT:", "MAX:date", "MIN:name")
+        for condition in ('"age" > 30', '"city" = Houston', '"age" > 100'):
+            expected = [list(manager.leer_datos_csv(f"{condition}~{function}"))[-1] for function in functions]
+            result = list(manager.leer_datos_csv(f"{condition}~{','.join(functions)}"))
+            assert result[1:] == expected
+        result = list(manager.leer_datos_csv('![age] "age" > 30~SUM:age,COUNT:,AVG:other'))
+        assert result[1:] == [list(manager.leer_datos_csv('"age" > 30~COUNT:'))[-1]]
+        assert manager.compile_query('"age" > 30~SUM:age,COUNT:').functions == (("SUM", "age"), ("COUNT", ""))
+        remove_backup_files(manager)
+
+
+class TestGroupAggregate:
+    """contiene los test de ~GROUP que calcula funciones para cada grupo de filas con el mismo valor en una columna"""
+
+    def test_matches_query_per_group(self):
+        """ chequea que el resultado de cada grupo sea igual al de buscar las filas de ese valor, también cuando
+        los grupos no caben en memoria y se agrupan desde archivos temporales"""
+        manager = SingleCsvManager("group_aggregate", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("group_aggregate", Employee)
+        fill_employees(manager, 90)
+        for column, condition in (("city", '"age" > 30'), ("age", '"indice" > 0'), ("date", '"city" != Houston')):
+            expected = {}
+            for row in list(manager.leer_datos_csv(condition))[1:]:
+                value = row[manager.new_head.index(column.upper())]
+                if value not in expected:
+                    expected[value] = list(manager.leer_datos_csv(
+                        f'{condition} & "{column}" = {value}~SUM:age,MAX:date,COUNT:'))[1:]
+            for memory in (SingleCsvManager._group_memory, 2):
+                manager._group_memory = memory
+                result = list(manager.leer_datos_csv(f"{condition}~GROUP:{column}:SUM:age,MAX:date,COUNT:"))
+                assert {row[2]: row[3:] for row in result[1:]} == expected
+                assert len(result) == len(expected) + 1 and all(row[:2] == ["GROUP", column.upper()] for row in result[1:])
+        # with the group column hidden the rows are not grouped
+        assert len(list(manager.leer_datos_csv('![city] "age" > 30~GROUP:city:COUNT:'))) == len(
+            list(manager.leer_datos_csv('"age" > 30')))
+        remove_backup_files(manager)
+
+
+class TestMaterializedAggregates:
+    """contiene los test de las queries registradas con register_aggregate cuyo resultado se mantiene al día
+    al guardar, borrar y actualizar entradas"""
+
+    queries = ('~COUNT:', '~SUM:age,AVG:age,UNIQUE:city', '"city" = Houston~SUM:age,COUNT:', '"age" > 40~UNIQUE:city')
+
+    @staticmethod
+    def expected(manager: SingleCsvManager, query: str) -> list:
+        """retorna el resultado de query con leer_datos_csv (una búsqueda por función)"""
+        conditions, _, functions = query.rpartition("~")
+        # the name condition selects every row
+        conditions = conditions or '"name" != -'
+        return [list(manager.leer_datos_csv(f"{conditions}~{function}"))[-1]
+                for function in functions.split(",")]
+
+    def test_follow_changes(self):
+        """ chequea que el resultado sea igual al de leer_datos_csv después de guardar, borrar (también con
+        lazy_delete) y actualizar entradas, en otra instancia y después de modificar el csv por fuera de la clase"""
+        manager = SingleCsvManager("materialized", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("materialized", Employee)
+        fill_employees(manager, 40)
+        for query in self.queries:
+            manager.register_aggregate(query)
+        changes = (lambda: fill_employees(manager, 5),
+                   lambda: list(manager.borrar_datos('DELETE ON "city" = Chicago')),
+                   lambda: list(manager.actualizar_datos('UPDATE:~"age"=%ADD:~3 "city"=Houston ON "age" < 30')),
+                   lambda: setattr(manager, "lazy_delete", True),
+                   lambda: list(manager.borrar_datos("[3:8]")),
+                   lambda: manager.compact(),
+                   lambda: list(manager.actualizar_datos('UPDATE:~"age"=unknown ON "name" = Name 10')))
+        for change in changes:
+            change()
+            for query in self.queries:
+                assert manager.aggregate(query) == self.expected(manager, query)
+        reopened = SingleCsvManager("materialized", Employee)
+        assert reopened._aggregates_signature is not None
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[99]", "Name 99", "Houston", "50", "2024-02-01"])
+        for query in self.queries:
+            assert reopened.aggregate(query) == self.expected(reopened, query)
+        reopened.unregister_aggregate(self.queries[0])
+        with pytest.raises(ValueError):
+            reopened.aggregate(self.queries[0])
+        for query in ('"indice" > 3~COUNT:', '~MAX:age', '~SUM:other', '"age" {} 3~COUNT:'):
+            with pytest.raises(ValueError):
+                manager.register_aggregate(query)
+        remove_backup_files(manager)
+
+    def test_non_finite_values(self):
+        """ chequea que con inf, -inf y nan SUM y AVG sean iguales a los de leer_datos_csv y que vuelvan a ser
+        finitos al borrar esas filas"""
+        manager = SingleCsvManager("materialized_inf", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("materialized_inf", Employee)
+        fill_employees(manager, 10)
+        query = '"city" = Houston~SUM:age,AVG:age'
+        manager.register_aggregate(query)
+        for age in ("inf", "-inf", "nan"):
+            manager.set_data("Odd", "Houston", age, "2024-01-01")
+            manager.guardar_datos_csv()
+            # nan is not equal to itself so the results are compared as str
+            assert str(manager.aggregate(query)) == str(self.expected(manager, query))
+        list(manager.borrar_datos('DELETE ON "name" = Odd'))
+        assert manager.aggregate(query) == self.expected(manager, query)
+        remove_backup_files(manager)
+
+    def test_queries_have_their_own_state(self):
+        """ chequea que al cargar las queries de un .aggr que no corresponde al csv cada una tenga su propio estado"""
+        manager = SingleCsvManager("materialized_state", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("materialized_state", Employee)
+        fill_employees(manager, 10)
+        for query in self.queries:
+            manager.register_aggregate(query)
+        with open(manager.instance_file_path, "a", newline="", encoding="utf-8") as csv_writer:
+            csv.writer(csv_writer, delimiter="|").writerow(["[11]", "Name 11", "Houston", "50", "2024-02-01"])
+        reopened = SingleCsvManager("materialized_state", Employee)
+        states = list(reopened._aggregates.values())
+        assert len({id(state) for state in states}) == len(self.queries)
+        for query in self.queries:
+            assert reopened.aggregate(query) == self.expected(reopened, query)
+        remove_backup_files(manager)
+
+
+class TestTextSearch:
+    """contiene los test de las búsquedas por texto de leer_datos_csv (search que no es un indice ni una query)"""
+
+    def test_matches_regex_search(self):
+        """ chequea que la búsqueda por texto (que compara las filas como bytes antes de separarlas) entregue las
+        mismas filas que buscar con una expresión regular sin distinguir mayúsculas, también con valores entre
+        comillas, caracteres que no son ASCII y filas borradas con lazy_delete"""
+        manager = SingleCsvManager("text_search", Employee, lazy_delete=True)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("text_search", Employee, lazy_delete=True)
+        fill_employees(manager, 30)
+        for values in (("Ñandú Straße", "Houston", 30, "2024-01-01"), ("Name|quoted", 'Chi"cago', 31, "2024-01-02"),
+                       ("\u212aELVIN", "Phoenix", 32, "2024-01-03"), ("name 2", "HOUSTON", 33, "2024-01-04")):
+            manager.set_data(*values)
+            manager.guardar_datos_csv()
+        list(manager.borrar_datos("[2-5]"))
+        rows = list(manager.leer_datos_csv())
+        for search in ("houston", "NAME 2", "e|q", "e2", "ñandú", "strasse", "i\"c", "kelvin", "zzz", "3"):
+            expected = [rows[0]] + [row for row in rows[1:] if search.casefold() in "".join(row[1:]).casefold()]
+            assert list(manager.leer_datos_csv(search)) == expected
+        regex_rows = list(manager.leer_datos_csv("^name [0-9]+houston", escaped=True))
+        assert regex_rows[1:] == [row for row in rows[1:] if re.search("^name [0-9]+houston", "".join(row[1:]), re.I)]
+        remove_backup_files(manager)
+
+
+def text_results(manager: SingleCsvManager, searches: tuple[str, ...], ratio: float) -> list[list]:
+    """retorna el resultado de cada búsqueda de texto ocupando el indice de texto (ratio 1) o leyendo todo el csv (ratio 0)"""
+    manager._index_ratio = ratio
+    results = [list(manager.leer_datos_csv(search)) for search in searches]
+    del manager._index_ratio
+    return results
+
+
+class TestTextIndex:
+    """contiene los test del indice de texto creado con create_text_index"""
+
+    searches = ("houston", "HOUSTON", "name 1", "me 12", "12houst", "ton3", "2024-03", "-03-", "los angeles",
+                "geles3", "ñandú", "strasse", "zzz", "e", "  ", "[2]")
+
+    def test_index_follows_changes(self):
+        """ chequea que las búsquedas de texto que ocupan el indice retornen lo mismo que al leer todo el csv
+        (también con palabras que solo son parte de una palabra de la fila) y que el indice se mantenga al día
+        al guardar, borrar (también con lazy_delete) y actualizar entradas"""
+        manager = SingleCsvManager("text_changes", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("text_changes", Employee)
+        fill_employees(manager, 120)
+        manager.set_data("Ñandú Straße", "Houston", 30, "2024-01-01")
+        manager.guardar_datos_csv()
+        manager.create_text_index()
+        assert text_results(manager, self.searches, 1) == text_results(manager, self.searches, 0)
+        for _ in manager.borrar_datos('DELETE ON "age" = 30'):
+            pass
+        fill_employees(manager, 5)
+        for _ in manager.actualizar_datos('UPDATE:~"city"=Dallas ON "age" = 40'):
+            pass
+        assert text_results(manager, self.searches + ("dallas",), 1) == text_results(manager, self.searches + ("dallas",), 0)
+        maintained = json.loads(json.dumps(manager._text_index))
+        rebuilt = SingleCsvManager("text_changes", Employee)
+        rebuilt.instance_file_path.with_suffix(".fts").unlink()
+        rebuilt.create_text_index()
+        assert maintained == rebuilt._text_index
+        manager.lazy_delete = True
+        for _ in manager.borrar_datos("[1-2-3]"):
+            pass
+        assert text_results(manager, self.searches, 1) == text_results(manager, self.searches, 0)
+        remove_backup_files(manager)
+
+    def test_index_skips_scan(self):
+        """ chequea que con el indice una búsqueda de pocas filas no lea todo el csv y que una nueva instancia
+        ocupe el indice del .fts"""
+        manager = SingleCsvManager("text_saved", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("text_saved", Employee)
+        with pytest.raises(ValueError, match="no hay datos"):
+            manager.create_text_index()
+        fill_employees(manager, 100)
+        manager.create_text_index()
+        original = SingleCsvManager._SingleCsvManager__prefiltered_rows
+        SingleCsvManager._SingleCsvManager__prefiltered_rows = lambda *args: (_ for _ in ()).throw(
+            AssertionError("csv leído completo"))
+        try:
+            reopened = SingleCsvManager("text_saved", Employee)
+            assert [row[1] for row in reopened.leer_datos_csv("name 77")] == ["NAME", "Name 77"]
+        finally:
+            SingleCsvManager._SingleCsvManager__prefiltered_rows = original
+        # a search without words or with too many rows reads the whole csv
+        assert len(list(manager.leer_datos_csv("houston"))) == 26
+        assert len(list(manager.leer_datos_csv("  "))) == 1
+        remove_backup_files(manager)
+
+
+class TestSharedMapping:
+    """contiene los test de las lecturas que ocupan el csv mapeado en memoria (SharedMapping)"""
+
+    def test_text_search_jumps_to_rows(self):
+        """ chequea que la búsqueda de texto sin filas borradas con lazy_delete (que salta a las lineas con el texto
+        buscado) entregue las mismas filas que comparar cada fila, también con valores entre comillas, saltos de
+        linea, valores vacíos y caracteres que no son ASCII y cuando el csv se revisa por partes pequeñas"""
+        manager = SingleCsvManager("mapped_search", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("mapped_search", Employee)
+        fill_employees(manager, 30)
+        for values in (("Ñandú Straße", "Houston", 30, "2024-01-01"), ("Name|quoted", 'Chi"cago', 31, "2024-01-02"),
+                       ("two\nlines", "", 32, "2024-01-03"), ("name 2", "HOUSTON", 33, "2024-01-04")):
+            manager.set_data(*values)
+            manager.guardar_datos_csv()
+        fill_employees(manager, 5)
+        rows = list(manager.leer_datos_csv())
+        original = saveclass._SCAN_CHUNK
+        try:
+            for chunk in (original, 40, 7):
+                saveclass._SCAN_CHUNK = chunk
+                for search in ("houston", "NAME 2", "e|q", "e2", "ñandú", "strasse", "i\"c", "lines32", "o\nl", "zzz",
+                               "3"):
+                    expected = [rows[0]] + [row for row in rows[1:] if search.casefold() in "".join(row[1:]).casefold()]
+                    assert list(manager.leer_datos_csv(search)) == expected
+        finally:
+            saveclass._SCAN_CHUNK = original
+        remove_backup_files(manager)
+
+    def test_generators_share_mapping(self):
+        """ chequea que los generadores que leen al mismo tiempo compartan el mapeo y que este se cierre
+        cuando terminan"""
+        manager = SingleCsvManager("mapped_shared", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("mapped_shared", Employee)
+        fill_employees(manager, 50)
+        first, second = manager.leer_datos_csv("[1:10]"), manager.leer_datos_csv("[20-30-40]")
+        assert next(first)[0] == "INDICE" and next(second)[0] == "INDICE"
+        assert next(first)[0] == "[1]" and next(second)[0] == "[20]"
+        mapping = manager._mapping
+        assert mapping is not None and mapping.users == 2
+        assert [row[0] for row in first] == [f"[{number}]" for number in range(2, 11)]
+        assert manager._mapping is mapping and mapping.users == 1
+        assert [row[0] for row in second] == ["[30]", "[40]"]
+        assert manager._mapping is None and mapping.data.closed
+        remove_backup_files(manager)
+
+
+class TestSinglePassUpdate:
+    """contiene los test de actualizar_datos el cual selecciona y actualiza las filas mientras las copia a un
+    archivo temporal en una sola lectura y luego remplaza el csv con este"""
+
+    def test_update_reads_csv_once(self):
+        """ chequea que las filas seleccionadas por INDICE, query o texto se actualicen (también con filas
+        borradas con lazy_delete) dejando un .meta valido sin tener que volver a leer el csv"""
+        manager = SingleCsvManager("update_single", Employee, lazy_delete=True)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("update_single", Employee, lazy_delete=True)
+        fill_employees(manager, 150)
+        list(manager.borrar_datos("[1-2]"))
+        original = SingleCsvManager._build_meta
+        SingleCsvManager._build_meta = classmethod(lambda cls, *args: (_ for _ in ()).throw(AssertionError("csv leído")))
+        try:
+            updated, _ = drain(manager.actualizar_datos('UPDATE:~"city"=Dallas ON [3:5]'))
+            assert [status["result"] for status in updated] == [["[3]", "Name 5", "Dallas", "25", "2024-06-06"],
+                                                                ["[4]", "Name 6", "Dallas", "26", "2024-07-07"],
+                                                                ["[5]", "Name 7", "Dallas", "27", "2024-08-08"]]
+            updated, _ = drain(manager.actualizar_datos('UPDATE:~"age"=%ADD:~100 ON "age" >= 63'))
+            assert [status["result"][3] for status in updated] == ["163.0", "164.0"] * 3
+            updated, _ = drain(manager.actualizar_datos('UPDATE:~"name"=Renamed ON name 12'))
+            assert [status["result"][:2] for status in updated] == [["[10]", "Renamed"]] + [
+                [f"[{num - 2}]", "Renamed"] for num in range(120, 130)]
+        finally:
+            SingleCsvManager._build_meta = original
+        assert read_meta(manager) == original(manager.instance_file_path, "|") | {"types": ["int", "str", "str", "float", "date"]}
+        assert not manager.instance_file_path.with_suffix(".tomb").exists() and len(manager) == 149
+        assert [row[0] for row in manager.leer_datos_csv()][1:] == [f"[{num}]" for num in range(1, 149)]
+        assert list(manager.leer_datos_csv("[4]"))[-1] == ["[4]", "Name 6", "Dallas", "26", "2024-07-07"]
+        assert not list(manager.instance_file_path.parent.glob("*.tmp"))
+        remove_backup_files(manager)
+
+    def test_csv_unchanged_without_updates(self):
+        """ chequea que el csv no se modifique si ninguna entrada se selecciona, si ningún valor se pudo
+        actualizar o si el generador se cierra antes de pedir el primer valor"""
+        manager = SingleCsvManager("update_unchanged", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("update_unchanged", Employee)
+        fill_employees(manager, 20)
+        file_stat = manager.instance_file_path.stat()
+        for query in ('UPDATE:~"age"=1 ON "age" > 100', 'UPDATE:~"age"=1 ON zzz'):
+            assert drain(manager.actualizar_datos(query)) == (
+                ["no se encontraron entradas para actualizar"], "sintaxis valida pero sin entradas seleccionadas para la operación")
+        assert drain(manager.actualizar_datos('UPDATE:~"age"=1 ON "age" >> 3')) == (
+            ["no se encontraron entradas para actualizar"], "sintaxis valida pero sin entradas seleccionadas para la operación")
+        updated, _ = drain(manager.actualizar_datos('UPDATE:~"city"=%MUL:~2 ON [1-2]'))
+        assert [status["result"][1:] for status in updated] == [
+            ["ningún valor de la fila fue actualizado, todas la operaciones fueron invalidas"]] * 2
+        update_on = manager.actualizar_datos('UPDATE:~"city"=Dallas ON "city" = Houston')
+        update_on.close()
+        assert manager.instance_file_path.stat().st_mtime_ns == file_stat.st_mtime_ns
+        assert drain(manager.actualizar_datos('UPDATE:~"city"=Dallas ON [age] "city" = Houston')) == (
+            ["error de sintaxis la columna a actualizar debe estar dentro de la consulta de búsqueda"],
+            "sintaxis no valida operación cancelada")
+        assert not list(manager.instance_file_path.parent.glob("*.tmp"))
+        remove_backup_files(manager)
+
+
+
+class TestUpdatePlan:
+    """contiene los test de las actualizaciones de una query UPDATE compiladas una vez (UpdateOperation)"""
+
+    def test_plan_compiled_once(self):
+        """ chequea que cada columna de la query se compile una sola vez para todas las filas y que los valores
+        y errores de cada fila sean los mismos que al resolver la query en cada fila"""
+        manager = SingleCsvManager("update_plan", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("update_plan", Employee)
+        fill_employees(manager, 30)
+        compiled = []
+        original = saveclass._update_operation
+        saveclass._update_operation = lambda *args: compiled.append(args[:2]) or original(*args)
+        try:
+            updated, _ = drain(manager.actualizar_datos('UPDATE:~"age"=%ADD:~USE:~date "date"=%ADD:~5 ON "age" <= 22'))
+        finally:
+            saveclass._update_operation = original
+        assert compiled == [(3, ["%ADD", "USE:~date"]), (4, ["%ADD", "5"])]
+        assert updated == [{"result": ["[1]", "Name 1", "Chicago", "212024-02-02", "2024-02-07"],
+                            "errors": {"AGE": [], "DATE": []}, "old": {"AGE": ["21"], "DATE": ["2024-02-02"]}},
+                           {"result": ["[2]", "Name 2", "Los Angeles", "222024-03-03", "2024-03-08"],
+                            "errors": {"AGE": [], "DATE": []}, "old": {"AGE": ["22"], "DATE": ["2024-03-03"]}}]
+        updated, _ = drain(manager.actualizar_datos(
+            'UPDATE:~"date"=%MUL:~2 "age"=%COPY:~nope "city"=%NUM-FORMAT:~1 "name"=%RANDOM-INT:~5#5 ON [4]'))
+        assert updated == [{"result": ["[4]", "5", "Houston", "24", "2024-05-05"],
+                            "errors": {"DATE": ["solo es posible aplicar una función %ADD o %SUB sobre una fecha y su "
+                                                "elección fue %MUL entrada [4] no actualizada"],
+                                       "AGE": ["la función %COPY solo se puede usar para copiar el valor de una columna a "
+                                               "otra para lo cual debe seleccionar el nombre de una columna, su valor fue "
+                                               f"NOPE pero las opciones son {manager.new_head[1:]} entrada [4] no actualizada"],
+                                       "CITY": ["para usar la función %NUM-FORMAT debe ocupar una columna que contenga "
+                                                "valores decimales o enteros pero el valor fue de tipo str"],
+                                       "NAME": []},
+                            "old": {"DATE": [], "AGE": [], "CITY": [], "NAME": ["Name 4"]}}]
+        remove_backup_files(manager)
+
+
+class TestDryRunUpdate:
+    """contiene los test de actualizar_datos con dry_run el cual envía los resultados de la actualización sin
+    escribir nada en el disco"""
+
+    def test_dry_run_matches_update(self):
+        """ chequea que dry_run envíe los mismos resultados que la actualización por INDICE, query o texto (también
+        con filas borradas con lazy_delete) sin crear el archivo temporal ni modificar el csv o sus archivos"""
+        manager = SingleCsvManager("update_dry_run", Employee, lazy_delete=True)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("update_dry_run", Employee, lazy_delete=True)
+        fill_employees(manager, 60)
+        list(manager.borrar_datos("[1-2]"))
+        backup_files = lambda: {path: path.read_bytes() for path in manager.instance_file_path.parent.glob("update_dry_run.*")}
+        for query in ('UPDATE:~"city"=Dallas "age"=%ADD:~1 ON [3:5]', 'UPDATE:~"age"=%MUL:~2 ON "age" >= 60',
+                      'UPDATE:~"name"=%UPPER "date"=%MUL:~2 ON name 1', 'UPDATE:~"age"=1 ON [100]'):
+            before = backup_files()
+            original = saveclass.tempfile.NamedTemporaryFile
+            saveclass.tempfile.NamedTemporaryFile = lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("escrito"))
+            try:
+                preview, _ = drain(manager.actualizar_datos(query, dry_run=True))
+            finally:
+                saveclass.tempfile.NamedTemporaryFile = original
+            assert backup_files() == before
+            assert preview == drain(manager.actualizar_datos(query))[0]
+        assert drain(manager.actualizar_datos('UPDATE:~"age"=1 ON zzz', dry_run=True)) == (
+            ["no se encontraron entradas para actualizar"], "sintaxis valida pero sin entradas seleccionadas para la operación")
+        with pytest.raises(ValueError, match="el argumento dry_run debe ser un bool pero fue str"):
+            next(manager.actualizar_datos('UPDATE:~"age"=1 ON [1]', dry_run="yes"))
+        remove_backup_files(manager)
+
+
+class TestTransaction:
+    """contiene los test de transaction el cual guarda varias operaciones en el archivo .wal y las aplica
+    juntas en una sola reescritura del csv"""
+
+    operations = (("borrar_datos", 'DELETE ON "age" > 55'), ("actualizar_datos", 'UPDATE:~"city"=Dallas ON [1:3]'),
+                  ("guardar_datos_csv_many", [Employee("Name 90", "Houston", 70, "2024-01-01")]),
+                  ("borrar_datos", "[2-40]"), ("actualizar_datos", 'UPDATE:~"age"=%ADD:~1 ON houston'))
+
+    def test_transaction_matches_operations(self):
+        """ chequea que la transacción obtenga los mismos resultados y el mismo csv que las operaciones una por
+        una (también con filas borradas con lazy_delete) reescribiendo el csv una sola vez"""
+        expected = SingleCsvManager("transaction_single", Employee, lazy_delete=True)
+        remove_backup_files(expected)
+        expected = SingleCsvManager("transaction_single", Employee, lazy_delete=True)
+        manager = SingleCsvManager("transaction", Employee, lazy_delete=True)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("transaction", Employee, lazy_delete=True)
+        for instance in (expected, manager):
+            fill_employees(instance, 50)
+            list(instance.borrar_datos("[4]"))
+        expected_results = []
+        for method, argument in self.operations:
+            result = getattr(expected, method)(argument)
+            expected_results.append(result if isinstance(result, list) else
+                                    [value for value in result if isinstance(value, dict) or value.startswith("[")])
+        replaced = []
+        original = saveclass.os.replace
+        saveclass.os.replace = lambda *args: replaced.append(args) or original(*args)
+        try:
+            with manager.transaction() as transaction:
+                for method, argument in self.operations:
+                    getattr(transaction, method)(argument)
+                assert transaction.wal_path.is_file()
+        finally:
+            saveclass.os.replace = original
+        assert len(replaced) == 1
+        assert transaction.results == expected_results
+        assert list(manager.leer_datos_csv()) == list(expected.leer_datos_csv())
+        assert read_meta(manager) == SingleCsvManager._build_meta(manager.instance_file_path, "|") | {
+            "types": ["int", "str", "str", "float", "date"]}
+        assert not transaction.wal_path.exists() and not manager._wal_paths(manager.instance_file_path)
+        assert not manager.instance_file_path.with_suffix(".tomb").exists()
+        with manager.transaction() as transaction:
+            transaction.guardar_datos_csv_many([Employee("Name 91", "Houston", 30, "2024-01-01")])
+        assert transaction.results == [[f"\nINDICE|NAME|CITY|AGE|DATE\n[{len(manager) - 1}]|Name 91|Houston|30|2024-01-01"]]
+        remove_backup_files(expected)
+        remove_backup_files(manager)
+
+    def test_transaction_cancelled(self):
+        """ chequea que si el bloque with termina con una excepción o alguna operación no es valida no se
+        modifique el csv y se elimine el .wal"""
+        manager = SingleCsvManager("transaction_cancel", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("transaction_cancel", Employee)
+        fill_employees(manager, 10)
+        rows = list(manager.leer_datos_csv())
+        with pytest.raises(KeyError):
+            with manager.transaction() as transaction:
+                transaction.borrar_datos("[1]")
+                raise KeyError("cancelada")
+        with pytest.raises(ValueError, match="la columna a actualizar debe estar dentro de la consulta"):
+            with manager.transaction() as transaction:
+                transaction.borrar_datos("[1]")
+                transaction.actualizar_datos('UPDATE:~"nope"=1 ON [2]')
+        with pytest.raises(ValueError, match="no es posible borrar todo dentro de una transacción"):
+            with manager.transaction() as transaction:
+                transaction.borrar_datos("borrar todo")
+        with pytest.raises(ValueError, match="la transacción ya termino"):
+            transaction.borrar_datos("[1]")
+        assert list(manager.leer_datos_csv()) == rows
+        assert not manager._wal_paths(manager.instance_file_path)
+        remove_backup_files(manager)
+
+    def test_wal_replayed_on_open(self):
+        """ chequea que una transacción confirmada que no se aplico (el programa se detuvo) se aplique al crear
+        una nueva instancia y que una transacción sin confirmar o ya aplicada no se aplique"""
+        manager = SingleCsvManager("transaction_wal", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("transaction_wal", Employee)
+        fill_employees(manager, 10)
+        wal_lines = []
+        original = SingleCsvManager._SingleCsvManager__apply_transaction
+
+        def stop(self, stages):
+            wal_lines.extend(self._transaction.wal_path.read_text(encoding="utf-8").splitlines(keepends=True))
+            raise KeyboardInterrupt
+
+        SingleCsvManager._SingleCsvManager__apply_transaction = stop
+        try:
+            with pytest.raises(KeyboardInterrupt):
+                with manager.transaction() as transaction:
+                    transaction.borrar_datos("[1-2]")
+                    transaction.actualizar_datos('UPDATE:~"city"=Dallas ON [1]')
+        finally:
+            SingleCsvManager._SingleCsvManager__apply_transaction = original
+        wal_path = transaction.wal_path
+        assert len(manager) == 11
+        # without the commit the operations are discarded
+        wal_path.write_text("".join(wal_lines[:-1]), encoding="utf-8")
+        assert len(SingleCsvManager("transaction_wal", Employee)) == 11 and not wal_path.exists()
+        wal_path.write_text("".join(wal_lines), encoding="utf-8")
+        reopened = SingleCsvManager("transaction_wal", Employee)
+        assert list(reopened.leer_datos_csv())[1:3] == [["[1]", "Name 3", "Dallas", "23", "2024-04-04"],
+                                                        ["[2]", "Name 4", "Houston", "24", "2024-05-05"]]
+        assert len(reopened) == 9 and not wal_path.exists()
+        # the csv changed since the commit so it was already applied
+        wal_path.write_text("".join(wal_lines), encoding="utf-8")
+        assert len(SingleCsvManager("transaction_wal", Employee)) == 9 and not wal_path.exists()
+        remove_backup_files(reopened)
+
+    def test_partial_append_replayed(self):
+        """ chequea que si el programa se detuvo mientras se agregaban las entradas de una transacción que solo
+        guarda entradas el csv se corte y la transacción se aplique una sola vez al crear una nueva instancia"""
+        manager = SingleCsvManager("transaction_append", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("transaction_append", Employee)
+        fill_employees(manager, 10)
+        employees = [Employee(f"Saved {num}", "Dallas", 30 + num, "2024-02-02") for num in range(20)]
+        wal_lines = []
+        original = SingleCsvManager._SingleCsvManager__apply_transaction
+
+        def stop(self, stages):
+            wal_lines.extend(self._transaction.wal_path.read_text(encoding="utf-8").splitlines(keepends=True))
+            raise KeyboardInterrupt
+
+        SingleCsvManager._SingleCsvManager__apply_transaction = stop
+        try:
+            with pytest.raises(KeyboardInterrupt):
+                with manager.transaction() as transaction:
+                    transaction.guardar_datos_csv_many(employees)
+        finally:
+            SingleCsvManager._SingleCsvManager__apply_transaction = original
+        wal_path = transaction.wal_path
+        before = manager.instance_file_path.read_bytes()
+        with manager.transaction() as transaction:
+            transaction.guardar_datos_csv_many(employees)
+        after = manager.instance_file_path.read_bytes()
+        assert len(after) == json.loads(wal_lines[-1])["appended"]
+        for content in (before + after[len(before):len(before) + 57], after):
+            manager.instance_file_path.write_bytes(content)
+            wal_path.write_text("".join(wal_lines), encoding="utf-8")
+            reopened = SingleCsvManager("transaction_append", Employee)
+            assert manager.instance_file_path.read_bytes() == after and not wal_path.exists()
+            assert len(reopened) == 31 and list(reopened.leer_datos_csv("[30]"))[1][1] == "Saved 19"
+        remove_backup_files(reopened)
+
+    def test_open_transactions_keep_their_wal(self):
+        """ chequea que crear otra instancia del mismo archivo o abrir otra transacción sobre él mientras una
+        transacción esta abierta no elimine ni cambie su .wal y que ambas se apliquen completas"""
+        expected = SingleCsvManager("transaction_open_single", Employee)
+        remove_backup_files(expected)
+        expected = SingleCsvManager("transaction_open_single", Employee)
+        manager = SingleCsvManager("transaction_open", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("transaction_open", Employee)
+        for instance in (expected, manager):
+            fill_employees(instance, 50)
+        list(expected.guardar_datos_csv_many([Employee("Name 90", "Houston", 25, "2024-01-01")]))
+        list(expected.borrar_datos('DELETE ON "age" > 30'))
+        list(expected.actualizar_datos('UPDATE:~"city"=Dallas ON [1:5]'))
+        with manager.transaction() as transaction:
+            transaction.borrar_datos('DELETE ON "age" > 30')
+            other = SingleCsvManager("transaction_open", Employee)
+            with other.transaction() as other_transaction:
+                other_transaction.guardar_datos_csv_many([Employee("Name 90", "Houston", 25, "2024-01-01")])
+                assert other_transaction.wal_path != transaction.wal_path
+            transaction.actualizar_datos('UPDATE:~"city"=Dallas ON [1:5]')
+            assert [json.loads(line)["op"] for line in transaction.wal_path.read_text(encoding="utf-8").splitlines()] == [
+                "delete", "update"]
+        assert list(manager.leer_datos_csv()) == list(expected.leer_datos_csv())
+        assert not manager._wal_paths(manager.instance_file_path)
+        remove_backup_files(expected)
+        remove_backup_files(manager)
+
+    @pytest.mark.skipif(saveclass.fcntl is None, reason="fcntl solo esta disponible en unix")
+    def test_replayed_after_crash_with_other_instance(self):
+        """ chequea que si el proceso se detiene mientras aplica una transacción durante la cual se creo otra
+        instancia del mismo archivo, al volver a abrirlo se apliquen todas las operaciones de la transacción"""
+        expected = SingleCsvManager("transaction_crash_single", Employee)
+        remove_backup_files(expected)
+        expected = SingleCsvManager("transaction_crash_single", Employee)
+        manager = SingleCsvManager("transaction_crash", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("transaction_crash", Employee)
+        for instance in (expected, manager):
+            fill_employees(instance, 50)
+        list(expected.borrar_datos('DELETE ON "age" > 30'))
+        list(expected.actualizar_datos('UPDATE:~"city"=Dallas ON [1:5]'))
+        context = multiprocessing.get_context("fork")
+        crashing = context.Process(target=crashed_transaction, args=("transaction_crash",))
+        crashing.start()
+        crashing.join(timeout=60)
+        assert crashing.exitcode == 3
+        assert len(manager._wal_paths(manager.instance_file_path)) == 1
+        reopened = SingleCsvManager("transaction_crash", Employee)
+        assert len(reopened) == len(expected) == 17
+        assert list(reopened.leer_datos_csv()) == list(expected.leer_datos_csv())
+        assert not manager._wal_paths(manager.instance_file_path)
+        remove_backup_files(expected)
+        remove_backup_files(reopened)
+
+
+def crashed_transaction(file_name: str) -> None:
+    """abre una transacción en el archivo file_name, crea otra instancia del mismo archivo mientras esta abierta
+    y termina el proceso al aplicarla (ver TestTransaction)"""
+    manager = SingleCsvManager(file_name, Employee)
+    SingleCsvManager._SingleCsvManager__apply_transaction = lambda self, stages: os._exit(3)
+    with manager.transaction() as transaction:
+        transaction.borrar_datos('DELETE ON "age" > 30')
+        SingleCsvManager(file_name, Employee)
+        transaction.actualizar_datos('UPDATE:~"city"=Dallas ON [1:5]')
+
+
+def open_transaction(file_name: str, started, resume) -> None:
+    """agrega operaciones a una transacción del archivo file_name y espera a que otro proceso abra el mismo
+    archivo antes de terminarla (ver TestFileLock)"""
+    manager = SingleCsvManager(file_name, Employee)
+    with manager.transaction() as transaction:
+        transaction.borrar_datos('DELETE ON "age" > 30')
+        started.set()
+        resume.wait(60)
+        transaction.actualizar_datos('UPDATE:~"city"=Dallas ON [1:5]')
+
+
+def concurrent_worker(worker: int, saves: int, results) -> None:
+    """guarda, actualiza, borra y lee entradas del mismo archivo que otros procesos (ver TestFileLock), envía
+    a results el número de filas borradas y si el INDICE de todas las lecturas fue consecutivo"""
+    manager = SingleCsvManager("file_lock", Employee)
+    deleted = 0
+    dense = True
+    for num in range(saves):
+        manager.set_data(f"Worker {worker} {num}", "Houston", num, "2024-01-01")
+        manager.guardar_datos_csv()
+        if num % 10 == 5:
+            deleted += sum(1 for row in manager.borrar_datos("[1]") if row.startswith("["))
+            list(manager.actualizar_datos('UPDATE:~"city"=Dallas ON [1]'))
+        if num % 10 == 9:
+            rows = list(manager.leer_datos_csv())
+            dense = dense and [row[0] for row in rows[1:]] == [f"[{row}]" for row in range(1, len(rows))]
+    results.put((deleted, dense))
+
+
+def locked_writer(file_name: str) -> None:
+    """borra la primera fila y guarda una entrada en el archivo file_name desde otro proceso (ver TestFileLock)"""
+    manager = SingleCsvManager(file_name, Employee)
+    assert drain(manager.borrar_datos("[1]"))[1] == 39
+    manager.set_data("Written", "Houston", 99, "2024-01-01")
+    manager.guardar_datos_csv()
+
+
+class TestFileLock:
+    """contiene los test del bloqueo compartido y exclusivo (fcntl) del archivo csv entre procesos"""
+
+    @pytest.mark.skipif(saveclass.fcntl is None, reason="fcntl solo esta disponible en unix")
+    def test_processes_keep_index_dense(self):
+        """ chequea que varios procesos que guardan, borran, actualizan y leen el mismo archivo al mismo tiempo
+        dejen el INDICE consecutivo, el número de filas correcto y un .meta valido"""
+        manager = SingleCsvManager("file_lock", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("file_lock", Employee)
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        workers = [context.Process(target=concurrent_worker, args=(worker, 60, results)) for worker in range(6)]
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get(timeout=120) for _ in workers]
+        for worker in workers:
+            worker.join()
+        assert all(dense for _, dense in outcomes)
+        assert len(manager) - 1 == 6 * 60 - sum(deleted for deleted, _ in outcomes)
+        rows = list(manager.leer_datos_csv())
+        assert [row[0] for row in rows[1:]] == [f"[{row}]" for row in range(1, len(rows))]
+        assert read_meta(manager) == SingleCsvManager._build_meta(manager.instance_file_path, "|") | {
+            "types": ["int", "str", "str", "int", "date"]}
+        remove_backup_files(manager)
+
+    def test_same_process_does_not_block(self):
+        """ chequea que una escritura no espere a una lectura sin terminar del mismo proceso (también desde
+        otra instancia), que la lectura entregue las filas que tenia el csv al empezar y que ninguna de las
+        dos tenga el bloqueo mientras no se terminan de leer"""
+        manager = SingleCsvManager("file_lock_nested", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("file_lock_nested", Employee)
+        fill_employees(manager, 5)
+        rows = list(manager.leer_datos_csv())
+        reading = manager.leer_datos_csv()
+        next(reading)
+        lock = saveclass._FILE_LOCKS[str(manager.instance_file_path.with_suffix(".lock"))]
+        assert (lock.shared, lock.exclusive) == (0, 0)
+        other = SingleCsvManager("file_lock_nested", Employee)
+        other.set_data("Name 6", "Houston", 26, "2024-01-01")
+        other.guardar_datos_csv()
+        assert len(manager) == 7
+        deleting = other.borrar_datos('DELETE ON "city" = Houston')
+        assert next(deleting) == "INDICE|NAME|CITY|AGE|DATE"
+        assert (lock.shared, lock.exclusive) == (0, 0)
+        # the delete was applied before the first value so closing the generator does not cancel it
+        deleting.close()
+        assert len(manager) == 5
+        assert list(reading) == rows[1:]
+        assert (lock.shared, lock.exclusive) == (0, 0)
+        remove_backup_files(manager)
+
+    @pytest.mark.skipif(saveclass.fcntl is None, reason="fcntl solo esta disponible en unix")
+    def test_unfinished_generators_do_not_block_processes(self):
+        """ chequea que otro proceso pueda escribir mientras este tiene lecturas y escrituras sin terminar de
+        leer y que las lecturas entreguen las filas que tenia el csv al empezar aunque el csv se remplace"""
+        manager = SingleCsvManager("file_lock_open", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("file_lock_open", Employee)
+        fill_employees(manager, 40)
+        expected = {search: list(manager.leer_datos_csv(search)) for search in ("", "[2:30]", "[3-7-9]", "houston")}
+        readers = {search: manager.leer_datos_csv(search) for search in expected}
+        for search, reading in readers.items():
+            assert next(reading) == expected[search][0]
+            assert next(reading) == expected[search][1]
+        deleting = manager.borrar_datos("[40]")
+        next(deleting)
+        updating = manager.actualizar_datos('UPDATE:~"age"=1 ON "city" = Houston', dry_run=True)
+        next(updating)
+        context = multiprocessing.get_context("fork")
+        writer = context.Process(target=locked_writer, args=("file_lock_open",))
+        writer.start()
+        writer.join(timeout=60)
+        assert not writer.is_alive() and writer.exitcode == 0
+        for search, reading in readers.items():
+            assert list(reading) == expected[search][2:]
+        # the other process deleted one row and saved another one
+        assert len(manager) == 40
+        assert list(manager.leer_datos_csv("[39]"))[-1][1] == "Written"
+        remove_backup_files(manager)
+
+    def test_lock_upgrade_reloads_meta(self):
+        """ chequea que pasar del bloqueo compartido al exclusivo retorne True (el compartido se libera antes
+        de obtener el exclusivo) y que al terminar la escritura se vuelva al compartido"""
+        manager = SingleCsvManager("file_lock_upgrade", Employee)
+        remove_backup_files(manager)
+        lock = saveclass.FileLock(manager.instance_file_path.with_suffix(".lock"))
+        assert lock.acquire(exclusive=False)
+        assert not lock.acquire(exclusive=False)
+        assert lock.acquire(exclusive=True)
+        assert not lock.acquire(exclusive=False)
+        lock.release(exclusive=False)
+        lock.release(exclusive=True)
+        assert (lock.shared, lock.exclusive) == (2, 0)
+        lock.release(exclusive=False)
+        lock.release(exclusive=False)
+        assert (lock.shared, lock.exclusive) == (0, 0)
+        if lock.lock_file is not None:
+            lock.lock_file.close()
+        remove_backup_files(manager)
+
+    @pytest.mark.skipif(saveclass.fcntl is None, reason="fcntl solo esta disponible en unix")
+    def test_open_transaction_in_other_process(self):
+        """ chequea que abrir y escribir el mismo archivo mientras otro proceso tiene una transacción abierta no
+        elimine su .wal y que la transacción se aplique completa al terminar"""
+        expected = SingleCsvManager("lock_tx_single", Employee)
+        remove_backup_files(expected)
+        expected = SingleCsvManager("lock_tx_single", Employee)
+        manager = SingleCsvManager("lock_tx", Employee)
+        remove_backup_files(manager)
+        manager = SingleCsvManager("lock_tx", Employee)
+        for instance in (expected, manager):
+            fill_employees(instance, 50)
+        expected.set_data("Name 90", "Houston", 25, "2024-01-01")
+        expected.guardar_datos_csv()
+        list(expected.borrar_datos('DELETE ON "age" > 30'))
+        list(expected.actualizar_datos('UPDATE:~"city"=Dallas ON [1:5]'))
+        context = multiprocessing.get_context("fork")
+        started, resume = context.Event(), context.Event()
+        owner = context.Process(target=open_transaction, args=("lock_tx", started, resume))
+        owner.start()
+        assert started.wait(60)
+        wal_paths = manager._wal_paths(manager.instance_file_path)
+        reopened = SingleCsvManager("lock_tx", Employee)
+        reopened.set_data("Name 90", "Houston", 25, "2024-01-01")
+        reopened.guardar_datos_csv()
+        assert len(wal_paths) == 1 and manager._wal_paths(manager.instance_file_path) == wal_paths
+        resume.set()
+        owner.join(timeout=60)
+        assert owner.exitcode == 0
+        assert list(reopened.leer_datos_csv()) == list(expected.leer_datos_csv())
+        assert not manager._wal_paths(manager.instance_file_path)
+        remove_backup_files(expected)
+        remove_backup_files(reopened)